@@ -0,0 +1,77 @@
+"""Tempo de inicialização do ``dee``: falha se passar do orçamento.
+
+Mede ``dee --help`` e ``dee current`` (num repositório temporário) em
+processos novos, como o usuário executa, e compara a melhor de algumas
+execuções com o orçamento de cada comando. O cache da verificação de
+versão é criado "fresco", para medir só o custo de importar e rodar o
+comando (sem rede).
+
+    python benchmarks/startup.py [--runs 5] [--help-budget 0.25] [--current-budget 0.20]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+RUN_DEE = "from cli.commands import cli; cli(prog_name='dee')"
+
+
+def run_dee(args, cwd, env, code=RUN_DEE):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=cwd, env=env, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def best_of(runs, args, cwd, env, code=RUN_DEE):
+    return min(run_dee(args, cwd, env, code) for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--help-budget", type=float, default=0.25,
+                        help="Orçamento de 'dee --help' em segundos")
+    parser.add_argument("--current-budget", type=float, default=0.20,
+                        help="Orçamento de 'dee current' em segundos")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_home = os.path.join(tmp, "cache")
+        os.makedirs(os.path.join(cache_home, "dee"))
+        with open(os.path.join(cache_home, "dee", "update-check.json"), "w") as f:
+            json.dump({"checked_at": time.time(), "latest": ""}, f)
+        env = dict(os.environ, PYTHONPATH=SRC_DIR, XDG_CACHE_HOME=cache_home)
+        env.pop("DEE_DISABLE_UPDATE_CHECK", None)
+
+        repo_path = os.path.join(tmp, "repo")
+        os.makedirs(repo_path)
+        run_dee(["init"], repo_path, env)
+
+        # Primeira execução compila os .pyc; não entra na medição
+        run_dee(["--help"], repo_path, env)
+        baseline = best_of(options.runs, [], repo_path, env, code="pass")
+        results = [
+            ("dee --help", best_of(options.runs, ["--help"], repo_path, env), options.help_budget),
+            ("dee current", best_of(options.runs, ["current"], repo_path, env), options.current_budget),
+        ]
+
+    failed = False
+    for name, elapsed, budget in results:
+        status = "ok" if elapsed <= budget else "ACIMA DO ORÇAMENTO"
+        failed |= elapsed > budget
+        print(f"{name:<12} {elapsed * 1000:7.1f} ms  (orçamento {budget * 1000:.0f} ms)  {status}")
+    print(f"{'python':<12} {baseline * 1000:7.1f} ms  (interpretador vazio, referência)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,6 +26,8 @@ cd "${TMPDIR}/dee-${VERSION#v}"
 echo "➡️ Tentando instalar dee como CLI via pipx (com --include-deps)..."
 if pipx install . --force --include-deps; then
   echo "✅ dee instalado com success! Apps das dependências também estão disponíveis."
+  # Compila os kernels uma vez: os próximos comandos usam o cache em disco
+  dee doctor --kernels >/dev/null 2>&1 || true
   exit 0
 else
   echo "⚠️ Nenhum entry_point do dee detectado. Instalando como biblioteca num venv..."
@@ -34,6 +36,7 @@ else
   source "${HOME}/.virtualenvs/${VENV_NAME}/bin/activate"
   pip install --upgrade pip setuptools
   pip install .
+  dee doctor --kernels >/dev/null 2>&1 || true
   echo "✅ dee instalado no venv '${VENV_NAME}'. Para usar, execute:"
   echo "   source \"\${HOME}/.virtualenvs/${VENV_NAME}/bin/activate\""
 fi
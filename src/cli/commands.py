@@ -1,57 +1,40 @@
-import os
-import shutil
-import json
-import time
-import hashlib
+import sys
 import click
-import requests
-import subprocess
-from core.storage import Repo
-
-
-VERSION = "0.1.17"
-
-def check_for_updates():
-    if os.getenv("DEE_DISABLE_UPDATE_CHECK"):
-        return
-
-    try:
-        resp = requests.get(
-            "https://api.github.com/repos/wendrewdevelop/dee/releases/latest",
-            timeout=2
-        )
-        resp.raise_for_status()
-        latest_tag = resp.json().get("tag_name", "")
-        latest = latest_tag.lstrip("v")
-
-        if latest and latest != VERSION:
-            print(
-                f"\n🆕 Uma nova versão do dee está disponível: {latest}\n"
-                "  Atualize com:\n"
-                "    curl -sL https://github.com/wendrewdevelop/dee/"
-                "releases/latest/download/install.sh | bash\n"
-            )
-    except Exception:
-        # Se falhar, segue sem avisar
-        pass
+from cli.update_check import VERSION, check_for_updates
 
 
 @click.group()
 @click.pass_context
 def cli(ctx):
-    check_for_updates()
+    from cli import daemon
+
     ctx.ensure_object(dict)
+    if daemon.serving:
+        # Dentro do daemon: o cliente já fez a checagem de versão
+        return
+    check_for_updates()
+    if ctx.invoked_subcommand in daemon.COMMANDS:
+        # Com o daemon do repositório ativo, ele executa o comando
+        code = daemon.forward(sys.argv[1:])
+        if code is not None:
+            ctx.exit(code)
 
 
 @cli.command()
 @click.argument("path", default=".")
+@click.option(
+    "--objects", type=click.Choice(["loose", "sqlite"]), default="loose",
+    help="Onde guardar os objetos: arquivos soltos ou um banco SQLite"
+)
 @click.pass_context
-def init(ctx, path):
+def init(ctx, path, objects):
+    from core.storage import Repo
+
     repo = Repo(path)
     if repo.is_initialized():
         click.echo("Repositório já inicializado.")
     else:
-        repo.init()
+        repo.init(objects=objects)
         click.echo(f"Repositório dee inicializado em: {path}")
 
 
@@ -59,6 +42,8 @@ def init(ctx, path):
 @click.argument("message")
 @click.pass_context
 def commit(ctx, message):
+    from core.storage import Repo
+
     repo = Repo(".")
     if not repo.is_initialized():
         click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
@@ -66,31 +51,53 @@ def commit(ctx, message):
     if not repo.has_changes():
         click.echo("Nenhuma alteração detectada. Faça alterações e adicione arquivos com 'dee add' antes de commitar.")
         return
-    commit_id = repo.commit(message)
-    click.echo(f"Commit criado: {commit_id}")
+    repo.commit(message)
 
 
 @click.command()
 @click.argument("files", nargs=-1)
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=None,
+              help="Número de workers para hash e staging (padrão: núcleos da CPU)")
+@click.option("--processes", is_flag=True,
+              help="Usa um pool de processos em vez de threads")
+@click.option("--chunk-size", type=click.IntRange(min=4096), default=None,
+              help="Tamanho em bytes dos blocos lidos por arquivo (padrão: 1 MiB)")
 @click.pass_context
-def add(ctx, files):
+def add(ctx, files, jobs, processes, chunk_size):
+    from core.storage import Repo
+
     repo = Repo(".")
     if not repo.is_initialized():
         click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
         return
     if not files:
         files = ["."]
-    repo.add(files)
+    options = {"jobs": jobs, "use_processes": processes}
+    if chunk_size:
+        options["chunk_size"] = chunk_size
+    repo.add(files, **options)
 
 
 @cli.command()
 @click.argument('repo_id', required=False)
+@click.option("--remote", "remote_dir", type=click.Path(file_okay=False),
+              help="Diretório local usado como remoto (push negociado).")
 @click.pass_context
-def push(ctx, repo_id=None):
+def push(ctx, repo_id=None, remote_dir=None):
+    from core.storage import Repo
+
     repo = Repo(".")
     if not repo.is_initialized():
         click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
         return
+
+    if remote_dir:
+        from remote.transport import LocalTransport
+        try:
+            repo.push_to(LocalTransport(remote_dir))
+        except Exception as e:
+            click.echo(f"❗️ Erro ao executar push: {e}")
+        return
     
     # Verifica se é o primeiro push
     if not repo._has_remote_link() and not repo_id:
@@ -98,8 +105,10 @@ def push(ctx, repo_id=None):
         click.echo("Use: dee push <repo_id>")
         return
     
-    repo.push(repo_id)
-    click.echo("Alterações aplicadas ao HEAD.")
+    try:
+        repo.push(repo_id)
+    except Exception as e:
+        click.echo(f"❗️ Erro ao executar push: {e}")
 
 
 @cli.command()
@@ -108,6 +117,8 @@ def push(ctx, repo_id=None):
 @click.pass_context
 def branch(ctx, branch, start_point):
     """Cria um novo branch"""
+    from core.storage import Repo
+
     repo = Repo('.')
     repo.create_branch(branch, start_point)
 
@@ -116,6 +127,8 @@ def branch(ctx, branch, start_point):
 @click.pass_context
 def branches(ctx):
     """Lista branches existentes"""
+    from core.storage import Repo
+
     repo = Repo('.')
     for b in repo.list_branches():
         click.echo(b)
@@ -126,6 +139,8 @@ def branches(ctx):
 @click.pass_context
 def checkout(ctx, branch):
     """Troca para outro branch"""
+    from core.storage import Repo
+
     repo = Repo('.')
     repo.checkout(branch)
 
@@ -136,23 +151,41 @@ def checkout(ctx, branch):
 @click.pass_context
 def merge(ctx, source_branch, target_branch):
     """Faz merge de source_branch em target_branch (ou atual)"""
+    from core.storage import Repo
+
     repo = Repo('.')
     repo.merge(source_branch, target_branch)
 
 @cli.command()
-@click.argument("branch")
-@click.argument("onto_branch")
+@click.argument("branch", required=False)
+@click.argument("onto_branch", required=False)
+@click.option("--continue", "continue_", is_flag=True,
+              help="Segue o rebase depois de resolver os conflitos.")
+@click.option("--abort", is_flag=True, help="Desfaz o rebase em andamento.")
 @click.pass_context
-def rebase(ctx, branch, onto_branch):
+def rebase(ctx, branch, onto_branch, continue_, abort):
     """Rebase de um branch em outro"""
+    from core.storage import Repo
+
     repo = Repo('.')
-    repo.rebase(branch, onto_branch)
+    if continue_ and abort:
+        raise click.UsageError("Use --continue ou --abort, não os dois.")
+    if continue_:
+        repo.rebase_continue()
+    elif abort:
+        repo.rebase_abort()
+    elif not branch or not onto_branch:
+        raise click.UsageError("Informe BRANCH e ONTO_BRANCH (ou --continue/--abort).")
+    else:
+        repo.rebase(branch, onto_branch)
 
 
 @cli.command()
 @click.pass_context
 def token(ctx):
     """obtem o token gerado no momento da inicialização do repositorio"""
+    from core.storage import Repo
+
     repo = Repo('.')
     token = repo.retrieve_token()
     click.echo(f'\nToken::: {token}\n')
@@ -162,27 +195,208 @@ def token(ctx):
 @cli.command()
 @click.argument("repo_obj_hash")
 @click.argument("target_path", required=False)
+@click.option("--depth", type=click.IntRange(min=1), default=None,
+              help="Baixa só os N commits mais recentes (clone raso).")
+@click.option("--filter", "path_filter", default=None,
+              help="Prefixos de caminho separados por vírgula: só eles são baixados e "
+                   "materializados; o resto é buscado no remoto sob demanda.")
+@click.option("--remote", "remote_dir", type=click.Path(file_okay=False),
+              help="Diretório local usado como remoto; REPO_OBJ_HASH é então a branch a clonar.")
 @click.pass_context
-def clone(ctx, repo_obj_hash, target_path="."):
+def clone(ctx, repo_obj_hash, target_path=".", depth=None, path_filter=None, remote_dir=None):
     """Clona um repositório remoto"""
+    from core.promisor import parse_filter
+    from core.storage import Repo
+    prefixes = parse_filter(path_filter)
+    if path_filter is not None and not prefixes:
+        raise click.UsageError("--filter precisa de ao menos um prefixo de caminho.")
     try:
         repo = Repo('.')
-        cloned_path = repo.clone(
-            repo_obj_hash, 
-            target_path
-        )
+        if remote_dir:
+            cloned_path = repo.clone_local(
+                remote_dir, repo_obj_hash, target_path or ".", depth=depth, prefixes=prefixes
+            )
+        else:
+            cloned_path = repo.clone(
+                repo_obj_hash, target_path or ".", depth=depth, prefixes=prefixes
+            )
         click.echo(f"✅ Repositório clonado em: {cloned_path}")
         
     except Exception as e:
+        # O próprio clone remove o diretório criado em caso de erro
         click.echo(f"❗️ Erro ao clonar: {str(e)}")
-        if os.path.exists(target_path):
-            shutil.rmtree(target_path)
+
+
+@cli.command()
+@click.pass_context
+def repack(ctx):
+    """Compacta os objetos soltos num packfile"""
+    from core.storage import Repo
+
+    repo = Repo('.')
+    if not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    repo.repack()
+
+
+@cli.command()
+@click.argument("commits", nargs=-1)
+@click.option("--cached", is_flag=True, help="Compara o índice com o HEAD (ou com o commit informado).")
+@click.pass_context
+def diff(ctx, commits, cached):
+    """Mostra as diferenças entre worktree, índice e commits"""
+    from core.storage import Repo
+
+    repo = Repo('.')
+    if not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    if len(commits) > 2:
+        raise click.UsageError("Informe no máximo dois commits.")
+    try:
+        for line in repo.diff(cached=cached, commits=commits):
+            click.echo(line)
+    except ValueError as e:
+        click.echo(f"❗️ {e}")
+
+
+@cli.command()
+@click.argument("args", nargs=-1)
+@click.option("--max-count", "-n", type=click.IntRange(min=0), default=None,
+              help="Mostra no máximo N commits.")
+@click.option("--skip", type=click.IntRange(min=0), default=0,
+              help="Pula os N primeiros commits (paginação).")
+@click.option("--since", default=None,
+              help="Só commits a partir da data (ex.: 2024-05-01 ou '2 weeks').")
+@click.option("--oneline", is_flag=True, help="Um commit por linha: hash curto e título.")
+@click.option("--no-pager", is_flag=True, help="Não usa o paginador mesmo no terminal.")
+@click.pass_context
+def log(ctx, args, max_count, skip, since, oneline, no_pager):
+    """Mostra o histórico de commits: dee log [BRANCH|COMMIT] [CAMINHOS]..."""
+    import os
+    from operations.log import parse_since, format_commit
+    from core.storage import Repo
+
+    repo = Repo('.')
+    if not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    revision, paths = "HEAD", list(args)
+    if paths:
+        # O primeiro argumento é a revisão quando for um branch, HEAD ou hash
+        try:
+            repo.resolve_commit(paths[0])
+            revision = paths.pop(0)
+        except ValueError:
+            pass
+    try:
+        commits = repo.log(
+            revision,
+            max_count=max_count,
+            skip=skip,
+            since=parse_since(since) if since else None,
+            paths=paths,
+        )
+        lines = (format_commit(*commit, oneline=oneline) for commit in commits)
+        if no_pager or not sys.stdout.isatty():
+            # Sem paginador a saída sai à medida que os commits são visitados
+            for text in lines:
+                click.echo(text, nl=False)
+        else:
+            os.environ.setdefault("LESS", "FRX")
+            click.echo_via_pager(lines)
+    except ValueError as e:
+        click.echo(f"❗️ {e}")
+
+
+@cli.command()
+@click.pass_context
+def status(ctx):
+    """Mostra o estado do worktree e do índice em relação ao HEAD"""
+    from core.storage import Repo
+
+    repo = Repo('.')
+    if not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    st = repo.status()
+    if st.branch:
+        click.echo(f"Na branch {st.branch}")
+    else:
+        click.echo("HEAD detached")
+    if st.merging:
+        click.echo("⚠️ Merge em andamento: resolva os conflitos e faça commit.")
+    if st.rebasing:
+        click.echo("⚠️ Rebase em andamento: resolva os conflitos e use 'dee rebase --continue'.")
+    sections = [
+        ("Mudanças para commit:", [f"{kind}: {path}" for kind, path in st.staged]),
+        ("Conflitos não resolvidos:", [f"ambos modificados: {path}" for path in st.conflicts]),
+        ("Mudanças fora do staging:", [f"{kind}: {path}" for kind, path in st.unstaged]),
+        ("Arquivos não rastreados:", st.untracked),
+    ]
+    for title, lines in sections:
+        if lines:
+            click.echo(f"\n{title}")
+            for line in lines:
+                click.echo(f"    {line}")
+    if st.is_clean():
+        click.echo("✅ Nada para commitar, worktree limpo")
+
+
+@cli.command()
+@click.pass_context
+def watch(ctx):
+    """Monitora o worktree (inotify) para acelerar status e add"""
+    from operations.watcher import Watcher
+    from core.storage import Repo
+    repo = Repo('.')
+    if not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    try:
+        watcher = Watcher(repo)
+    except OSError as e:
+        click.echo(f"❗️ Monitor indisponível: {e}")
+        return
+    click.echo(f"👀 Monitorando {repo.path} (Ctrl+C para parar)")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.argument("key")
+@click.argument("value", required=False)
+@click.option("--user", "user_level", is_flag=True, help="Grava em ~/.deeconfig em vez de .dee/config.")
+@click.pass_context
+def config(ctx, key, value, user_level):
+    """Lê ou grava uma opção de configuração (ex.: remote.url)"""
+    from core.config import USER_CONFIG, config_get, config_set
+    from core.storage import Repo
+    repo = Repo('.')
+    path = USER_CONFIG if user_level else repo.config_file
+    if not user_level and not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    try:
+        if value is None:
+            current = config_get(repo.config(), key)
+            if current is not None:
+                click.echo(current)
+            return
+        config_set(path, key, value)
+    except ValueError as e:
+        click.echo(f"❗️ {e}")
 
 
 @cli.command()
 @click.pass_context
 def current(ctx):
     """Mostra a branch atual"""
+    from core.storage import Repo
+
     repo = Repo('.')
     if not repo.is_initialized():
         click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
@@ -203,6 +417,8 @@ def pull(ctx, repo_id=None):
     Puxa as alterações do repositório remoto e atualiza seu worktree.
     Se for o primeiro pull, repo_id é obrigatório.
     """
+    from core.storage import Repo
+
     repo = Repo(".")
     if not repo.is_initialized():
         click.echo("❗️ Repositório não inicializado. Execute 'dee init .' primeiro.")
@@ -221,6 +437,85 @@ def pull(ctx, repo_id=None):
         click.echo(f"❗️ Erro ao executar pull: {e}")
 
 
+@cli.command()
+@click.option("--kernels", is_flag=True,
+              help="Mostra qual implementação dos kernels está ativa e o tempo de aquecimento.")
+@click.pass_context
+def doctor(ctx, kernels):
+    """Diagnóstico do ambiente do dee."""
+    if not kernels:
+        click.echo("Use: dee doctor --kernels")
+        return
+    from optmizations.kernels import report
+
+    info = report()
+    if info["backend"] == "numba":
+        origin = "cache em disco" if info["cache_hit"] else "compilados agora e gravados no cache"
+        click.echo(f"✅ Kernels: Numba {info['numba_version']} ({origin})")
+    else:
+        click.echo("⚠️ Kernels: NumPy puro (fallback)")
+        if info["fallback_reason"]:
+            click.echo(f"   Motivo: {info['fallback_reason']}")
+    click.echo(f"   Cache: {info['cache_dir']} ({info['cached_files']} arquivo(s))")
+    click.echo(f"   Importação: {info['import_time'] * 1000:.1f} ms")
+    for name, elapsed in info["warm_up"]:
+        click.echo(f"   {name}: {elapsed * 1000:.1f} ms")
+
+
+@cli.group(name="daemon")
+def daemon_group():
+    """Daemon do repositório: mantém índice, objetos e kernels em memória"""
+
+
+@daemon_group.command(name="start")
+@click.option("--idle-timeout", type=click.IntRange(min=1), default=None,
+              help="Segundos sem comandos até o daemon encerrar (padrão: daemon.idle_timeout ou 600)")
+def daemon_start(idle_timeout):
+    """Inicia o daemon em segundo plano"""
+    from cli import daemon
+    from core.storage import Repo
+    repo = Repo('.')
+    if not repo.is_initialized():
+        click.echo("Repositório não inicializado. Execute 'dee init .' primeiro.")
+        return
+    try:
+        pid = daemon.start(repo, idle_timeout)
+    except (OSError, ValueError) as e:
+        click.echo(f"❗️ {e}")
+        return
+    click.echo(f"✅ Daemon ativo (pid {pid})")
+
+
+@daemon_group.command(name="stop")
+def daemon_stop():
+    """Encerra o daemon"""
+    from cli import daemon
+    from core.storage import Repo
+    if daemon.stop(Repo('.')):
+        click.echo("✅ Daemon encerrado")
+    else:
+        click.echo("Nenhum daemon ativo.")
+
+
+@daemon_group.command(name="status")
+def daemon_status():
+    """Mostra se o daemon está ativo e o uso dos caches"""
+    from cli import daemon
+    from core.storage import Repo
+    info = daemon.request(Repo('.').repo_dir, "ping")
+    if info is None:
+        click.echo("Nenhum daemon ativo.")
+        return
+    stats = info["cache"]
+    click.echo(f"pid: {info['pid']}")
+    click.echo(f"ativo há: {info['uptime']:.0f}s (encerra após {info['idle_timeout']:.0f}s ocioso)")
+    click.echo(f"comandos atendidos: {info['commands']}")
+    click.echo(
+        f"objetos em cache: {stats['objects']} ({stats['object_bytes'] / 1024:.0f} KiB), "
+        f"acertos: {stats['hits']}, faltas: {stats['misses']}"
+    )
+    click.echo(f"leituras do índice: {stats['index_reloads']}")
+
 
 cli.add_command(add)
 cli.add_command(branch)
@@ -229,4 +524,5 @@ cli.add_command(checkout)
 cli.add_command(merge)
 cli.add_command(rebase)
 cli.add_command(token)
-cli.add_command(clone)
\ No newline at end of file
+cli.add_command(clone)
+
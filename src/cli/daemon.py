@@ -0,0 +1,337 @@
+"""Daemon opcional por repositório (``dee daemon start``).
+
+Um processo residente escuta em ``.dee/daemon.sock`` e executa os comandos
+locais (``COMMANDS``) no lugar do CLI, mantendo entre uma chamada e outra o
+índice decodificado, um LRU de objetos (``core.cache``) e os kernels já
+compilados. O CLI vira um cliente fino: envia os argumentos, repassa a
+saída à medida que chega e sai com o mesmo código. Sem daemon (socket
+ausente ou morto, ``DEE_NO_DAEMON`` definido) o comando roda no próprio
+processo, como sempre.
+
+O daemon encerra sozinho após ``daemon.idle_timeout`` segundos sem
+receber comandos. Protocolo: mensagens msgpack precedidas do tamanho
+(``<I``); a resposta a ``run`` é uma sequência de ``{"out"|"err": texto}``
+terminada por ``{"exit": código}``.
+"""
+import io
+import os
+import sys
+import time
+import socket
+import struct
+
+
+SOCKET_NAME = "daemon.sock"
+PID_NAME = "daemon.pid"
+LOG_NAME = "daemon.log"
+# Encerramento por inatividade quando ``daemon.idle_timeout`` não está configurado
+DEFAULT_IDLE_TIMEOUT = 10 * 60
+# Espera máxima pelo daemon ficar pronto em ``start``/encerrar em ``stop``
+START_TIMEOUT = 15
+# Comandos locais atendidos pelo daemon; os de rede, init, clone etc.
+# rodam sempre no processo do CLI
+COMMANDS = {
+    "add", "commit", "status", "diff", "branch", "branches", "checkout",
+    "merge", "rebase", "current", "repack",
+}
+# Saída acumulada antes de ser enviada ao cliente
+OUTPUT_BUFFER = 64 * 1024
+
+_FRAME = struct.Struct("<I")
+
+# True dentro do processo do daemon: os comandos não são reencaminhados
+serving = False
+
+
+def _socket_path(repo_dir):
+    # Caminho relativo: o limite de ~108 bytes do AF_UNIX não depende de
+    # quão fundo o repositório está
+    return os.path.relpath(os.path.join(repo_dir, SOCKET_NAME))
+
+
+def _send(sock, message):
+    import msgpack
+
+    data = msgpack.packb(message)
+    sock.sendall(_FRAME.pack(len(data)) + data)
+
+
+def _recv(sock):
+    import msgpack
+
+    header = _recv_exact(sock, _FRAME.size)
+    if header is None:
+        return None
+    (size,) = _FRAME.unpack(header)
+    data = _recv_exact(sock, size)
+    if data is None:
+        return None
+    return msgpack.unpackb(data)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _connect(repo_dir):
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = _socket_path(repo_dir)
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        # Socket de um daemon que morreu sem limpar
+        sock.close()
+        return None
+    return sock
+
+
+def forward(argv, repo_dir=".dee"):
+    """Executa ``argv`` no daemon do repositório atual.
+
+    Retorna o código de saída, ou None se não há daemon ativo (o chamador
+    executa o comando no próprio processo).
+    """
+    if serving or os.getenv("DEE_NO_DAEMON"):
+        return None
+    sock = _connect(repo_dir)
+    if sock is None:
+        return None
+    with sock:
+        _send(sock, {"op": "run", "argv": list(argv)})
+        while True:
+            message = _recv(sock)
+            if message is None:
+                # O comando pode ter rodado em parte: não é repetido aqui
+                print("❗️ O daemon encerrou durante o comando", file=sys.stderr)
+                return 1
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+
+
+def request(repo_dir, op):
+    """Envia ``op`` (``ping``/``stop``) ao daemon; None se ele não está ativo."""
+    sock = _connect(repo_dir)
+    if sock is None:
+        return None
+    with sock:
+        try:
+            _send(sock, {"op": op})
+            return _recv(sock)
+        except OSError:
+            return None
+
+
+def start(repo, idle_timeout=None):
+    """Inicia o daemon de ``repo`` em segundo plano; retorna o pid.
+
+    Se já houver um daemon ativo, retorna o pid dele.
+    """
+    import subprocess
+
+    running = request(repo.repo_dir, "ping")
+    if running is not None:
+        return running["pid"]
+    if idle_timeout is None:
+        from core.config import config_get
+
+        idle_timeout = int(config_get(repo.config(), "daemon.idle_timeout", DEFAULT_IDLE_TIMEOUT))
+    with open(os.path.join(repo.repo_dir, LOG_NAME), "ab") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "cli.daemon", repo.path, str(idle_timeout)],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        running = request(repo.repo_dir, "ping")
+        if running is not None:
+            return running["pid"]
+        time.sleep(0.05)
+    raise OSError(f"O daemon não respondeu; veja {os.path.join(repo.repo_dir, LOG_NAME)}")
+
+
+def stop(repo):
+    """Encerra o daemon de ``repo``; False se não havia daemon ativo."""
+    if request(repo.repo_dir, "stop") is None:
+        return False
+    path = _socket_path(repo.repo_dir)
+    deadline = time.monotonic() + START_TIMEOUT
+    while os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return True
+
+
+class _Channel(io.TextIOBase):
+    """``sys.stdout``/``sys.stderr`` do daemon: envia o texto ao cliente.
+
+    Se o cliente desconectar (ex.: ``dee diff | head``), o resto da saída é
+    descartado mas o comando vai até o fim, para não deixar o repositório
+    pela metade.
+    """
+
+    def __init__(self, conn, kind):
+        super().__init__()
+        self.conn = conn
+        self.kind = kind
+        self.parts = []
+        self.size = 0
+        self.closed_by_client = False
+
+    def write(self, text):
+        # Recusar bytes como um arquivo de texto faz o click escrever texto
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_BUFFER:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if not self.parts:
+            return
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        if self.closed_by_client:
+            return
+        try:
+            _send(self.conn, {self.kind: text})
+        except OSError:
+            self.closed_by_client = True
+
+    def isatty(self):
+        return False
+
+    def writable(self):
+        return True
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+
+def _run(conn, argv):
+    import contextlib
+    import traceback
+    from cli.commands import cli
+
+    out = _Channel(conn, "out")
+    err = _Channel(conn, "err")
+    code = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            cli.main(args=argv, prog_name="dee", standalone_mode=True)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            # Um comando com erro não derruba o daemon
+            traceback.print_exc()
+            code = 1
+    out.flush()
+    err.flush()
+    if not out.closed_by_client:
+        try:
+            _send(conn, {"exit": code})
+        except OSError:
+            pass
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(repo_path, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Laço principal do daemon: um comando por vez, até ficar ocioso."""
+    import signal
+    from core import cache
+    from optmizations import kernels
+
+    global serving
+    serving = True
+    os.chdir(repo_path)
+    repo_dir = os.path.join(repo_path, ".dee")
+    cache.enable()
+    # Compila (ou carrega do cache) os kernels antes do primeiro comando
+    kernels.warm_up()
+
+    path = _socket_path(repo_dir)
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+    server.settimeout(idle_timeout)
+    pid_path = os.path.join(repo_dir, PID_NAME)
+    with open(pid_path, "w") as f:
+        f.write(str(os.getpid()))
+    signal.signal(signal.SIGTERM, _interrupt)
+    started = time.time()
+    commands = 0
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+            with conn:
+                conn.settimeout(None)
+                try:
+                    message = _recv(conn)
+                except OSError:
+                    continue
+                if message is None:
+                    continue
+                op = message.get("op")
+                if op == "run":
+                    commands += 1
+                    _run(conn, message.get("argv", []))
+                    # Um comando pode ter mudado de diretório
+                    os.chdir(repo_path)
+                elif op == "ping":
+                    _send(conn, {
+                        "pid": os.getpid(),
+                        "uptime": time.time() - started,
+                        "commands": commands,
+                        "idle_timeout": idle_timeout,
+                        "cache": cache.current().stats(),
+                    })
+                elif op == "stop":
+                    _send(conn, {"pid": os.getpid()})
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        for leftover in (path, pid_path):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    # Roda pelo módulo importado (não por ``__main__``), para que os comandos
+    # vejam ``serving`` e não reencaminhem para o próprio daemon
+    from cli import daemon
+
+    daemon.serve(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_IDLE_TIMEOUT)
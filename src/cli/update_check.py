@@ -0,0 +1,94 @@
+"""Aviso de nova versão sem atrasar os comandos.
+
+A consulta ao GitHub roda num processo separado (``python -m
+cli.update_check``) que grava o resultado em cache; cada execução do ``dee``
+só lê esse cache e, se ele estiver vencido, dispara uma nova consulta em
+segundo plano. O aviso aparece numa execução seguinte.
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+from core.config import user_cache_dir
+
+
+VERSION = "0.1.17"
+RELEASES_URL = "https://api.github.com/repos/wendrewdevelop/dee/releases/latest"
+# Intervalo entre consultas ao GitHub
+CHECK_TTL = 24 * 60 * 60
+
+
+def cache_file():
+    return user_cache_dir("update-check.json")
+
+
+def _load_cache():
+    try:
+        with open(cache_file(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(data):
+    path = cache_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _version_tuple(version):
+    return tuple(int(part) if part.isdigit() else 0 for part in version.split("."))
+
+
+def check_for_updates():
+    """Mostra o aviso guardado no cache e agenda nova consulta se vencido."""
+    if os.getenv("DEE_DISABLE_UPDATE_CHECK"):
+        return
+
+    cache = _load_cache()
+    latest = cache.get("latest", "")
+    if latest and _version_tuple(latest) > _version_tuple(VERSION):
+        print(
+            f"\n🆕 Uma nova versão do dee está disponível: {latest}\n"
+            "  Atualize com:\n"
+            "    curl -sL https://github.com/wendrewdevelop/dee/"
+            "releases/latest/download/install.sh | bash\n"
+        )
+
+    if time.time() - cache.get("checked_at", 0) < CHECK_TTL:
+        return
+    try:
+        # Marca a tentativa antes de disparar: execuções em sequência não
+        # abrem uma consulta cada, e offline só se tenta de novo após o TTL
+        _save_cache({**cache, "checked_at": time.time()})
+        subprocess.Popen(
+            [sys.executable, "-m", "cli.update_check"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        # Se falhar, segue sem avisar
+        pass
+
+
+def refresh():
+    """Consulta o GitHub e grava a versão mais recente no cache."""
+    import requests
+
+    resp = requests.get(RELEASES_URL, timeout=10)
+    resp.raise_for_status()
+    latest = resp.json().get("tag_name", "").lstrip("v")
+    _save_cache({"checked_at": time.time(), "latest": latest})
+
+
+if __name__ == "__main__":
+    try:
+        refresh()
+    except Exception:
+        pass
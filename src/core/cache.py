@@ -0,0 +1,100 @@
+"""Caches que sobrevivem entre comandos dentro do daemon (``dee daemon``).
+
+Fora do daemon ``current()`` é None e nada é guardado: cada execução do
+``dee`` lê tudo do disco, como sempre. Dentro dele:
+
+- objetos (endereçados pelo conteúdo, portanto imutáveis) ficam num LRU
+  limitado em bytes;
+- o índice decodificado fica em memória e cada comando recebe uma cópia
+  (``Index.fork``). Antes de entregá-la, inode, tamanho e mtime do índice e
+  do journal são conferidos: se outro processo gravou o repositório, o
+  índice é relido (ou só o journal, se a base não mudou).
+"""
+import os
+from collections import OrderedDict
+
+
+# Memória máxima ocupada pelos objetos em cache
+OBJECT_CACHE_BYTES = 64 << 20
+# Objetos maiores que isso não entram no cache
+OBJECT_MAX_SIZE = 1 << 20
+
+_current = None
+
+
+def current():
+    return _current
+
+
+def enable(max_bytes=OBJECT_CACHE_BYTES):
+    global _current
+    _current = WarmCache(max_bytes)
+    return _current
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class WarmCache:
+    def __init__(self, max_bytes=OBJECT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._objects = OrderedDict()
+        self._size = 0
+        # caminho do índice -> (assinatura da base, do journal, Index)
+        self._indexes = {}
+        self.hits = 0
+        self.misses = 0
+        self.index_reloads = 0
+
+    def get_object(self, obj_hash):
+        data = self._objects.get(obj_hash)
+        if data is None:
+            self.misses += 1
+            return None
+        self._objects.move_to_end(obj_hash)
+        self.hits += 1
+        return data
+
+    def put_object(self, obj_hash, data):
+        if len(data) > OBJECT_MAX_SIZE or obj_hash in self._objects:
+            return
+        self._objects[obj_hash] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, old = self._objects.popitem(last=False)
+            self._size -= len(old)
+
+    def index(self, path, load):
+        """Cópia do índice de ``path``; ``load()`` lê do disco quando preciso.
+
+        As assinaturas são tiradas antes da leitura: se o arquivo mudar no
+        meio, a próxima chamada vê a diferença e relê.
+        """
+        base = _signature(path)
+        journal = _signature(f"{path}.journal")
+        cached = self._indexes.get(path)
+        if cached is not None and cached[0] == base:
+            index = cached[2]
+            if cached[1] != journal:
+                index.reload_journal()
+        else:
+            if cached is not None:
+                cached[2].close()
+            index = load()
+            self.index_reloads += 1
+        self._indexes[path] = (base, journal, index)
+        return index.fork()
+
+    def stats(self):
+        return {
+            "objects": len(self._objects),
+            "object_bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "index_reloads": self.index_reloads,
+        }
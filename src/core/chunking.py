@@ -0,0 +1,91 @@
+"""Blobs grandes divididos em pedaços definidos pelo conteúdo.
+
+Com ``chunking.threshold`` configurado, arquivos a partir desse tamanho são
+cortados pelo FastCDC (``optmizations.numba_utils.cdc_cuts``) no ``dee
+add``. Cada pedaço é um blob comum, endereçado pelo próprio SHA-1: pedaços
+iguais entre arquivos e versões são gravados uma única vez. O blob do
+arquivo continua sendo o SHA-1 do conteúdo inteiro (índice, árvores e
+status não mudam), mas o que o store guarda nesse hash é um manifesto:
+
+    CHUNKED_MAGIC + msgpack {"hash": sha1_do_conteúdo, "size": n,
+                             "chunks": [[sha1_binário, tamanho], ...]}
+
+O hash embutido distingue um manifesto de um arquivo que por acaso comece
+com o magic (ele teria que conter o próprio SHA-1).
+"""
+import msgpack
+
+
+CHUNKED_MAGIC = b"\0dee-chunks\0"
+# Tamanho médio dos pedaços quando ``chunking.avg_size`` não está configurado
+DEFAULT_AVG_SIZE = 1 << 20
+MIN_AVG_SIZE = 4 << 10
+MAX_AVG_SIZE = 64 << 20
+# Bytes lidos por vez no corte em streaming (no mínimo dois pedaços máximos)
+CDC_BUFFER = 16 << 20
+
+_UNITS = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+
+def parse_size(value):
+    """``"64m"`` -> 67108864; aceita bytes ou sufixos k/m/g."""
+    text = str(value).strip().lower().rstrip("b")
+    unit = _UNITS.get(text[-1:], 1)
+    if unit != 1:
+        text = text[:-1]
+    try:
+        return int(text) * unit
+    except ValueError:
+        raise ValueError(f"Tamanho inválido: {value} (use bytes ou sufixo k/m/g)")
+
+
+def chunking_params(threshold, avg_size=None):
+    """Parâmetros do corte a partir da configuração; None se desligado.
+
+    ``threshold`` vem de ``chunking.threshold`` (ausente ou 0 = desligado) e
+    ``avg_size`` de ``chunking.avg_size``, arredondado para potência de 2.
+    Os pedaços ficam entre ``avg/4`` e ``avg*8``.
+    """
+    if threshold in (None, ""):
+        return None
+    threshold = parse_size(threshold)
+    if threshold <= 0:
+        return None
+    avg = parse_size(avg_size) if avg_size not in (None, "") else DEFAULT_AVG_SIZE
+    if not MIN_AVG_SIZE <= avg <= MAX_AVG_SIZE:
+        raise ValueError(
+            f"chunking.avg_size inválido: {avg_size} (de {MIN_AVG_SIZE >> 10}k a {MAX_AVG_SIZE >> 20}m)"
+        )
+    avg = 1 << (avg.bit_length() - 1)
+    return {"threshold": threshold, "min": avg // 4, "avg": avg, "max": avg * 8}
+
+
+def encode_manifest(content_hash, size, chunks):
+    """Manifesto de um arquivo: ``chunks`` é ``[(hash_hex, tamanho)]`` em ordem."""
+    return CHUNKED_MAGIC + msgpack.packb({
+        "hash": content_hash,
+        "size": size,
+        "chunks": [[bytes.fromhex(h), n] for h, n in chunks],
+    })
+
+
+def parse_manifest(obj_hash, data):
+    """``[(hash_hex, tamanho)]`` se ``data`` é o manifesto de ``obj_hash``; senão None."""
+    if data[:len(CHUNKED_MAGIC)] != CHUNKED_MAGIC:
+        return None
+    try:
+        manifest = msgpack.unpackb(bytes(data[len(CHUNKED_MAGIC):]))
+        if manifest.get("hash") != obj_hash:
+            return None
+        chunks = [(raw.hex(), n) for raw, n in manifest["chunks"]]
+        if sum(n for _, n in chunks) != manifest.get("size"):
+            return None
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    return chunks
+
+
+def is_manifest_file(path):
+    """True se o arquivo do store começa com o magic (confirmar com ``parse_manifest``)."""
+    with open(path, "rb") as f:
+        return f.read(len(CHUNKED_MAGIC)) == CHUNKED_MAGIC
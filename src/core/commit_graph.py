@@ -0,0 +1,287 @@
+import os
+import mmap
+import heapq
+import struct
+import tempfile
+
+
+GRAPH_MAGIC = b"DCGR"
+GRAPH_VERSION = 1
+NO_PARENT = 0xFFFFFFFF
+# Commits acumulados no arquivo de cauda antes de reescrever o grafo inteiro
+TAIL_LIMIT = 1024
+
+_HEADER = struct.Struct("<4sII")
+_FANOUT = struct.Struct("<256I")
+# Por commit: posição do 1º pai, do 2º pai, número de geração, timestamp
+_NODE = struct.Struct("<IIId")
+# Registro da cauda: hash, 1º pai, 2º pai (zeros = ausente), geração, timestamp
+_TAIL = struct.Struct("<20s20s20sId")
+_SHA_SIZE = 20
+_NULL_SHA = b"\0" * _SHA_SIZE
+
+# Marcas usadas nas caminhadas pelo grafo
+_FROM_A = 1
+_FROM_B = 2
+_STALE = 4
+
+
+class CommitGraph:
+    """Grafo de commits binário em ``.dee/commit-graph``.
+
+    O arquivo base é ordenado por hash, com tabela de fanout, e mapeado em
+    memória: cada commit guarda as posições dos pais e o número de geração
+    (1 + maior geração dos pais). Commits novos vão para um arquivo de cauda
+    (``commit-graph.tail``) que é incorporado ao base a cada ``TAIL_LIMIT``
+    commits. As consultas usam apenas posições inteiras e nunca abrem os
+    objetos de commit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tail_path = path + ".tail"
+        self._mm = None
+        self.base_count = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.base_count = _HEADER.unpack_from(self._mm, 0)
+            if magic != GRAPH_MAGIC or version != GRAPH_VERSION:
+                raise ValueError(f"commit-graph inválido: {path}")
+            self._fanout = _FANOUT.unpack_from(self._mm, _HEADER.size)
+            self._shas_start = _HEADER.size + _FANOUT.size
+            self._nodes_start = self._shas_start + self.base_count * _SHA_SIZE
+
+        # Cauda: poucos commits, carregados em listas
+        self._tail_shas = []
+        self._tail_pos = {}
+        self._tail_nodes = []
+        if os.path.exists(self.tail_path):
+            with open(self.tail_path, "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % _TAIL.size
+            for offset in range(0, usable, _TAIL.size):
+                self._load_tail_record(*_TAIL.unpack_from(data, offset))
+
+    def _load_tail_record(self, sha, parent1, parent2, generation, timestamp):
+        parents = []
+        for parent in (parent1, parent2):
+            if parent != _NULL_SHA:
+                pos = self._lookup_bytes(parent)
+                parents.append(NO_PARENT if pos is None else pos)
+        while len(parents) < 2:
+            parents.append(NO_PARENT)
+        pos = self.base_count + len(self._tail_shas)
+        self._tail_shas.append(sha)
+        self._tail_pos[sha] = pos
+        self._tail_nodes.append((parents[0], parents[1], generation, timestamp))
+
+    def __len__(self):
+        return self.base_count + len(self._tail_shas)
+
+    def _base_sha(self, pos):
+        start = self._shas_start + pos * _SHA_SIZE
+        return self._mm[start:start + _SHA_SIZE]
+
+    def _lookup_bytes(self, sha):
+        pos = self._tail_pos.get(sha)
+        if pos is not None:
+            return pos
+        if not self.base_count:
+            return None
+        first = sha[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._base_sha(mid)
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def lookup(self, hexsha):
+        """Posição do commit no grafo, ou None se ele ainda não foi registrado."""
+        return self._lookup_bytes(bytes.fromhex(hexsha))
+
+    def _node(self, pos):
+        if pos >= self.base_count:
+            return self._tail_nodes[pos - self.base_count]
+        return _NODE.unpack_from(self._mm, self._nodes_start + pos * _NODE.size)
+
+    def _sha_at(self, pos):
+        if pos >= self.base_count:
+            return self._tail_shas[pos - self.base_count]
+        return self._base_sha(pos)
+
+    def hexsha(self, pos):
+        return self._sha_at(pos).hex()
+
+    def parents(self, pos):
+        parent1, parent2, _, _ = self._node(pos)
+        return [p for p in (parent1, parent2) if p != NO_PARENT]
+
+    def generation(self, pos):
+        return self._node(pos)[2]
+
+    def timestamp(self, pos):
+        return self._node(pos)[3]
+
+    def append(self, hexsha, parent_hashes, timestamp):
+        """Registra um commit cujos pais já estão no grafo."""
+        if len(parent_hashes) > 2:
+            raise ValueError("commit-graph suporta no máximo dois pais por commit")
+        sha = bytes.fromhex(hexsha)
+        if self._lookup_bytes(sha) is not None:
+            return
+        parent_shas = [bytes.fromhex(p) for p in parent_hashes]
+        generation = 1
+        for parent in parent_shas:
+            pos = self._lookup_bytes(parent)
+            if pos is None:
+                raise KeyError(f"Pai {parent.hex()} ausente do commit-graph")
+            generation = max(generation, self.generation(pos) + 1)
+        while len(parent_shas) < 2:
+            parent_shas.append(_NULL_SHA)
+        record = _TAIL.pack(sha, parent_shas[0], parent_shas[1], generation, timestamp)
+        with open(self.tail_path, "ab") as f:
+            f.write(record)
+        self._load_tail_record(*_TAIL.unpack(record))
+        if len(self._tail_shas) >= TAIL_LIMIT:
+            self.compact()
+
+    def compact(self):
+        """Incorpora a cauda ao arquivo base (reescrito ordenado por hash)."""
+        nodes = []
+        for pos in range(len(self)):
+            parent1, parent2, generation, timestamp = self._node(pos)
+            parents = [self._sha_at(p) if p != NO_PARENT else None for p in (parent1, parent2)]
+            nodes.append((self._sha_at(pos), parents, generation, timestamp))
+        nodes.sort(key=lambda n: n[0])
+        positions = {sha: i for i, (sha, _, _, _) in enumerate(nodes)}
+
+        fanout = [0] * 256
+        for sha, _, _, _ in nodes:
+            fanout[sha[0]] += 1
+        for i in range(1, 256):
+            fanout[i] += fanout[i - 1]
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".tmp-graph-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, len(nodes)))
+            f.write(_FANOUT.pack(*fanout))
+            for sha, _, _, _ in nodes:
+                f.write(sha)
+            for _, parents, generation, timestamp in nodes:
+                p1, p2 = (positions[p] if p is not None else NO_PARENT for p in parents)
+                f.write(_NODE.pack(p1, p2, generation, timestamp))
+        os.chmod(tmp_path, 0o644)
+        if self._mm is not None:
+            self._mm.close()
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.tail_path):
+            os.remove(self.tail_path)
+        self.__init__(self.path)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def is_ancestor(self, ancestor, descendant):
+        """True se ``ancestor`` é alcançável a partir de ``descendant``.
+
+        A busca descarta qualquer commit com geração menor ou igual à do
+        ancestral procurado, que não pode levar até ele.
+        """
+        if ancestor == descendant:
+            return True
+        target_gen = self.generation(ancestor)
+        if target_gen >= self.generation(descendant):
+            return False
+        stack = [descendant]
+        seen = {descendant}
+        while stack:
+            for parent in self.parents(stack.pop()):
+                if parent == ancestor:
+                    return True
+                if parent not in seen and self.generation(parent) > target_gen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return False
+
+    def merge_bases(self, a, b):
+        """Melhores ancestrais comuns de ``a`` e ``b`` (posições), mais recentes primeiro."""
+        if self.is_ancestor(a, b):
+            return [a]
+        if self.is_ancestor(b, a):
+            return [b]
+        results = []
+        both = _FROM_A | _FROM_B
+        flags = {a: _FROM_A, b: _FROM_B}
+        heap = [(-self.generation(a), a), (-self.generation(b), b)]
+        heapq.heapify(heap)
+        done = set()
+        while heap and any(not flags[pos] & _STALE for _, pos in heap):
+            _, pos = heapq.heappop(heap)
+            if pos in done:
+                continue
+            done.add(pos)
+            mark = flags[pos]
+            if mark & both == both and not mark & _STALE:
+                results.append(pos)
+                mark |= _STALE
+                flags[pos] = mark
+            for parent in self.parents(pos):
+                current = flags.get(parent, 0)
+                if current | mark != current:
+                    flags[parent] = current | mark
+                    heapq.heappush(heap, (-self.generation(parent), parent))
+        # Descarta candidatos que são ancestrais de outros candidatos
+        return [
+            pos for pos in results
+            if not any(other != pos and self.is_ancestor(pos, other) for other in results)
+        ]
+
+    def ahead_behind(self, a, b):
+        """Quantos commits ``a`` tem que ``b`` não tem, e vice-versa."""
+        ahead = behind = 0
+        for _, mark in self._exclusive(a, b):
+            if mark == _FROM_A:
+                ahead += 1
+            else:
+                behind += 1
+        return ahead, behind
+
+    def only_in(self, a, b):
+        """Commits alcançáveis de ``a`` e não de ``b`` (posições), dos mais
+        antigos para os mais novos (pais sempre antes dos filhos)."""
+        found = [pos for pos, mark in self._exclusive(a, b) if mark == _FROM_A]
+        return sorted(found, key=lambda pos: (self.generation(pos), self.timestamp(pos)))
+
+    def _exclusive(self, a, b):
+        # Gera (posição, marca) dos commits alcançáveis só de ``a`` ou só de ``b``
+        both = _FROM_A | _FROM_B
+        flags = {a: _FROM_A}
+        flags[b] = flags.get(b, 0) | _FROM_B
+        heap = [(-self.generation(pos), pos) for pos in {a, b}]
+        heapq.heapify(heap)
+        done = set()
+        # Para quando só restam commits comuns na fila: os ancestrais deles
+        # também são comuns.
+        while heap and any(flags[pos] != both for _, pos in heap):
+            _, pos = heapq.heappop(heap)
+            if pos in done:
+                continue
+            done.add(pos)
+            mark = flags[pos]
+            if mark != both:
+                yield pos, mark
+            for parent in self.parents(pos):
+                current = flags.get(parent, 0)
+                if current | mark != current:
+                    flags[parent] = current | mark
+                    heapq.heappush(heap, (-self.generation(parent), parent))
@@ -0,0 +1,188 @@
+import os
+import mmap
+import struct
+import tempfile
+import msgpack
+
+
+META_MAGIC = b"DCMI"
+META_VERSION = 1
+# Registros acumulados fora do índice antes de reescrevê-lo
+TAIL_LIMIT = 1024
+
+# Índice: magic, versão, número de commits, bytes do arquivo de dados cobertos
+_HEADER = struct.Struct("<4sIIQ")
+_FANOUT = struct.Struct("<256I")
+_OFFSET = struct.Struct("<Q")
+# Registro no arquivo de dados: hash, tamanho do msgpack que vem em seguida
+_RECORD = struct.Struct("<20sI")
+_SHA_SIZE = 20
+
+
+def decode_commit_header(data):
+    """Campos de um commit serializado, sem decodificar o índice embutido.
+
+    Commits antigos guardam o índice inteiro em ``files``: o valor dessa
+    chave é pulado no próprio buffer, sem criar nenhum objeto Python.
+    """
+    unpacker = msgpack.Unpacker(strict_map_key=False)
+    unpacker.feed(data)
+    header = {}
+    for _ in range(unpacker.read_map_header()):
+        key = unpacker.unpack()
+        if key == "files":
+            unpacker.skip()
+        else:
+            header[key] = unpacker.unpack()
+    return header
+
+
+class CommitMeta:
+    """Cache dos metadados de commits em ``.dee/commit-meta`` (``dee log``).
+
+    Guarda só o que o histórico mostra: timestamp, árvore raiz e mensagem.
+    Os registros são acrescentados ao fim de ``commit-meta``; o índice
+    ``commit-meta.idx`` (fanout, hashes ordenados e offsets, mapeado em
+    memória) cobre o arquivo até ``indexed_size`` e o que vem depois forma a
+    cauda, lida na abertura e incorporada ao índice a cada ``TAIL_LIMIT``
+    registros, como no commit-graph. Pais e gerações ficam no commit-graph.
+
+    Tudo aqui é derivado dos objetos de commit: um registro ausente (commit
+    recebido num pull, cache apagado) é gravado na primeira leitura.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._mm = None
+        self.count = 0
+        indexed_size = 0
+        data_size = os.path.getsize(path) if os.path.exists(path) else 0
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > 0:
+            with open(self.index_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.count, indexed_size = _HEADER.unpack_from(self._mm, 0)
+            if magic != META_MAGIC or version != META_VERSION:
+                raise ValueError(f"commit-meta inválido: {self.index_path}")
+            if indexed_size > data_size:
+                # Índice de um arquivo de dados que não existe mais. É apagado:
+                # depois que os registros forem regravados o arquivo volta a
+                # crescer e os offsets antigos apontariam para outros commits
+                self._mm.close()
+                self._mm = None
+                self.count = indexed_size = 0
+                os.remove(self.index_path)
+            else:
+                self._fanout = _FANOUT.unpack_from(self._mm, _HEADER.size)
+                self._shas_start = _HEADER.size + _FANOUT.size
+                self._offsets_start = self._shas_start + self.count * _SHA_SIZE
+        self.indexed_size = indexed_size
+
+        # Cauda: poucos registros, carregados num dicionário
+        self._tail = {}
+        self._end = indexed_size
+        self._data = open(path, "rb") if data_size else None
+        if self._data is not None:
+            self._load_tail()
+
+    def _load_tail(self):
+        self._data.seek(self.indexed_size)
+        data = self._data.read()
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            sha, size = _RECORD.unpack_from(data, offset)
+            if offset + _RECORD.size + size > len(data):
+                # Registro incompleto de uma gravação interrompida
+                break
+            self._tail[sha] = self.indexed_size + offset
+            offset += _RECORD.size + size
+        self._end = self.indexed_size + offset
+
+    def __len__(self):
+        return self.count + len(self._tail)
+
+    def _base_sha(self, pos):
+        start = self._shas_start + pos * _SHA_SIZE
+        return self._mm[start:start + _SHA_SIZE]
+
+    def _lookup(self, sha):
+        offset = self._tail.get(sha)
+        if offset is not None or not self.count:
+            return offset
+        first = sha[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._base_sha(mid)
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return _OFFSET.unpack_from(self._mm, self._offsets_start + mid * _OFFSET.size)[0]
+        return None
+
+    def get(self, hexsha):
+        """``(timestamp, árvore, mensagem)`` do commit, ou None se não está no cache."""
+        offset = self._lookup(bytes.fromhex(hexsha))
+        if offset is None:
+            return None
+        self._data.seek(offset)
+        _, size = _RECORD.unpack(self._data.read(_RECORD.size))
+        timestamp, tree, message = msgpack.unpackb(self._data.read(size))
+        return timestamp, tree, message
+
+    def add(self, hexsha, timestamp, tree, message):
+        sha = bytes.fromhex(hexsha)
+        if self._lookup(sha) is not None:
+            return
+        payload = msgpack.packb([timestamp, tree, message])
+        record = _RECORD.pack(sha, len(payload)) + payload
+        with open(self.path, "ab") as f:
+            if f.tell() != self._end:
+                # Descarta o registro incompleto deixado por uma gravação interrompida
+                f.truncate(self._end)
+            f.write(record)
+        if self._data is None:
+            self._data = open(self.path, "rb")
+        self._tail[sha] = self._end
+        self._end += len(record)
+        if len(self._tail) >= TAIL_LIMIT:
+            self.compact()
+
+    def compact(self):
+        """Reescreve o índice cobrindo todos os registros (base + cauda)."""
+        entries = [
+            (self._base_sha(pos), _OFFSET.unpack_from(self._mm, self._offsets_start + pos * _OFFSET.size)[0])
+            for pos in range(self.count)
+        ]
+        entries.extend(self._tail.items())
+        entries.sort()
+
+        fanout = [0] * 256
+        for sha, _ in entries:
+            fanout[sha[0]] += 1
+        for i in range(1, 256):
+            fanout[i] += fanout[i - 1]
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".tmp-meta-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(META_MAGIC, META_VERSION, len(entries), self._end))
+            f.write(_FANOUT.pack(*fanout))
+            for sha, _ in entries:
+                f.write(sha)
+            for _, offset in entries:
+                f.write(_OFFSET.pack(offset))
+        os.chmod(tmp_path, 0o644)
+        self.close()
+        os.replace(tmp_path, self.index_path)
+        self.__init__(self.path)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._data is not None:
+            self._data.close()
+            self._data = None
@@ -0,0 +1,46 @@
+import os
+import configparser
+
+
+# Configuração do usuário, lida antes da do repositório (que tem prioridade)
+USER_CONFIG = os.path.join(os.path.expanduser("~"), ".deeconfig")
+
+
+def user_cache_dir(*parts):
+    """Diretório de cache do usuário (``$XDG_CACHE_HOME/dee``), não criado."""
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "dee", *parts)
+
+
+def _split_key(key):
+    section, _, option = key.rpartition(".")
+    if not section or not option:
+        raise ValueError(f"Chave de configuração inválida: {key} (use seção.opção)")
+    return section, option
+
+
+def load_config(repo_config=None, include_user=True):
+    """Lê ``~/.deeconfig`` e, se informado, o ``.dee/config`` do repositório."""
+    config = configparser.ConfigParser(interpolation=None)
+    paths = [USER_CONFIG] if include_user else []
+    if repo_config:
+        paths.append(repo_config)
+    config.read(paths, encoding="utf-8")
+    return config
+
+
+def config_get(config, key, default=None):
+    section, option = _split_key(key)
+    return config.get(section, option, fallback=default)
+
+
+def config_set(path, key, value):
+    """Grava ``seção.opção = valor`` em ``path`` (só esse arquivo)."""
+    section, option = _split_key(key)
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(path, encoding="utf-8")
+    if not config.has_section(section):
+        config.add_section(section)
+    config.set(section, option, value)
+    with open(path, "w", encoding="utf-8") as f:
+        config.write(f)
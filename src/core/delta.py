@@ -0,0 +1,106 @@
+"""Codificação delta entre versões de um blob.
+
+Um delta é uma sequência de instruções aplicadas sobre um objeto base:
+
+- ``COPY offset length``: copia ``length`` bytes da base a partir de ``offset``;
+- ``INSERT length data``: insere ``length`` bytes literais.
+
+O cabeçalho traz os tamanhos da base e do resultado (varints), o que permite
+validar a reconstrução.
+"""
+
+_OP_COPY = 0x01
+_OP_INSERT = 0x02
+
+# Tamanho dos blocos da base indexados para encontrar cópias
+BLOCK_SIZE = 16
+# Comprimento mínimo de uma cópia que compensa o custo da instrução
+MIN_COPY = BLOCK_SIZE
+
+
+def _encode_varint(value, out):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _decode_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def create_delta(base, target, max_size=None):
+    """Gera o delta que transforma ``base`` em ``target``.
+
+    A busca das cópias roda no kernel ``optmizations.numba_utils.delta_ops``
+    (rolling hash sobre os blocos da base); aqui só as instruções são
+    codificadas. Retorna None se o delta passar de ``max_size`` bytes (não
+    compensa).
+    """
+    import numpy as np
+    from optmizations.numba_utils import delta_ops, DELTA_COPY, DELTA_MAX_INSERT
+
+    ops = delta_ops(
+        np.frombuffer(base, dtype=np.uint8),
+        np.frombuffer(target, dtype=np.uint8),
+        BLOCK_SIZE,
+        MIN_COPY,
+        -1 if max_size is None else max_size,
+    )
+    if ops is None:
+        return None
+    target = memoryview(target)
+    out = bytearray()
+    _encode_varint(len(base), out)
+    _encode_varint(len(target), out)
+    for op, first, second in ops.tolist():
+        if op == DELTA_COPY:
+            out.append(_OP_COPY)
+            _encode_varint(first, out)
+            _encode_varint(second, out)
+            continue
+        while first < second:
+            # Limita cada inserção para manter os varints curtos
+            stop = min(second, first + DELTA_MAX_INSERT)
+            out.append(_OP_INSERT)
+            _encode_varint(stop - first, out)
+            out.extend(target[first:stop])
+            first = stop
+    return bytes(out)
+
+
+def apply_delta(base, delta):
+    """Reconstrói o objeto alvo aplicando ``delta`` sobre ``base``."""
+    base_size, pos = _decode_varint(delta, 0)
+    target_size, pos = _decode_varint(delta, pos)
+    if base_size != len(base):
+        raise ValueError("Delta incompatível com o objeto base")
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op == _OP_COPY:
+            offset, pos = _decode_varint(delta, pos)
+            length, pos = _decode_varint(delta, pos)
+            out += base[offset:offset + length]
+        elif op == _OP_INSERT:
+            length, pos = _decode_varint(delta, pos)
+            out += delta[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"Instrução de delta inválida: {op}")
+    if len(out) != target_size:
+        raise ValueError("Delta produziu tamanho inesperado")
+    return bytes(out)
@@ -1,18 +1,23 @@
 import hashlib
-from numba import jit, prange
+import numpy as np
+from optmizations.numba_utils import adler32_batch
 
 
 def hash_blob(data: bytes) -> str:
     header = f"blob {len(data)}\0".encode()
     full = header + data
-    
-    return hashlib.shal(full).hexdigest()
 
+    return hashlib.sha1(full).hexdigest()
 
-@jit(nopython=True, parallel=True)
-def compute_hash_batch(data_list):
-    out = [0] * len(data_list)
-    for i prange(len(data_list)):
-        out[i] = data_list[i] * 2
 
-    return out
\ No newline at end of file
+def pack_buffers(data_list):
+    """Concatena vários ``bytes`` num buffer uint8 contíguo com offsets."""
+    offsets = np.zeros(len(data_list) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in data_list])
+    buffer = np.frombuffer(b"".join(data_list), dtype=np.uint8)
+    return buffer, offsets
+
+
+def compute_checksum_batch(data_list):
+    buffer, offsets = pack_buffers(data_list)
+    return adler32_batch(buffer, offsets)
@@ -0,0 +1,427 @@
+"""Índice binário do staging (``.dee/index``), mapeado com mmap.
+
+Formato (little-endian, versão 1):
+
+- cabeçalho ``<4sIIQQ``: magic ``DIDX``, versão, número de entradas,
+  tamanho da tabela de caminhos e tamanho da extensão de conflitos;
+- tabela de entradas de largura fixa, ordenada por caminho: offset e
+  tamanho do caminho, hash (20 bytes), modo, flags, dados de stat e
+  checksum;
+- tabela de caminhos (UTF-8, separados por ``\\0``);
+- extensão de conflitos (msgpack ``{caminho: {base, ours, theirs}}``).
+
+Abrir o índice só mapeia o arquivo: as entradas são decodificadas sob
+demanda (busca binária por caminho). Alterações vão para um journal
+(``.dee/index.journal``) com registros absolutos (caminho -> entrada ou
+remoção), reaplicados na abertura; quando o journal cresce demais, o índice
+é reescrito inteiro (compactação) e o journal é apagado.
+"""
+import os
+import mmap
+import time
+import heapq
+import struct
+import msgpack
+from collections.abc import MutableMapping
+
+
+INDEX_MAGIC = b"DIDX"
+INDEX_VERSION = 1
+
+# Compacta quando o journal passa de max(JOURNAL_MIN_COMPACT, entradas / JOURNAL_RATIO)
+JOURNAL_MIN_COMPACT = 1024
+JOURNAL_RATIO = 8
+# Buscas direto no mmap antes de montar o mapa caminho -> posição
+# (varreduras completas fazem uma busca por arquivo)
+MMAP_LOOKUPS = 64
+
+_HEADER = struct.Struct("<4sIIQQ")
+# offset, tamanho do caminho, hash, modo, flags, mtime, ctime, size, ino, dev, checksum
+_ENTRY = struct.Struct("<II20sIBqqQQQI")
+
+_HAS_STAT = 1
+_HAS_CHECKSUM = 2
+
+
+class IndexEntry:
+    """Entrada do índice: blob, modo, dados de stat e conflito (se houver)."""
+
+    __slots__ = ("hash", "mode", "mtime_ns", "ctime_ns", "size", "ino", "dev", "checksum", "conflict")
+
+    def __init__(self, blob_hash, mode=0o644, st=None, checksum=None, conflict=None):
+        self.hash = blob_hash
+        self.mode = mode
+        self.checksum = checksum
+        self.conflict = conflict
+        if st is not None:
+            self.set_stat(st)
+        else:
+            self.mtime_ns = self.ctime_ns = self.size = self.ino = self.dev = None
+
+    def set_stat(self, st):
+        # Dados de stat usados pelo cache do índice (como no git)
+        self.mtime_ns = st.st_mtime_ns
+        self.ctime_ns = st.st_ctime_ns
+        self.size = st.st_size
+        self.ino = st.st_ino
+        self.dev = st.st_dev
+
+    def smudge(self):
+        # Descarta o stat: o arquivo volta a ser comparado pelo conteúdo
+        self.mtime_ns = self.ctime_ns = self.size = self.ino = self.dev = None
+
+    def _fields(self):
+        return [self.hash, self.mode, self.mtime_ns, self.ctime_ns, self.size,
+                self.ino, self.dev, self.checksum, self.conflict]
+
+    @classmethod
+    def _from_fields(cls, fields):
+        entry = cls.__new__(cls)
+        (entry.hash, entry.mode, entry.mtime_ns, entry.ctime_ns, entry.size,
+         entry.ino, entry.dev, entry.checksum, entry.conflict) = fields
+        return entry
+
+    @classmethod
+    def from_legacy(cls, meta):
+        """Converte uma entrada do antigo ``index.msgpack`` (dict)."""
+        mode = meta.get("mode")
+        return cls._from_fields([
+            meta["hash"],
+            int(mode, 8) if isinstance(mode, str) else (mode or 0o644),
+            meta.get("mtime_ns"), meta.get("ctime_ns"), meta.get("size"),
+            meta.get("ino"), meta.get("dev"), meta.get("checksum"), meta.get("conflict"),
+        ])
+
+    def __repr__(self):
+        return f"IndexEntry({self.hash!r}, mode={oct(self.mode)})"
+
+
+def _unpack_entry(record, conflicts, path):
+    _, _, raw_hash, mode, flags, mtime, ctime, size, ino, dev, checksum = record
+    entry = IndexEntry.__new__(IndexEntry)
+    entry.hash = raw_hash.hex()
+    entry.mode = mode
+    if flags & _HAS_STAT:
+        entry.mtime_ns, entry.ctime_ns, entry.size, entry.ino, entry.dev = mtime, ctime, size, ino, dev
+    else:
+        entry.mtime_ns = entry.ctime_ns = entry.size = entry.ino = entry.dev = None
+    entry.checksum = checksum if flags & _HAS_CHECKSUM else None
+    entry.conflict = conflicts.get(path) if conflicts else None
+    return entry
+
+
+def write_index(path, entries):
+    """Grava ``entries`` (pares caminho -> IndexEntry) num índice novo em ``path``.
+
+    A escrita vai para um temporário renomeado no final; o journal, se
+    existir, é apagado depois (seus registros já estão no arquivo novo).
+    """
+    items = sorted(entries.items() if hasattr(entries, "items") else entries)
+    table = bytearray(_ENTRY.size * len(items))
+    names = []
+    conflicts = {}
+    offset = 0
+    for i, (rel_path, entry) in enumerate(items):
+        name = rel_path.encode()
+        flags = 0
+        if entry.mtime_ns is not None:
+            flags |= _HAS_STAT
+        if entry.checksum is not None:
+            flags |= _HAS_CHECKSUM
+        if entry.conflict:
+            conflicts[rel_path] = entry.conflict
+        _ENTRY.pack_into(
+            table, i * _ENTRY.size,
+            offset, len(name), bytes.fromhex(entry.hash), entry.mode or 0, flags,
+            entry.mtime_ns or 0, entry.ctime_ns or 0, entry.size or 0,
+            entry.ino or 0, entry.dev or 0, entry.checksum or 0,
+        )
+        names.append(name)
+        offset += len(name) + 1
+    strtab = b"\0".join(names)
+    ext = msgpack.packb(conflicts) if conflicts else b""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(items), len(strtab), len(ext)))
+        f.write(table)
+        f.write(strtab)
+        f.write(ext)
+    os.replace(tmp_path, path)
+    journal_path = f"{path}.journal"
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+class Index(MutableMapping):
+    """Índice do staging como mapeamento caminho -> ``IndexEntry``.
+
+    A base fica no arquivo mapeado; ``_overlay`` guarda o que veio do
+    journal e o que foi alterado nesta sessão (None = removido) e
+    ``_dirty`` o que ainda não foi gravado. Entradas lidas da base são
+    guardadas em ``_cache`` para que alterações no objeto retornado sejam
+    vistas nas leituras seguintes; para gravá-las, atribua de volta
+    (``index[caminho] = entrada``).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self._load()
+
+    def _load(self):
+        self.mtime_ns = None
+        self._mmap = None
+        self._count = 0
+        self._table_start = _HEADER.size
+        self._strtab_start = _HEADER.size
+        self._base_paths = None
+        self._positions = None
+        self._conflicts = {}
+        self._overlay = {}
+        self._cache = {}
+        self._dirty = {}
+        self._journal_records = 0
+        self._lookups = 0
+        # Base emprestada de outro objeto (``fork``): não é fechada aqui
+        self._shared = False
+        self._open_base()
+        self._base_mtime_ns = self.mtime_ns
+        self._replay_journal()
+
+    def _open_base(self):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            self.mtime_ns = st.st_mtime_ns
+            if st.st_size < _HEADER.size:
+                raise ValueError(f"Índice inválido: {self.path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, strtab_size, ext_size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Índice inválido ou de versão desconhecida: {self.path}")
+        self._count = count
+        self._strtab_start = self._table_start + count * _ENTRY.size
+        self._strtab_size = strtab_size
+        if ext_size:
+            ext_start = self._strtab_start + strtab_size
+            self._conflicts = msgpack.unpackb(self._mmap[ext_start:ext_start + ext_size])
+
+    def _replay_journal(self):
+        try:
+            with open(self.journal_path, "rb") as f:
+                st = os.fstat(f.fileno())
+                data = f.read()
+        except FileNotFoundError:
+            return
+        self.mtime_ns = max(self.mtime_ns or 0, st.st_mtime_ns)
+        unpacker = msgpack.Unpacker(strict_map_key=False)
+        unpacker.feed(data)
+        try:
+            for rel_path, fields in unpacker:
+                self._overlay[rel_path] = IndexEntry._from_fields(fields) if fields is not None else None
+                self._journal_records += 1
+        except (ValueError, msgpack.UnpackException):
+            # Registro final truncado (escrita interrompida): é descartado
+            pass
+
+    def close(self):
+        if self._mmap is not None:
+            if not self._shared:
+                self._mmap.close()
+            self._mmap = None
+
+    def fork(self):
+        """Cópia independente que compartilha a base mapeada.
+
+        Usada pelo daemon para entregar a cada comando o índice já
+        carregado: a base (e o dicionário de posições, construído aqui uma
+        vez) é só leitura; overlay e entradas do journal são copiados, para
+        que alterações na cópia não vazem para este objeto.
+        """
+        if self._count and self._positions is None:
+            self._positions = {path: i for i, path in enumerate(self._paths())}
+        other = object.__new__(Index)
+        other.__dict__.update(self.__dict__)
+        other._overlay = {
+            rel_path: IndexEntry._from_fields(entry._fields()) if entry is not None else None
+            for rel_path, entry in self._overlay.items()
+        }
+        other._cache = {}
+        other._dirty = {}
+        other._shared = True
+        return other
+
+    def reload_journal(self):
+        """Relê só o journal, mantendo a base mapeada (que não mudou)."""
+        self.mtime_ns = self._base_mtime_ns
+        self._overlay = {}
+        self._cache = {}
+        self._dirty = {}
+        self._journal_records = 0
+        self._replay_journal()
+
+    # Base mapeada
+
+    def _base_path_bytes(self, i):
+        offset, length = struct.unpack_from("<II", self._mmap, self._table_start + i * _ENTRY.size)
+        start = self._strtab_start + offset
+        return self._mmap[start:start + length]
+
+    def _base_find(self, rel_path):
+        # Posição do caminho na tabela ordenada; -1 se não existir. As
+        # primeiras buscas são binárias, comparando bytes no mmap; a partir
+        # daí compensa decodificar os caminhos uma vez num dicionário.
+        if self._positions is not None:
+            return self._positions.get(rel_path, -1)
+        self._lookups += 1
+        if self._lookups > MMAP_LOOKUPS:
+            self._positions = {path: i for i, path in enumerate(self._paths())}
+            return self._positions.get(rel_path, -1)
+        key = rel_path.encode()
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._base_path_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._base_path_bytes(lo) == key:
+            return lo
+        return -1
+
+    def _base_entry(self, i, rel_path):
+        record = _ENTRY.unpack_from(self._mmap, self._table_start + i * _ENTRY.size)
+        return _unpack_entry(record, self._conflicts, rel_path)
+
+    def _paths(self):
+        if self._base_paths is None:
+            if not self._count:
+                self._base_paths = []
+            else:
+                start = self._strtab_start
+                self._base_paths = self._mmap[start:start + self._strtab_size].decode().split("\0")
+        return self._base_paths
+
+    # Mapeamento
+
+    def __getitem__(self, rel_path):
+        if rel_path in self._overlay:
+            entry = self._overlay[rel_path]
+            if entry is None:
+                raise KeyError(rel_path)
+            return entry
+        entry = self._cache.get(rel_path)
+        if entry is None:
+            i = self._base_find(rel_path) if self._count else -1
+            if i < 0:
+                raise KeyError(rel_path)
+            entry = self._cache[rel_path] = self._base_entry(i, rel_path)
+        return entry
+
+    def __contains__(self, rel_path):
+        if rel_path in self._overlay:
+            return self._overlay[rel_path] is not None
+        return rel_path in self._cache or (self._count > 0 and self._base_find(rel_path) >= 0)
+
+    def __setitem__(self, rel_path, entry):
+        self._overlay[rel_path] = entry
+        self._dirty[rel_path] = entry
+
+    def __delitem__(self, rel_path):
+        if rel_path not in self:
+            raise KeyError(rel_path)
+        self._overlay[rel_path] = None
+        self._dirty[rel_path] = None
+
+    def __len__(self):
+        count = self._count
+        for rel_path, entry in self._overlay.items():
+            in_base = self._count > 0 and self._base_find(rel_path) >= 0
+            count += (entry is not None) - in_base
+        return count
+
+    def __iter__(self):
+        if not self._overlay:
+            yield from self._paths()
+            return
+        last = None
+        for rel_path in heapq.merge(self._paths(), sorted(self._overlay)):
+            if rel_path == last:
+                continue
+            last = rel_path
+            if rel_path in self._overlay and self._overlay[rel_path] is None:
+                continue
+            yield rel_path
+
+    def items(self):
+        return _ItemsView(self)
+
+    # Gravação
+
+    def save(self):
+        """Grava as alterações pendentes: no journal ou, se ele já estiver
+        grande, compactando tudo num índice novo.
+
+        Entradas com mtime no segundo da gravação (ou depois) perdem o stat
+        (``smudge``), como no git: uma edição no mesmo segundo não muda o
+        mtime, e o stat só seria desconfiado enquanto o índice fosse o mais
+        recente; depois da próxima gravação pareceria limpo.
+        """
+        if not self._dirty:
+            return
+        now_s = time.time_ns() // 10**9
+        for entry in self._dirty.values():
+            if entry is not None and entry.mtime_ns is not None and entry.mtime_ns // 10**9 >= now_s:
+                entry.smudge()
+        limit = max(JOURNAL_MIN_COMPACT, self._count // JOURNAL_RATIO)
+        if self._journal_records + len(self._dirty) > limit:
+            self.compact()
+            return
+        packer = msgpack.Packer()
+        with open(self.journal_path, "ab") as f:
+            f.write(b"".join(
+                packer.pack([rel_path, entry._fields() if entry is not None else None])
+                for rel_path, entry in self._dirty.items()
+            ))
+        self._journal_records += len(self._dirty)
+        self._dirty.clear()
+        self.mtime_ns = os.stat(self.journal_path).st_mtime_ns
+
+    def compact(self):
+        """Reescreve o índice inteiro (base + journal) e apaga o journal."""
+        entries = list(self.items())
+        self.close()
+        write_index(self.path, entries)
+        self._load()
+
+
+class _ItemsView:
+    # Itera a base registro a registro (struct.iter_unpack), sem buscas
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        index = self._index
+        overlay = index._overlay
+        base = ()
+        if index._count:
+            table = memoryview(index._mmap)[index._table_start:index._strtab_start]
+            base = zip(index._paths(), _ENTRY.iter_unpack(table))
+        pending = sorted(p for p, e in overlay.items() if e is not None)
+        pos = 0
+        for rel_path, record in base:
+            while pos < len(pending) and pending[pos] < rel_path:
+                yield pending[pos], overlay[pending[pos]]
+                pos += 1
+            if rel_path in overlay:
+                continue
+            entry = index._cache.get(rel_path)
+            yield rel_path, entry if entry is not None else _unpack_entry(record, index._conflicts, rel_path)
+        for rel_path in pending[pos:]:
+            yield rel_path, overlay[rel_path]
@@ -0,0 +1,292 @@
+"""Armazenamento de objetos endereçados pelo conteúdo.
+
+``ObjectStore`` é a interface usada pelo ``Repo`` (blobs em um store,
+árvores e commits em outro). Há dois backends:
+
+- ``LooseObjectStore``: um arquivo por objeto, em subdiretórios pelos dois
+  primeiros caracteres do hash (``ab/cdef...``), para que nenhum diretório
+  acumule centenas de milhares de entradas. Arquivos do layout antigo
+  (plano, ``<hash>`` direto na raiz) continuam legíveis;
+- ``SQLiteObjectStore``: uma tabela num banco SQLite em modo WAL, com
+  inserções em lote numa única transação.
+
+Os packs (``core.pack``) ficam por cima dos dois, como camada só de leitura.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+
+
+# Tamanho do prefixo usado como subdiretório no store solto
+SHARD_PREFIX = 2
+# A partir de quantos hashes ``has_many`` lista os subdiretórios em vez de
+# fazer um stat por objeto
+LISTDIR_THRESHOLD = 64
+# Hashes por consulta ``IN (...)`` no SQLite (limite de parâmetros: 999)
+SQLITE_BATCH = 500
+# Bloco de cópia de ``put_file`` no SQLite (o arquivo não é lido inteiro)
+SQLITE_BLOB_CHUNK = 1 << 20
+
+BACKENDS = ("loose", "sqlite")
+
+
+class ObjectStore:
+    """Interface comum aos backends de objetos."""
+
+    def has(self, obj_hash):
+        raise NotImplementedError
+
+    def has_many(self, hashes):
+        """Subconjunto de ``hashes`` presente no store."""
+        return {obj_hash for obj_hash in hashes if self.has(obj_hash)}
+
+    def get(self, obj_hash):
+        """Conteúdo do objeto; FileNotFoundError se não existir."""
+        raise NotImplementedError
+
+    def put(self, obj_hash, data):
+        raise NotImplementedError
+
+    def put_many(self, items):
+        """Grava vários ``(hash, dados)`` de uma vez."""
+        for obj_hash, data in items:
+            self.put(obj_hash, data)
+
+    def temp_file(self):
+        """``(fd, caminho)`` de um temporário para gravar um objeto em streaming."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return tempfile.mkstemp(dir=self.tmp_dir, prefix=".tmp-")
+
+    def put_file(self, obj_hash, tmp_path):
+        """Move para o store um temporário criado por ``temp_file``."""
+        raise NotImplementedError
+
+    def path(self, obj_hash):
+        """Caminho do objeto no disco, se o backend guardar um arquivo por objeto."""
+        return None
+
+    def iter(self):
+        """Itera os hashes armazenados."""
+        raise NotImplementedError
+
+    def remove(self, obj_hash):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LooseObjectStore(ObjectStore):
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = root
+
+    def _path(self, obj_hash):
+        return os.path.join(self.root, obj_hash[:SHARD_PREFIX], obj_hash[SHARD_PREFIX:])
+
+    def path(self, obj_hash):
+        path = self._path(obj_hash)
+        if os.path.exists(path):
+            return path
+        legacy = os.path.join(self.root, obj_hash)
+        return legacy if os.path.exists(legacy) else None
+
+    def has(self, obj_hash):
+        return self.path(obj_hash) is not None
+
+    def has_many(self, hashes):
+        hashes = set(hashes)
+        if len(hashes) < LISTDIR_THRESHOLD:
+            return super().has_many(hashes)
+        # Uma listagem por subdiretório (no máximo 256) em vez de um stat por objeto
+        by_prefix = {}
+        for obj_hash in hashes:
+            by_prefix.setdefault(obj_hash[:SHARD_PREFIX], []).append(obj_hash)
+        found = set()
+        try:
+            legacy = set(os.listdir(self.root))
+        except FileNotFoundError:
+            return found
+        for prefix, group in by_prefix.items():
+            try:
+                names = set(os.listdir(os.path.join(self.root, prefix))) if prefix in legacy else set()
+            except NotADirectoryError:
+                names = set()
+            found.update(h for h in group if h[SHARD_PREFIX:] in names or h in legacy)
+        return found
+
+    def get(self, obj_hash):
+        for path in (self._path(obj_hash), os.path.join(self.root, obj_hash)):
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(f"Objeto não encontrado: {obj_hash}")
+
+    def put(self, obj_hash, data):
+        if self.has(obj_hash):
+            return
+        fd, tmp_path = self.temp_file()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.put_file(obj_hash, tmp_path)
+
+    def put_file(self, obj_hash, tmp_path):
+        try:
+            if self.has(obj_hash):
+                os.remove(tmp_path)
+                return
+            path = self._path(obj_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # mkstemp cria com 0600; objetos seguem a permissão padrão
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def iter(self):
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir() and len(entry.name) == SHARD_PREFIX:
+                for name in os.listdir(entry.path):
+                    if not name.startswith("."):
+                        yield entry.name + name
+            elif entry.is_file():
+                # Layout antigo, sem subdiretório
+                yield entry.name
+
+    def remove(self, obj_hash):
+        path = self.path(obj_hash)
+        if path is not None:
+            os.remove(path)
+
+
+class SQLiteObjectStore(ObjectStore):
+    """Objetos na tabela ``table`` do banco ``path`` (modo WAL).
+
+    Cada thread (ou processo) usa a própria conexão; o objeto pode ser
+    enviado a workers de um pool de processos, que reabrem a conexão.
+    """
+
+    def __init__(self, path, table):
+        self.path_db = path
+        self.table = table
+        self.tmp_dir = os.path.join(os.path.dirname(path), "tmp")
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"path_db": self.path_db, "table": self.table, "tmp_dir": self.tmp_dir}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path_db, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (hash TEXT PRIMARY KEY, data BLOB NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def has(self, obj_hash):
+        row = self._conn().execute(
+            f"SELECT 1 FROM {self.table} WHERE hash = ?", (obj_hash,)
+        ).fetchone()
+        return row is not None
+
+    def has_many(self, hashes):
+        hashes = list(set(hashes))
+        found = set()
+        conn = self._conn()
+        for start in range(0, len(hashes), SQLITE_BATCH):
+            batch = hashes[start:start + SQLITE_BATCH]
+            rows = conn.execute(
+                f"SELECT hash FROM {self.table} WHERE hash IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update(row[0] for row in rows)
+        return found
+
+    def get(self, obj_hash):
+        row = self._conn().execute(
+            f"SELECT data FROM {self.table} WHERE hash = ?", (obj_hash,)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Objeto não encontrado: {obj_hash}")
+        return bytes(row[0])
+
+    def put(self, obj_hash, data):
+        self.put_many([(obj_hash, data)])
+
+    def put_many(self, items):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (hash, data) VALUES (?, ?)", items
+            )
+
+    def put_file(self, obj_hash, tmp_path):
+        # Reserva a linha com zeroblob(tamanho) e copia o arquivo em blocos
+        # pelo handle incremental: o objeto nunca fica inteiro na memória
+        conn = self._conn()
+        try:
+            with open(tmp_path, "rb") as f, conn:
+                cursor = conn.execute(
+                    f"INSERT OR IGNORE INTO {self.table} (hash, data) VALUES (?, zeroblob(?))",
+                    (obj_hash, os.fstat(f.fileno()).st_size),
+                )
+                if cursor.rowcount == 0:
+                    return
+                with conn.blobopen(self.table, "data", cursor.lastrowid) as blob:
+                    while True:
+                        chunk = f.read(SQLITE_BLOB_CHUNK)
+                        if not chunk:
+                            break
+                        blob.write(chunk)
+        finally:
+            os.remove(tmp_path)
+
+    def iter(self):
+        for (obj_hash,) in self._conn().execute(f"SELECT hash FROM {self.table}").fetchall():
+            yield obj_hash
+
+    def remove(self, obj_hash):
+        conn = self._conn()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE hash = ?", (obj_hash,))
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_object_stores(backend, repo_dir):
+    """``(blobs, objetos)`` do repositório para o backend configurado."""
+    if backend == "sqlite":
+        db_path = os.path.join(repo_dir, "objects.sqlite3")
+        return SQLiteObjectStore(db_path, "blobs"), SQLiteObjectStore(db_path, "objects")
+    if backend == "loose":
+        return (
+            LooseObjectStore(os.path.join(repo_dir, "staging")),
+            LooseObjectStore(os.path.join(repo_dir, "objects")),
+        )
+    raise ValueError(f"Backend de objetos desconhecido: {backend} (use {' ou '.join(BACKENDS)})")
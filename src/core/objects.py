@@ -1,5 +1,6 @@
 import fnmatch
-import sqlite3
+import posixpath
+import msgpack
 
 
 def is_excluded(path, excludes):
@@ -9,3 +10,143 @@ def is_excluded(path, excludes):
     return False
 
 
+# Tipos de entrada de uma árvore
+BLOB = "blob"
+TREE = "tree"
+
+
+def serialize_tree(entries):
+    """Serializa uma árvore: lista ``[nome, tipo, hash, modo]`` ordenada por nome."""
+    return msgpack.packb({"entries": sorted(entries)})
+
+
+def parse_tree(data):
+    return msgpack.unpackb(data, strict_map_key=False)["entries"]
+
+
+def is_tree_data(data):
+    obj = msgpack.unpackb(data, strict_map_key=False)
+    return isinstance(obj, dict) and "entries" in obj
+
+
+def parent_dirs(rel_path):
+    """Diretórios (relativos, com ``/``) que contêm ``rel_path``, incluindo a raiz ``""``."""
+    parts = rel_path.replace("\\", "/").split("/")[:-1]
+    dirs = [""]
+    for i in range(1, len(parts) + 1):
+        dirs.append("/".join(parts[:i]))
+    return dirs
+
+
+def build_trees(index, tree_cache, write_object):
+    """Gera as árvores de um índice plano (caminho -> ``IndexEntry``) e retorna o hash da raiz.
+
+    ``tree_cache`` mapeia diretório -> hash da árvore e é atualizado no lugar;
+    diretórios presentes no cache são reaproveitados sem serializar nada, de
+    modo que um commit com um arquivo alterado só reescreve as árvores no
+    caminho até ele. ``write_object`` grava os bytes e devolve o hash.
+    """
+    if "" in tree_cache:
+        # Raiz em cache: nenhum caminho do índice mudou desde a última montagem
+        return tree_cache[""]
+    files = {}
+    subdirs = {"": set()}
+    linked = {""}
+    for rel_path, meta in index.items():
+        rel_path = rel_path.replace("\\", "/")
+        dirname, name = posixpath.split(rel_path)
+        files.setdefault(dirname, []).append([name, BLOB, meta.hash, meta.mode])
+        # Registra o diretório e liga cada ancestral ao seu pai
+        while dirname not in linked:
+            linked.add(dirname)
+            subdirs.setdefault(dirname, set())
+            parent, child = posixpath.split(dirname)
+            subdirs.setdefault(parent, set()).add(child)
+            dirname = parent
+
+    # Diretórios mais profundos primeiro: filhos antes dos pais
+    for dirname in sorted(subdirs, key=lambda d: d.count("/") + bool(d), reverse=True):
+        if dirname in tree_cache:
+            continue
+        entries = list(files.get(dirname, []))
+        for child in subdirs[dirname]:
+            child_path = posixpath.join(dirname, child) if dirname else child
+            entries.append([child, TREE, tree_cache[child_path], None])
+        tree_cache[dirname] = write_object(serialize_tree(entries))
+
+    # Remove do cache diretórios que não existem mais
+    for dirname in list(tree_cache):
+        if dirname not in subdirs:
+            del tree_cache[dirname]
+    return tree_cache[""]
+
+
+def edit_tree(read_tree, write_object, tree_hash, edits):
+    """Aplica ``edits`` (``{caminho: (hash, modo)}``, None = remover) a uma árvore.
+
+    Só as subárvores no caminho de algum arquivo editado são lidas e
+    regravadas; as demais são reaproveitadas pelo hash. Diretórios que ficam
+    vazios somem. Retorna o hash da nova árvore, ou None se ela ficar vazia.
+    """
+    entries = {e[0]: e for e in read_tree(tree_hash)} if tree_hash else {}
+    nested = {}
+    for rel_path, value in edits.items():
+        name, sep, rest = rel_path.partition("/")
+        if sep:
+            nested.setdefault(name, {})[rest] = value
+        elif value is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = [name, BLOB, value[0], value[1]]
+    for name, sub_edits in nested.items():
+        current = entries.get(name)
+        sub_tree = current[2] if current and current[1] == TREE else None
+        new_hash = edit_tree(read_tree, write_object, sub_tree, sub_edits)
+        if new_hash is not None:
+            entries[name] = [name, TREE, new_hash, None]
+        elif sub_tree is not None:
+            # O diretório ficou vazio; um arquivo que tomou o lugar dele fica
+            entries.pop(name, None)
+    if not entries:
+        return None
+    return write_object(serialize_tree(list(entries.values())))
+
+
+def flatten_tree(read_tree, tree_hash, prefix=""):
+    """Expande uma árvore em ``{caminho: {"hash", "mode"}}``."""
+    files = {}
+    for name, kind, obj_hash, mode in read_tree(tree_hash):
+        path = f"{prefix}{name}"
+        if kind == TREE:
+            files.update(flatten_tree(read_tree, obj_hash, path + "/"))
+        else:
+            files[path] = {"hash": obj_hash, "mode": oct(mode) if mode is not None else None}
+    return files
+
+
+def diff_trees(read_tree, old_hash, new_hash, prefix=""):
+    """Compara duas árvores pulando subárvores com o mesmo hash.
+
+    Gera ``(caminho, hash_antigo, hash_novo, modo_antigo, modo_novo)`` para
+    cada arquivo diferente; hashes e modos ausentes de um dos lados são None.
+    """
+    if old_hash == new_hash:
+        return
+    old = {e[0]: e for e in read_tree(old_hash)} if old_hash else {}
+    new = {e[0]: e for e in read_tree(new_hash)} if new_hash else {}
+    for name in sorted(old.keys() | new.keys()):
+        old_entry = old.get(name)
+        new_entry = new.get(name)
+        path = f"{prefix}{name}"
+        old_tree = old_entry[2] if old_entry and old_entry[1] == TREE else None
+        new_tree = new_entry[2] if new_entry and new_entry[1] == TREE else None
+        old_blob = old_entry[2] if old_entry and old_entry[1] == BLOB else None
+        new_blob = new_entry[2] if new_entry and new_entry[1] == BLOB else None
+        if old_tree or new_tree:
+            yield from diff_trees(read_tree, old_tree, new_tree, path + "/")
+        if old_blob != new_blob or (
+            new_blob and old_entry[3] != new_entry[3]
+        ):
+            old_mode = old_entry[3] if old_blob else None
+            new_mode = new_entry[3] if new_blob else None
+            yield path, old_blob, new_blob, old_mode, new_mode
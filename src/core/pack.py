@@ -0,0 +1,322 @@
+import os
+import mmap
+import zlib
+import struct
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from core.delta import apply_delta
+
+
+# Tipos de objeto gravados no pack
+OBJ_BLOB = 1
+OBJ_COMMIT = 2
+OBJ_TREE = 3
+# Blob guardado como manifesto de pedaços (``core.chunking``). Nos packs e
+# stores ele é um blob comum; só o stream de rede usa o tipo, para conferir
+# o manifesto (que não tem o SHA-1 do próprio conteúdo)
+OBJ_CHUNKED = 4
+# Delta contra outro objeto, referenciado pelo hash (20 bytes, fora da
+# parte comprimida, para que a cadeia possa ser seguida sem descomprimir)
+OBJ_REF_DELTA = 7
+
+PACK_MAGIC = b"DPCK"
+INDEX_MAGIC = b"DPKI"
+PACK_VERSION = 1
+
+# Cabeçalho do pack: magic, versão, número de objetos
+_PACK_HEADER = struct.Struct("<4sII")
+# Cabeçalho de cada objeto: tipo, tamanho descomprimido, tamanho comprimido
+_ENTRY_HEADER = struct.Struct("<BQQ")
+# Cabeçalho do índice: magic, versão, número de objetos
+_INDEX_HEADER = struct.Struct("<4sII")
+_FANOUT = struct.Struct("<256I")
+_OFFSET = struct.Struct("<Q")
+_SHA_SIZE = 20
+
+# Limite de bytes das bases reconstruídas mantidas em cache
+DELTA_CACHE_BYTES = 64 << 20
+# Profundidade máxima de uma cadeia de deltas
+MAX_DELTA_DEPTH = 10
+# Faixa de tamanhos de blob considerados para delta
+DELTA_MIN_SIZE = 64
+DELTA_MAX_SIZE = 64 << 20
+
+
+class PackIndex:
+    """Índice de um pack, mapeado em memória.
+
+    Layout: cabeçalho, tabela de fanout com 256 contadores acumulados pelo
+    primeiro byte do hash, tabela ordenada de hashes (20 bytes cada) e tabela
+    de offsets (uint64) na mesma ordem. A busca usa o fanout para limitar o
+    intervalo e faz busca binária direto no mmap, sem syscalls por objeto.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = _INDEX_HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"Índice de pack inválido: {path}")
+        self._fanout = _FANOUT.unpack_from(self._mm, _INDEX_HEADER.size)
+        self._shas_start = _INDEX_HEADER.size + _FANOUT.size
+        self._offsets_start = self._shas_start + self.count * _SHA_SIZE
+
+    def _sha_at(self, i):
+        start = self._shas_start + i * _SHA_SIZE
+        return self._mm[start:start + _SHA_SIZE]
+
+    def find(self, sha):
+        """Retorna o offset do objeto ``sha`` (20 bytes) no pack, ou None."""
+        first = sha[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._sha_at(mid)
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return _OFFSET.unpack_from(self._mm, self._offsets_start + mid * _OFFSET.size)[0]
+        return None
+
+    def __iter__(self):
+        for i in range(self.count):
+            offset = _OFFSET.unpack_from(self._mm, self._offsets_start + i * _OFFSET.size)[0]
+            yield self._sha_at(i).hex(), offset
+
+    def close(self):
+        self._mm.close()
+
+
+class Pack:
+    """Um par ``pack-<id>.pack`` / ``pack-<id>.idx``.
+
+    ``resolver`` é chamado com o hash da base para reconstruir deltas; por
+    padrão procura só neste pack.
+    """
+
+    def __init__(self, index_path, resolver=None):
+        self.index = PackIndex(index_path)
+        self.pack_path = index_path[:-len(".idx")] + ".pack"
+        self._resolver = resolver or self.get
+        with open(self.pack_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = _PACK_HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"Pack inválido: {self.pack_path}")
+
+    def read_raw(self, offset):
+        """Lê a entrada sem resolver deltas: ``(tipo, base_ou_None, bytes)``."""
+        obj_type, size, csize = _ENTRY_HEADER.unpack_from(self._mm, offset)
+        start = offset + _ENTRY_HEADER.size
+        base = None
+        if obj_type == OBJ_REF_DELTA:
+            base = self._mm[start:start + _SHA_SIZE].hex()
+            start += _SHA_SIZE
+        data = zlib.decompress(self._mm[start:start + csize])
+        if len(data) != size:
+            raise ValueError(f"Objeto corrompido no pack {self.pack_path} (offset {offset})")
+        return obj_type, base, data
+
+    def delta_base(self, hexsha):
+        """Hash da base se o objeto estiver gravado como delta, senão None."""
+        offset = self.index.find(bytes.fromhex(hexsha))
+        if offset is None:
+            return None
+        obj_type = self._mm[offset]
+        if obj_type != OBJ_REF_DELTA:
+            return None
+        start = offset + _ENTRY_HEADER.size
+        return self._mm[start:start + _SHA_SIZE].hex()
+
+    def read_at(self, offset):
+        obj_type, base, data = self.read_raw(offset)
+        if base is None:
+            return obj_type, data
+        found = self._resolver(base)
+        if found is None:
+            raise ValueError(f"Base do delta não encontrada: {base}")
+        base_type, base_data = found
+        return base_type, apply_delta(base_data, data)
+
+    def get(self, hexsha):
+        offset = self.index.find(bytes.fromhex(hexsha))
+        if offset is None:
+            return None
+        return self.read_at(offset)
+
+    def object_types(self):
+        for hexsha, offset in self.index:
+            obj_type = self._mm[offset]
+            # Só blobs são gravados como delta
+            yield hexsha, OBJ_BLOB if obj_type == OBJ_REF_DELTA else obj_type
+
+    def __contains__(self, hexsha):
+        return self.index.find(bytes.fromhex(hexsha)) is not None
+
+    def __iter__(self):
+        for hexsha, offset in self.index:
+            obj_type, data = self.read_at(offset)
+            yield hexsha, obj_type, data
+
+    def close(self):
+        self._mm.close()
+        self.index.close()
+
+
+class _LRUCache:
+    """Cache LRU limitado pelo total de bytes armazenados.
+
+    Compartilhado pelas threads que leem objetos (ex.: o pool do checkout):
+    ``get`` e ``put`` reordenam o dicionário e passam por um lock.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items or len(value[1]) > self.max_bytes:
+                return
+            self._items[key] = value
+            self.size += len(value[1])
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class PackSet:
+    """Todos os packs de um repositório (``.dee/packs``).
+
+    Deltas são resolvidos entre packs; bases reconstruídas ficam num LRU para
+    que cadeias de deltas não sejam reaplicadas a cada leitura.
+    """
+
+    def __init__(self, packs_dir, cache_bytes=DELTA_CACHE_BYTES):
+        self.packs_dir = packs_dir
+        self.packs = []
+        self._base_cache = _LRUCache(cache_bytes)
+        if os.path.isdir(packs_dir):
+            for name in sorted(os.listdir(packs_dir)):
+                if name.startswith("pack-") and name.endswith(".idx"):
+                    self.packs.append(Pack(os.path.join(packs_dir, name), resolver=self._resolve_base))
+
+    def _resolve_base(self, hexsha):
+        cached = self._base_cache.get(hexsha)
+        if cached is not None:
+            return cached
+        found = self.get(hexsha)
+        if found is not None:
+            self._base_cache.put(hexsha, found)
+        return found
+
+    def get(self, hexsha):
+        for pack in self.packs:
+            found = pack.get(hexsha)
+            if found is not None:
+                return found
+        return None
+
+    def object_types(self):
+        """Itera ``(hexsha, tipo)`` lendo só o cabeçalho de cada entrada."""
+        for pack in self.packs:
+            yield from pack.object_types()
+
+    def __contains__(self, hexsha):
+        return any(hexsha in pack for pack in self.packs)
+
+    def __iter__(self):
+        for pack in self.packs:
+            yield from pack
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+        self.packs = []
+
+
+def write_pack(objects, packs_dir, level=zlib.Z_DEFAULT_COMPRESSION):
+    """Grava ``objects`` (iterável de ``(hexsha, tipo, bytes)``) num novo pack.
+
+    Para ``OBJ_REF_DELTA``, ``bytes`` começa com o hash binário da base.
+
+    Os objetos são comprimidos e escritos em streaming; só os pares
+    ``(sha, offset)`` ficam em memória para montar o índice. Retorna o caminho
+    do índice gerado, ou None se não havia objetos.
+    """
+    os.makedirs(packs_dir, exist_ok=True)
+    entries = {}
+    checksum = hashlib.sha1()
+    fd, tmp_pack = tempfile.mkstemp(dir=packs_dir, prefix=".tmp-pack-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0))
+            offset = _PACK_HEADER.size
+            for hexsha, obj_type, data in objects:
+                if hexsha in entries:
+                    continue
+                prefix = b""
+                if obj_type == OBJ_REF_DELTA:
+                    # ``data`` = hash da base (20 bytes) + instruções do delta
+                    prefix, data = data[:_SHA_SIZE], data[_SHA_SIZE:]
+                compressed = zlib.compress(data, level)
+                header = _ENTRY_HEADER.pack(obj_type, len(data), len(compressed))
+                f.write(header)
+                f.write(prefix)
+                f.write(compressed)
+                checksum.update(bytes.fromhex(hexsha))
+                entries[hexsha] = offset
+                offset += len(header) + len(prefix) + len(compressed)
+            # Reescreve o cabeçalho com a contagem final
+            f.seek(0)
+            f.write(_PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries)))
+        if not entries:
+            os.remove(tmp_pack)
+            return None
+
+        pack_id = checksum.hexdigest()
+        base = os.path.join(packs_dir, f"pack-{pack_id}")
+        os.chmod(tmp_pack, 0o644)
+        os.replace(tmp_pack, base + ".pack")
+        _write_index(base + ".idx", entries)
+        return base + ".idx"
+    except BaseException:
+        if os.path.exists(tmp_pack):
+            os.remove(tmp_pack)
+        raise
+
+
+def _write_index(index_path, entries):
+    shas = sorted(bytes.fromhex(h) for h in entries)
+    fanout = [0] * 256
+    for sha in shas:
+        fanout[sha[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    fd, tmp_index = tempfile.mkstemp(dir=os.path.dirname(index_path), prefix=".tmp-idx-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_INDEX_HEADER.pack(INDEX_MAGIC, PACK_VERSION, len(shas)))
+        f.write(_FANOUT.pack(*fanout))
+        for sha in shas:
+            f.write(sha)
+        for sha in shas:
+            f.write(_OFFSET.pack(entries[sha.hex()]))
+    # O índice é publicado por último: um pack só fica visível quando completo
+    os.chmod(tmp_index, 0o644)
+    os.replace(tmp_index, index_path)
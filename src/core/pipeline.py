@@ -0,0 +1,243 @@
+import os
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+_DONE = object()
+
+# Tamanho padrão dos blocos de leitura na ingestão de blobs (1 MiB)
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Arquivos menores que isso são agrupados em lotes: um único buffer contíguo
+# e uma única chamada ao kernel de checksum para o lote inteiro.
+SMALL_FILE_LIMIT = 64 * 1024
+BATCH_MAX_FILES = 512
+BATCH_MAX_BYTES = 8 << 20
+
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+
+def ingest_file(full_path, store, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê o arquivo em blocos, calcula checksum e SHA-1 e grava o blob no store.
+
+    Cada bloco atualiza o hash e o checksum incrementalmente e é copiado para
+    um arquivo temporário do ``store``, movido para o hash no final. O uso de
+    memória é O(chunk_size), independente do tamanho do arquivo. Roda dentro
+    dos workers (threads ou processos), por isso é uma função de módulo e
+    devolve apenas dados serializáveis.
+    """
+    # NumPy/Numba custam centenas de ms para importar: só quem ingere paga
+    import numpy as np
+    from optmizations.numba_utils import adler32
+
+    sha = hashlib.sha1()
+    checksum = 1
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    fd, tmp_path = store.temp_file()
+    try:
+        with open(full_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            file_stat = os.fstat(src.fileno())
+            while True:
+                n = src.readinto(buf)
+                if not n:
+                    break
+                chunk = view[:n]
+                sha.update(chunk)
+                checksum = adler32(np.frombuffer(chunk, dtype=np.uint8), checksum)
+                dst.write(chunk)
+        file_hash = sha.hexdigest()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    store.put_file(file_hash, tmp_path)
+    return file_hash, checksum, file_stat
+
+
+def ingest_chunked(full_path, store, params):
+    """Ingestão de um arquivo grande em pedaços definidos pelo conteúdo.
+
+    O arquivo é lido em janelas de ``CDC_BUFFER`` bytes; os cortes do FastCDC
+    valem até o último pedaço completo da janela e o resto é levado para a
+    próxima leitura, de modo que os cortes não dependem do tamanho da janela.
+    Os pedaços de cada janela vão para o store de uma vez (pedaços já
+    existentes não são regravados) e o manifesto, gravado no SHA-1 do
+    arquivo inteiro, vai por último.
+    """
+    import numpy as np
+    from core.chunking import CDC_BUFFER, encode_manifest
+    from optmizations.numba_utils import adler32, cdc_cuts
+
+    sha = hashlib.sha1()
+    checksum = 1
+    chunks = []
+    pending = b""
+    window = max(CDC_BUFFER, 2 * params["max"])
+    with open(full_path, "rb") as src:
+        file_stat = os.fstat(src.fileno())
+        while True:
+            block = src.read(window)
+            if block:
+                sha.update(block)
+                checksum = adler32(np.frombuffer(block, dtype=np.uint8), checksum)
+            data = pending + block
+            if not data:
+                break
+            cuts = cdc_cuts(np.frombuffer(data, dtype=np.uint8), params["min"], params["avg"], params["max"])
+            if block:
+                # O último corte da janela pode ser só o fim dos dados lidos
+                cuts = cuts[:-1]
+            pieces = {}
+            start = 0
+            for cut in cuts:
+                piece = data[start:cut]
+                piece_hash = hashlib.sha1(piece).hexdigest()
+                pieces[piece_hash] = piece
+                chunks.append((piece_hash, len(piece)))
+                start = cut
+            store.put_many(pieces.items())
+            pending = data[start:]
+            if not block:
+                break
+    file_hash = sha.hexdigest()
+    store.put(file_hash, encode_manifest(file_hash, file_stat.st_size, chunks))
+    return file_hash, checksum, file_stat
+
+
+def ingest_small_files(paths, store):
+    """Ingestão em lote de arquivos pequenos.
+
+    Lê todos os arquivos, empacota o conteúdo num buffer contíguo e calcula
+    os checksums numa única chamada a ``adler32_batch``; os blobs do lote vão
+    para o store de uma vez (uma transação no SQLite). Erros de leitura são
+    devolvidos na posição do arquivo correspondente.
+    """
+    from core.hashing import pack_buffers
+    from optmizations.numba_utils import adler32_batch
+
+    results = [None] * len(paths)
+    contents = []
+    stats = []
+    for i, full_path in enumerate(paths):
+        try:
+            with open(full_path, "rb") as f:
+                stats.append(os.fstat(f.fileno()))
+                contents.append(f.read())
+        except OSError as e:
+            results[i] = e
+            stats.append(None)
+            contents.append(b"")
+    buffer, offsets = pack_buffers(contents)
+    checksums = adler32_batch(buffer, offsets)
+    blobs = {}
+    for i, content in enumerate(contents):
+        if results[i] is not None:
+            continue
+        file_hash = hashlib.sha1(content).hexdigest()
+        blobs[file_hash] = content
+        results[i] = (file_hash, int(checksums[i]), stats[i])
+    store.put_many(blobs.items())
+    return results
+
+
+def ingest_files(paths, store, chunk_size=DEFAULT_CHUNK_SIZE, chunking=None):
+    """Worker do ``dee add``: um arquivo grande (em streaming) ou um lote de pequenos.
+
+    ``chunking`` (ver ``core.chunking.chunking_params``) liga o corte em
+    pedaços para arquivos a partir de ``chunking["threshold"]`` bytes.
+    """
+    if len(paths) == 1:
+        try:
+            if chunking and os.path.getsize(paths[0]) >= chunking["threshold"]:
+                return [ingest_chunked(paths[0], store, chunking)]
+            return [ingest_file(paths[0], store, chunk_size)]
+        except OSError as e:
+            return [e]
+    return ingest_small_files(paths, store)
+
+
+def batch_candidates(candidates, small_limit=SMALL_FILE_LIMIT):
+    """Agrupa ``(key, path, size)`` em tarefas ``(keys, paths)``.
+
+    Arquivos grandes viram tarefas individuais; os pequenos são agrupados
+    até ``BATCH_MAX_FILES`` arquivos ou ``BATCH_MAX_BYTES`` bytes.
+    """
+    keys, paths, total = [], [], 0
+    for key, path, size in candidates:
+        if size >= small_limit:
+            yield (key,), (path,)
+            continue
+        keys.append(key)
+        paths.append(path)
+        total += size
+        if len(keys) >= BATCH_MAX_FILES or total >= BATCH_MAX_BYTES:
+            yield tuple(keys), tuple(paths)
+            keys, paths, total = [], [], 0
+    if keys:
+        yield tuple(keys), tuple(paths)
+
+
+def run_pipeline(producer, worker, jobs=None, use_processes=False):
+    """Executa ``worker`` sobre os itens ``(key, arg)`` gerados por ``producer``.
+
+    O produtor roda numa thread própria e alimenta uma fila limitada; o pool
+    processa os itens em paralelo com no máximo ``2 * jobs`` tarefas em voo.
+    Retorna ``[(key, result_or_exception)]`` ordenado por ``key``, para que um
+    único escritor aplique os resultados de forma determinística.
+    """
+    jobs = max(1, jobs or default_jobs())
+    tasks = queue.Queue(maxsize=jobs * 64)
+    producer_error = []
+
+    def walk():
+        try:
+            for item in producer:
+                tasks.put(item)
+        except BaseException as e:
+            producer_error.append(e)
+        finally:
+            tasks.put(_DONE)
+
+    walker = threading.Thread(target=walk, daemon=True)
+    walker.start()
+
+    in_flight = threading.BoundedSemaphore(jobs * 2)
+    pending = []
+    if use_processes:
+        # Importa multiprocessing só quando um pool de processos é pedido
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Os workers saem de um fork server, não de um fork deste processo:
+        # depois que um kernel paralelo do Numba subiu o pool do TBB, um
+        # fork trava (o TBB não sobrevive ao fork)
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["core.pipeline"])
+        executor = ProcessPoolExecutor(max_workers=jobs, mp_context=context)
+    else:
+        executor = ThreadPoolExecutor(max_workers=jobs)
+    with executor:
+        while True:
+            item = tasks.get()
+            if item is _DONE:
+                break
+            key, arg = item
+            in_flight.acquire()
+            future = executor.submit(worker, arg)
+            future.add_done_callback(lambda _f: in_flight.release())
+            pending.append((key, future))
+
+    walker.join()
+    if producer_error:
+        raise producer_error[0]
+
+    results = []
+    for key, future in sorted(pending, key=lambda kv: kv[0]):
+        error = future.exception()
+        results.append((key, error if error is not None else future.result()))
+    return results
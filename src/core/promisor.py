@@ -0,0 +1,141 @@
+"""Estado de um clone parcial ou raso (``dee clone --depth/--filter``).
+
+Arquivos em ``.dee``:
+
+- ``promisor``: de onde buscar o que falta (diretório remoto ou ``repo_id``
+  do remoto configurado) e os prefixos do filtro de caminhos;
+- ``promised``: blobs que existem no remoto mas não foram baixados, um
+  hash por linha. São buscados em lote no primeiro acesso;
+- ``shallow``: commits cujos pais não foram baixados (fronteira do clone
+  raso). Para o commit-graph eles não têm pais.
+
+As listas só crescem e são regravadas por inteiro (temporário + rename):
+um objeto prometido que já foi baixado continua listado, e quem decide se
+ele existe é o store. Uma busca interrompida deixa gravados apenas objetos
+inteiros (cada gravação é atômica); os demais continuam prometidos.
+"""
+import os
+import tempfile
+import contextlib
+import msgpack
+
+
+PROMISOR_FILE = "promisor"
+PROMISED_FILE = "promised"
+SHALLOW_FILE = "shallow"
+
+
+def parse_filter(value):
+    """Prefixos de ``--filter=a/,b`` normalizados (sem barras nas pontas)."""
+    prefixes = []
+    for part in (value or "").split(","):
+        part = part.strip().strip("/")
+        if part and part not in prefixes:
+            prefixes.append(part)
+    return tuple(prefixes)
+
+
+def _read_hashes(path):
+    try:
+        with open(path) as f:
+            return set(f.read().split())
+    except FileNotFoundError:
+        return set()
+
+
+def _write_hashes(path, hashes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("".join(f"{h}\n" for h in sorted(hashes)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Promisor:
+    def __init__(self, repo_dir, state):
+        self.repo_dir = repo_dir
+        self.remote_dir = state.get("remote")
+        self.repo_id = state.get("repo_id")
+        self.prefixes = tuple(state.get("filter") or ())
+        self._promised = None
+        self._shallow = None
+        self._locations = None
+
+    @classmethod
+    def load(cls, repo_dir):
+        """Estado do repositório, ou None se ele não é um clone parcial."""
+        try:
+            with open(os.path.join(repo_dir, PROMISOR_FILE), "rb") as f:
+                state = msgpack.unpackb(f.read())
+        except FileNotFoundError:
+            return None
+        return cls(repo_dir, state)
+
+    @classmethod
+    def create(cls, repo_dir, remote_dir=None, repo_id=None, prefixes=()):
+        state = {"remote": remote_dir, "repo_id": repo_id, "filter": list(prefixes)}
+        with open(os.path.join(repo_dir, PROMISOR_FILE), "wb") as f:
+            f.write(msgpack.packb(state))
+        return cls(repo_dir, state)
+
+    def covers(self, rel_path):
+        """True se ``rel_path`` está no filtro (sem filtro, todo caminho está)."""
+        if not self.prefixes:
+            return True
+        return any(rel_path == p or rel_path.startswith(p + "/") for p in self.prefixes)
+
+    def is_promised(self, obj_hash):
+        if self._promised is None:
+            self._promised = _read_hashes(os.path.join(self.repo_dir, PROMISED_FILE))
+        return obj_hash in self._promised
+
+    def promise(self, hashes):
+        """Registra ``hashes`` como prometidos (antes de gravar as árvores que os citam)."""
+        hashes = set(hashes)
+        if not hashes:
+            return
+        path = os.path.join(self.repo_dir, PROMISED_FILE)
+        promised = _read_hashes(path)
+        if hashes <= promised:
+            return
+        promised |= hashes
+        _write_hashes(path, promised)
+        self._promised = promised
+
+    def is_shallow(self, commit_hash):
+        if self._shallow is None:
+            self._shallow = _read_hashes(os.path.join(self.repo_dir, SHALLOW_FILE))
+        return commit_hash in self._shallow
+
+    def add_shallow(self, commit_hashes):
+        """Marca a fronteira rasa (antes de gravar os commits dela)."""
+        commit_hashes = set(commit_hashes)
+        if not commit_hashes:
+            return
+        path = os.path.join(self.repo_dir, SHALLOW_FILE)
+        shallow = _read_hashes(path) | commit_hashes
+        _write_hashes(path, shallow)
+        self._shallow = shallow
+
+    @contextlib.contextmanager
+    def open_store(self, repo):
+        """``RemoteStore`` de onde vêm os objetos prometidos."""
+        if self.remote_dir:
+            from remote.store import RemoteStore
+            from remote.transport import LocalTransport
+
+            with LocalTransport(self.remote_dir) as transport:
+                yield RemoteStore(transport)
+        else:
+            with repo.open_remote(self.repo_id) as remote:
+                yield remote.store
+
+    def locations(self, store, refresh=False):
+        # Os manifestos são lidos uma vez por processo
+        if self._locations is None or refresh:
+            self._locations = store.locate_objects()
+        return self._locations
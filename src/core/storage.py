@@ -5,15 +5,26 @@ import re
 import time
 import msgpack
 import hashlib
-import mimetypes
-import numpy as np
-import psycopg2 
-import paramiko
-import zipfile
-import sqlite3
 import shutil
-from datetime import datetime
-from optmizations.numba_utils import fast_checksum
+import functools
+from core.pack import (
+    PackSet, write_pack, OBJ_BLOB, OBJ_COMMIT, OBJ_TREE, OBJ_REF_DELTA,
+    MAX_DELTA_DEPTH, DELTA_MIN_SIZE, DELTA_MAX_SIZE
+)
+from core.commit_graph import CommitGraph
+from core.commit_meta import CommitMeta, decode_commit_header
+from core.index import Index, IndexEntry, write_index
+from core.object_store import open_object_stores
+from core.promisor import Promisor
+from core.chunking import CHUNKED_MAGIC, chunking_params, parse_manifest, is_manifest_file
+from core import cache
+from core.objects import (
+    serialize_tree, parse_tree, is_tree_data, build_trees, flatten_tree, parent_dirs, diff_trees
+)
+from core.config import load_config, config_get, config_set
+# Subsistemas usados por um só comando (diff, merge, status, remoto, e também
+# checkout, add e repack, que puxam concurrent.futures e logging) são
+# importados dentro dos métodos: cada execução do dee só carrega o que usa.
 
 
 class Repo:
@@ -25,12 +36,25 @@ class Repo:
         self.objects_dir = os.path.join(self.repo_dir, "objects")
         self.refs_dir = os.path.join(self.repo_dir, "refs")
         self.staging_dir = os.path.join(self.repo_dir, "staging")
-        self.index_file = os.path.join(self.repo_dir, "index.msgpack")
+        self.index_file = os.path.join(self.repo_dir, "index")
+        self.legacy_index_file = os.path.join(self.repo_dir, "index.msgpack")
         self.head_file = os.path.join(self.repo_dir, "HEAD")
         self.state_file = os.path.join(self.repo_dir, "state.msgpack")
         self.heads_dir = os.path.join(self.refs_dir, "heads")
         self.hooks_dir = os.path.join(self.repo_dir, "hooks")
         self.token_file = os.path.join(self.repo_dir, "token")
+        self.packs_dir = os.path.join(self.repo_dir, "packs")
+        self.tree_cache_file = os.path.join(self.repo_dir, "tree-cache.msgpack")
+        self.graph_file = os.path.join(self.repo_dir, "commit-graph")
+        self.meta_file = os.path.join(self.repo_dir, "commit-meta")
+        self.merge_head_file = os.path.join(self.repo_dir, "MERGE_HEAD")
+        self.rebase_state_file = os.path.join(self.repo_dir, "rebase.msgpack")
+        self.config_file = os.path.join(self.repo_dir, "config")
+        self._graph = None
+        self._meta = None
+        self._pack_set = None
+        self._stores = None
+        self._promisor_state = None
 
         self.ignored_paths = {
             ".venv", "venv", ".vscode", ".env", "env", "__pycache__", ".git", ".dee"
@@ -41,34 +65,330 @@ class Repo:
         with open(config_path, 'w') as f:
             f.write(repo_id)
 
+    def _packs(self):
+        if self._pack_set is None:
+            self._pack_set = PackSet(self.packs_dir)
+        return self._pack_set
+
+    def _object_stores(self):
+        # O backend é escolhido no 'dee init' e gravado só no config do
+        # repositório: um padrão do usuário não pode mudar repositórios existentes
+        if self._stores is None:
+            config = load_config(self.config_file, include_user=False)
+            self._stores = open_object_stores(config_get(config, "core.objects", "loose"), self.repo_dir)
+        return self._stores
+
+    @property
+    def blob_store(self):
+        return self._object_stores()[0]
+
+    @property
+    def object_store(self):
+        # Árvores e commits
+        return self._object_stores()[1]
+
+    def _read_object(self, obj_hash, store):
+        # Dentro do daemon, objetos lidos recentemente vêm da memória
+        warm = cache.current()
+        if warm is not None:
+            data = warm.get_object(obj_hash)
+            if data is None:
+                data = self._read_stored_object(obj_hash, store)
+                warm.put_object(obj_hash, data)
+            return data
+        return self._read_stored_object(obj_hash, store)
+
+    def _read_stored_object(self, obj_hash, store):
+        # O store tem prioridade; se não existir, procura nos packs
+        try:
+            return store.get(obj_hash)
+        except FileNotFoundError:
+            pass
+        found = self._packs().get(obj_hash)
+        if found is not None:
+            return found[1]
+        promisor = self._promisor()
+        if promisor is not None and store is self.blob_store and promisor.is_promised(obj_hash):
+            # Clone parcial: o blob é buscado no remoto no primeiro acesso
+            self._fetch_promised([obj_hash])
+            return store.get(obj_hash)
+        raise FileNotFoundError(f"Objeto não encontrado: {obj_hash}")
+
+    def _promisor(self):
+        # Estado do clone parcial/raso; None num clone completo
+        if self._promisor_state is None:
+            self._promisor_state = Promisor.load(self.repo_dir) or False
+        return self._promisor_state or None
+
+    def _in_worktree(self, rel_path):
+        # Caminhos fora do --filter de um clone parcial não são materializados
+        promisor = self._promisor()
+        return promisor is None or promisor.covers(rel_path)
+
+    def _prefetch_blobs(self, hashes):
+        """Baixa num só lote os blobs prometidos entre ``hashes``.
+
+        Chamado antes de operações que vão ler vários blobs (checkout, diff,
+        merge), para não buscar um objeto por vez. Num clone completo não faz nada.
+        """
+        promisor = self._promisor()
+        if promisor is None:
+            return
+        promised = {h for h in hashes if h and promisor.is_promised(h)}
+        missing = promised - self._has_objects(promised, self.blob_store)
+        if missing:
+            self._fetch_promised(missing)
+
+    def _fetch_promised(self, hashes):
+        from remote.negotiate import fetch_promised
+
+        promisor = self._promisor()
+        with promisor.open_store(self) as store:
+            fetch_promised(self, store, promisor, hashes)
+
+    def _commit_parents(self, commit_hash, commit_data):
+        # Na fronteira de um clone raso os pais não existem localmente
+        promisor = self._promisor()
+        if promisor is not None and promisor.is_shallow(commit_hash):
+            return []
+        return commit_data.get("parents", [])
+
+    def _has_object(self, obj_hash, store):
+        return store.has(obj_hash) or obj_hash in self._packs()
+
+    def _has_objects(self, hashes, store):
+        # Versão em lote de _has_object: uma consulta ao store para todos
+        found = store.has_many(hashes)
+        packs = self._packs()
+        found.update(h for h in hashes if h not in found and h in packs)
+        return found
+
+    def _read_blob(self, blob_hash):
+        data = self._read_object(blob_hash, self.blob_store)
+        if data[:len(CHUNKED_MAGIC)] == CHUNKED_MAGIC:
+            chunks = parse_manifest(blob_hash, data)
+            if chunks is not None:
+                # Blob em pedaços: remonta o conteúdo em memória
+                return b"".join(self._read_stored_object(h, self.blob_store) for h, _ in chunks)
+        return data
+
+    def _write_blob(self, blob_hash, f):
+        """Grava o conteúdo do blob no arquivo ``f``, sem montá-lo em memória se estiver em pedaços."""
+        loose = self.blob_store.path(blob_hash)
+        if loose is not None and not is_manifest_file(loose):
+            with open(loose, "rb") as src:
+                shutil.copyfileobj(src, f, 1 << 20)
+            return
+        data = self._read_object(blob_hash, self.blob_store)
+        chunks = parse_manifest(blob_hash, data)
+        if chunks is None:
+            f.write(data)
+        else:
+            self._write_chunks(blob_hash, chunks, f)
+
+    def _write_chunks(self, blob_hash, chunks, f):
+        # Pedaços lidos um a um (fora do cache do daemon: um arquivo grande
+        # expulsaria todo o resto); o SHA-1 do todo é conferido no fim
+        sha = hashlib.sha1()
+        for chunk_hash, _ in chunks:
+            piece = self._read_stored_object(chunk_hash, self.blob_store)
+            sha.update(piece)
+            f.write(piece)
+        if sha.hexdigest() != blob_hash:
+            raise ValueError(f"Blob {blob_hash} corrompido: os pedaços não conferem com o manifesto")
+
+    def _chunk_manifest(self, blob_hash):
+        """Pedaços ``[(hash, tamanho)]`` do blob se ele está guardado como manifesto; senão None."""
+        loose = self.blob_store.path(blob_hash)
+        if loose is not None and not is_manifest_file(loose):
+            return None
+        return parse_manifest(blob_hash, self._read_object(blob_hash, self.blob_store))
+
+    def _chunking(self):
+        # Corte em pedaços do 'dee add' (desligado sem chunking.threshold)
+        config = self.config()
+        return chunking_params(config_get(config, "chunking.threshold"), config_get(config, "chunking.avg_size"))
+
     def _read_commit(self, commit_hash):
-        commit_path = os.path.join(self.objects_dir, commit_hash)
-        with open(commit_path, "rb") as f:
+        data = self._read_object(commit_hash, self.object_store)
+        return msgpack.unpackb(data, strict_map_key=False)
+
+    def _commit_graph(self):
+        if self._graph is None:
+            self._graph = CommitGraph(self.graph_file)
+        return self._graph
+
+    def _commit_meta(self):
+        if self._meta is None:
+            self._meta = CommitMeta(self.meta_file)
+        return self._meta
+
+    def _commit_header(self, commit_hash):
+        """``(timestamp, árvore, mensagem)`` do commit, vindos do cache de metadados.
+
+        Na falta do registro o objeto é lido sem decodificar o índice de
+        commits antigos (``files``), e o cache é completado.
+        """
+        meta = self._commit_meta()
+        header = meta.get(commit_hash)
+        if header is None:
+            data = decode_commit_header(self._read_object(commit_hash, self.object_store))
+            header = (data.get("timestamp", 0), data.get("tree"), data.get("message", ""))
+            meta.add(commit_hash, *header)
+        return header
+
+    def _graph_position(self, commit_hash):
+        graph = self._commit_graph()
+        pos = graph.lookup(commit_hash)
+        if pos is None:
+            self._register_commits(commit_hash)
+            pos = graph.lookup(commit_hash)
+        return pos
+
+    def _register_commits(self, commit_hash):
+        # Registra no grafo um commit e os ancestrais que ainda não estão nele
+        # (commits recebidos via pull ou criados antes do commit-graph).
+        graph = self._commit_graph()
+        commits = {}
+        stack = [commit_hash]
+        while stack:
+            current = stack[-1]
+            if graph.lookup(current) is not None:
+                stack.pop()
+                continue
+            if current not in commits:
+                data = decode_commit_header(self._read_object(current, self.object_store))
+                commits[current] = (self._commit_parents(current, data), data.get("timestamp", 0))
+                self._commit_meta().add(current, data.get("timestamp", 0), data.get("tree"), data.get("message", ""))
+            parents, timestamp = commits[current]
+            missing = [p for p in parents if graph.lookup(p) is None]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            graph.append(current, parents, timestamp)
+
+    def _hash_object(self, data):
+        return hashlib.sha1(data).hexdigest()
+
+    def _write_object(self, data):
+        # Grava um objeto (commit ou árvore) endereçado pelo conteúdo
+        obj_hash = self._hash_object(data)
+        if obj_hash not in self._packs():
+            self.object_store.put(obj_hash, data)
+        return obj_hash
+
+    def _read_tree(self, tree_hash):
+        return parse_tree(self._read_object(tree_hash, self.object_store))
+
+    def _commit_files(self, commit_data):
+        # Commits antigos guardavam o índice inteiro em "files"
+        if "tree" in commit_data:
+            return flatten_tree(self._read_tree, commit_data["tree"])
+        return commit_data.get("files", {})
+
+    def _load_tree_cache(self):
+        if not os.path.exists(self.tree_cache_file):
+            return {}
+        with open(self.tree_cache_file, "rb") as f:
             return msgpack.unpackb(f.read(), strict_map_key=False)
 
-    def _clear_worktree(self):
-        for root, dirs, files in os.walk(self.path):
-            # Ignora a própria pasta .dee
-            if self._should_ignore(root):
-                dirs[:] = []
-                continue
-            for fname in files:
-                path = os.path.join(root, fname)
-                os.remove(path)
+    def _save_tree_cache(self, tree_cache):
+        with open(self.tree_cache_file, "wb") as f:
+            f.write(msgpack.packb(tree_cache))
+
+    def _materialize_blob(self, blob_hash, dst, mode=None):
+        with open(dst, "wb") as f:
+            self._write_blob(blob_hash, f)
+        if mode:
+            os.chmod(dst, int(mode, 8))
+
+    def _load_index(self):
+        # Retorna o índice e o mtime da última gravação (usado na checagem "racy")
+        if not os.path.exists(self.index_file) and os.path.exists(self.legacy_index_file):
+            self._migrate_legacy_index()
+        warm = cache.current()
+        if warm is not None:
+            index = warm.index(self.index_file, lambda: Index(self.index_file))
+        else:
+            index = Index(self.index_file)
+        return index, index.mtime_ns
+
+    def _migrate_legacy_index(self):
+        # Repositórios antigos: converte o index.msgpack para o índice binário
+        with open(self.legacy_index_file, "rb") as f:
+            content = f.read()
+        legacy = msgpack.unpackb(content, strict_map_key=False) if content else {}
+        write_index(self.index_file, {p: IndexEntry.from_legacy(m) for p, m in legacy.items()})
+        os.remove(self.legacy_index_file)
+
+    def _write_index(self, index):
+        index.save()
+
+    def _diff_commits(self, old_commit, new_commit):
+        # Gera (caminho, blob_antigo, blob_novo, modo_antigo, modo_novo) entre dois commits
+        old_data = self._read_commit(old_commit) if old_commit else {"files": {}}
+        new_data = self._read_commit(new_commit)
+        if "tree" in old_data and "tree" in new_data:
+            yield from diff_trees(self._read_tree, old_data["tree"], new_data["tree"])
+            return
+        old_files = self._commit_files(old_data)
+        new_files = self._commit_files(new_data)
+        for rel_path in sorted(old_files.keys() | new_files.keys()):
+            old_meta = old_files.get(rel_path) or {}
+            new_meta = new_files.get(rel_path) or {}
+            if old_meta.get("hash") != new_meta.get("hash") or old_meta.get("mode") != new_meta.get("mode"):
+                old_mode, new_mode = old_meta.get("mode"), new_meta.get("mode")
+                yield (
+                    rel_path, old_meta.get("hash"), new_meta.get("hash"),
+                    int(old_mode, 8) if old_mode else None, int(new_mode, 8) if new_mode else None,
+                )
 
-    def process_tree(self, commit_hash):
-        commit_data = self._read_commit(commit_hash)
-        files = commit_data.get("files", {})
-        
-        # Limpa tudo, exceto .dee
-        self._clear_worktree()
-        
-        # Para cada arquivo no commit, copia do staging para o worktree
-        for rel_path, meta in files.items():
-            src = os.path.join(self.staging_dir, meta["hash"])
-            dst = os.path.join(self.path, rel_path)
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            shutil.copy2(src, dst)
+    def process_tree(self, commit_hash, from_commit=None):
+        """Leva o worktree do commit ``from_commit`` (padrão: HEAD) para ``commit_hash``.
+
+        Só os caminhos que diferem entre as duas árvores são apagados, criados
+        ou sobrescritos. Se algum deles tiver alterações locais, nada é feito
+        e o método retorna False.
+        """
+        from operations.checkout import find_local_changes, apply_changes
+
+        if from_commit is None:
+            from_commit = self.get_head_commit()
+        changes = [
+            (rel_path, old_blob, new_blob, mode)
+            for rel_path, old_blob, new_blob, _, mode in self._diff_commits(from_commit, commit_hash)
+        ]
+        index, index_mtime_ns = self._load_index()
+
+        blocked = find_local_changes(self, changes, index, index_mtime_ns)
+        if blocked:
+            print("❗️ Alterações locais seriam sobrescritas pelo checkout:")
+            for rel_path in blocked:
+                print(f"    {rel_path}")
+            print("   Faça commit ou descarte essas alterações antes de continuar.")
+            return False
+
+        written, removed = apply_changes(self, changes)
+        if changes:
+            tree_cache = self._load_tree_cache()
+            self._update_index_entries(index, tree_cache, changes, written, removed)
+            self._write_index(index)
+            self._save_tree_cache(tree_cache)
+        return True
+
+    def _index_entry(self, rel_path, blob_hash, mode, st=None):
+        return IndexEntry(blob_hash, mode if mode is not None else 0o644, st)
+
+    def _update_index_entries(self, index, tree_cache, changes, written, removed):
+        # Mantém o índice alinhado ao worktree depois de ``apply_changes``
+        for rel_path in removed:
+            index.pop(rel_path, None)
+        for rel_path, _, new_blob, mode in changes:
+            if new_blob is not None:
+                index[rel_path] = self._index_entry(rel_path, new_blob, mode, written[rel_path])
+            for dirname in parent_dirs(rel_path):
+                tree_cache.pop(dirname, None)
 
     def _has_remote_link(self):
         config_path = os.path.join(self.repo_dir, 'repoid')
@@ -93,6 +413,11 @@ class Repo:
         if os.path.isfile(script) and os.access(script, os.X_OK):
             subprocess.run([script] + list(args), cwd=self.path)
 
+    def status(self):
+        from operations.snapshot import status as snapshot_status
+
+        return snapshot_status(self)
+
     def has_changes(self):
         if not os.path.exists(self.state_file):
             return False
@@ -100,83 +425,36 @@ class Repo:
             state = msgpack.unpackb(f.read(), strict_map_key=False)
         return state.get("has_changes", False)
 
-    def send_zip_to_remote(self, zip_path, remote_path, host, username, password):
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(hostname=host, username=username, password=password)
-        sftp = ssh.open_sftp()
-        sftp.put(zip_path, remote_path)
-        sftp.close()
-        ssh.close()
-
-    def zip_commit_files(self, commit_hash, zip_path):
-        commit_path = os.path.join(self.objects_dir, commit_hash)
-        with open(commit_path, "rb") as f:
-            commit_data = msgpack.unpackb(f.read(), strict_map_key=False)
-        files = commit_data.get("files", {})
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for rel_path, meta in files.items():
-                staged_file = os.path.join(self.staging_dir, meta["hash"])
-                if os.path.exists(staged_file):
-                    zipf.write(staged_file, arcname=rel_path)
-
-    def insert_zip_into_db(self, 
-                        zip_path, 
-                        repo_link=None, 
-                        head=None,
-                        branch="main"):
-        with open(zip_path, 'rb') as f:
-            zip_data = f.read()
-
-        try:
-            conn = psycopg2.connect(
-                host="192.168.3.60",   
-                database="server",     
-                user="postgres",    
-                password="postgres"   
-            )
-            cursor = conn.cursor()
-            
-            # Inserção otimizada
-            cursor.execute("""
-                INSERT INTO tb_repo_object (repo_id, upload_hash, branch, repo_link_id, created_at)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING repo_id
-            """, (str(uuid.uuid4()), head, branch, str(repo_link), datetime.now()))
-
-            conn.commit()
-
-        except psycopg2.Error as e:
-            print(f"Erro ao inserir dados: {e}")
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
-
-    def init(self):
+    def init(self, objects="loose"):
         # Cria todas as pastas necessárias
         os.makedirs(self.objects_dir, exist_ok=True)
         os.makedirs(self.refs_dir, exist_ok=True)
         os.makedirs(self.heads_dir, exist_ok=True)
         os.makedirs(self.staging_dir, exist_ok=True)
         os.makedirs(self.hooks_dir, exist_ok=True)
+        if objects != "loose":
+            config_set(self.config_file, "core.objects", objects)
+        self._stores = None
 
         # Cria índice vazio
-        with open(self.index_file, "wb") as f:
-            f.write(msgpack.packb({}))
+        write_index(self.index_file, {})
 
-        # Commit inicial vazio (timestamp + mensagem + sem arquivos)
+        # Commit inicial vazio (timestamp + mensagem + árvore vazia)
+        empty_tree = self._write_object(serialize_tree([]))
+        self._save_tree_cache({"": empty_tree})
         initial_data = {
             "timestamp": time.time(),
             "message": "initial commit",
-            "files": {}
+            "tree": empty_tree,
+            "parents": []
         }
         initial_serial = msgpack.packb(initial_data)
         initial_hash = hashlib.sha1(initial_serial).hexdigest()
 
-        # Grava o objeto do commit inicial na pasta objects
-        with open(os.path.join(self.objects_dir, initial_hash), "wb") as f:
-            f.write(initial_serial)
+        # Grava o objeto do commit inicial
+        self.object_store.put(initial_hash, initial_serial)
+        self._commit_graph().append(initial_hash, [], initial_data["timestamp"])
+        self._commit_meta().add(initial_hash, initial_data["timestamp"], empty_tree, initial_data["message"])
 
         # Estado sem mudanças pendentes
         with open(self.state_file, "wb") as f:
@@ -198,51 +476,112 @@ class Repo:
     def _should_ignore(self, path):
         return any(ignored in path.split(os.sep) for ignored in self.ignored_paths)
 
-    def add(self, files):
-        if not os.path.exists(self.repo_dir):
-            print("❗️Repositório não inicializado. Execute 'dee init'")
-            return
-        if not files:
-            files = ["."]
-        index = {}
-        if os.path.exists(self.index_file):
-            with open(self.index_file, "rb") as f:
-                content = f.read()
-                if content:
-                    index = msgpack.unpackb(content, strict_map_key=False)
-        added_any = False
+    def _stat_matches(self, entry, st):
+        return (
+            entry.mtime_ns == st.st_mtime_ns
+            and entry.ctime_ns == st.st_ctime_ns
+            and entry.size == st.st_size
+            and entry.ino == st.st_ino
+            and entry.dev == st.st_dev
+        )
+
+    def _is_racy(self, entry, index_mtime_ns):
+        # Arquivo modificado no mesmo segundo (ou depois) da escrita do índice:
+        # o stat não é confiável e o conteúdo precisa ser re-hasheado.
+        if index_mtime_ns is None:
+            return True
+        return (entry.mtime_ns or 0) // 10**9 >= index_mtime_ns // 10**9
+
+    def _iter_add_candidates(self, files, index, index_mtime_ns):
+        # Produtor do pipeline: percorre o worktree e só emite arquivos
+        # cujo stat não bate com o índice (ou que estão na janela "racy")
         for file in files:
             abs_path = os.path.join(self.path, file)
-            for root, dirs, filenames in os.walk(abs_path):
+            if os.path.isfile(abs_path):
+                # Caminho vindo do monitor: arquivo avulso, sem varredura
+                walk = [(os.path.dirname(abs_path), [], [os.path.basename(abs_path)])]
+            else:
+                walk = os.walk(abs_path)
+            for root, dirs, filenames in walk:
                 dirs[:] = [d for d in dirs if not self._should_ignore(os.path.join(root, d))]
                 for fname in filenames:
                     full_path = os.path.join(root, fname)
                     if self._should_ignore(full_path):
                         continue
                     rel_path = os.path.relpath(full_path, self.path)
-                    with open(full_path, "rb") as f:
-                        content = f.read()
-                    np_content = np.frombuffer(content, dtype=np.uint8)
-                    checksum = fast_checksum(np_content)
-                    file_hash = hashlib.sha1(content).hexdigest()
-                    with open(os.path.join(self.staging_dir, file_hash), "wb") as f:
-                        f.write(content)
-                    file_stat = os.stat(full_path)
-                    index[rel_path] = {
-                        "hash": file_hash,
-                        "timestamp": time.time(),
-                        "size": file_stat.st_size,
-                        "type": mimetypes.guess_type(full_path)[0] or "unknown",
-                        "mode": oct(file_stat.st_mode & 0o777),
-                        "original_name": os.path.basename(full_path),
-                        "abs_path": full_path,
-                        "checksum": checksum
-                    }
-                    print(f"📥 Adicionado ao staging: {rel_path}")
-                    added_any = True
-        with open(self.index_file, "wb") as f:
-            f.write(msgpack.packb(index))
+                    entry = index.get(rel_path)
+                    st = os.stat(full_path)
+                    if entry is not None:
+                        if self._stat_matches(entry, st) and not self._is_racy(entry, index_mtime_ns):
+                            continue
+                    yield (rel_path, full_path), full_path, st.st_size
+
+    def add(self, files, jobs=None, use_processes=False, chunk_size=None):
+        from core.pipeline import (
+            run_pipeline, ingest_files, batch_candidates, DEFAULT_CHUNK_SIZE, SMALL_FILE_LIMIT
+        )
+
+        if chunk_size is None:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        if not os.path.exists(self.repo_dir):
+            print("❗️Repositório não inicializado. Execute 'dee init'")
+            return
+        if not files:
+            files = ["."]
+        if list(files) == ["."]:
+            from operations.snapshot import monitor_candidates
+
+            # Com o monitor ativo só os caminhos sujos são examinados
+            candidates, _ = monitor_candidates(self)
+            if candidates is not None:
+                files = sorted(candidates)
+        index, index_mtime_ns = self._load_index()
+        batches = run_pipeline(
+            batch_candidates(
+                self._iter_add_candidates(files, index, index_mtime_ns),
+                small_limit=min(SMALL_FILE_LIMIT, chunk_size),
+            ),
+            functools.partial(
+                ingest_files, store=self.blob_store, chunk_size=chunk_size, chunking=self._chunking()
+            ),
+            jobs=jobs,
+            use_processes=use_processes,
+        )
+        results = []
+        for keys, batch_result in batches:
+            if isinstance(batch_result, BaseException):
+                raise batch_result
+            results.extend(zip(keys, batch_result))
+        results.sort(key=lambda kv: kv[0])
+        tree_cache = self._load_tree_cache()
+        added_any = False
+        index_dirty = False
+        # Escritor único: aplica os resultados ao índice em ordem de caminho
+        for (rel_path, full_path), result in results:
+            if isinstance(result, FileNotFoundError):
+                # Arquivo removido entre a varredura e a leitura
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            file_hash, checksum, file_stat = result
+            index_dirty = True
+            entry = index.get(rel_path)
+            mode = file_stat.st_mode & 0o777
+            if entry is not None and entry.hash == file_hash and entry.mode == mode and not entry.conflict:
+                # Conteúdo e modo iguais: apenas atualiza os dados de stat
+                entry.set_stat(file_stat)
+                index[rel_path] = entry
+                continue
+            index[rel_path] = IndexEntry(file_hash, mode, file_stat, checksum)
+            # Invalida as árvores em cache no caminho até o arquivo
+            for dirname in parent_dirs(rel_path):
+                tree_cache.pop(dirname, None)
+            print(f"📥 Adicionado ao staging: {rel_path}")
+            added_any = True
+        if index_dirty:
+            self._write_index(index)
         if added_any:
+            self._save_tree_cache(tree_cache)
             with open(self.state_file, "wb") as f:
                 f.write(msgpack.packb({"has_changes": True}))
         else:
@@ -257,18 +596,53 @@ class Repo:
         if not state.get("has_changes", False):
             print("⚠️ Nenhuma alteração para commit.")
             return
-        with open(self.index_file, "rb") as f:
-            index = msgpack.unpackb(f.read(), strict_map_key=False)
+        if os.path.exists(self.rebase_state_file):
+            print("❗️ Rebase em andamento: use 'dee rebase --continue' depois de resolver os conflitos.")
+            return
+        index, _ = self._load_index()
+        conflicted = sorted(p for p, entry in index.items() if entry.conflict)
+        if conflicted:
+            print("❗️ Existem conflitos não resolvidos:")
+            for rel_path in conflicted:
+                print(f"    {rel_path}")
+            print("   Resolva os arquivos e use 'dee add' antes do commit.")
+            return
+        parents = [self.get_head_commit()]
+        if os.path.exists(self.merge_head_file):
+            parents.append(open(self.merge_head_file).read().strip())
+        commit_hash = self._create_commit(message, parents, index)
+        if len(parents) > 1:
+            os.remove(self.merge_head_file)
+        print(f"✅ Commit criado: {commit_hash}")
+        return commit_hash
+
+    def _write_commit(self, message, tree, parents):
+        # Grava o objeto do commit e o registra no grafo (sem mexer em refs)
         timestamp = time.time()
         commit_data = {
             "timestamp": timestamp,
             "message": message,
-            "files": index
+            "tree": tree,
+            "parents": parents
         }
         serialized = msgpack.packb(commit_data)
         commit_hash = hashlib.sha1(serialized).hexdigest()
-        with open(os.path.join(self.objects_dir, commit_hash), "wb") as f:
-            f.write(serialized)
+        self.object_store.put(commit_hash, serialized)
+        for parent in parents:
+            self._graph_position(parent)
+        self._commit_graph().append(commit_hash, parents, timestamp)
+        self._commit_meta().add(commit_hash, timestamp, tree, message)
+        return commit_hash
+
+    def _create_commit(self, message, parents, index=None):
+        # Gera as árvores do índice, grava o commit e avança a branch atual
+        if index is None:
+            index, _ = self._load_index()
+        # Só as árvores invalidadas desde o último commit são reescritas
+        tree_cache = self._load_tree_cache()
+        root_tree = build_trees(index, tree_cache, self._write_object)
+        self._save_tree_cache(tree_cache)
+        commit_hash = self._write_commit(message, root_tree, parents)
         branch = self.get_current_branch()
         if branch:
             branch_path = os.path.join(self.heads_dir, branch)
@@ -279,101 +653,164 @@ class Repo:
                 f.write(commit_hash)
         with open(self.state_file, "wb") as f:
             f.write(msgpack.packb({"has_changes": False}))
-        print(f"✅ Commit criado: {commit_hash}")
+        return commit_hash
+
+    def open_remote(self, repo_id=None):
+        """Remoto configurado em ``[remote]``; ver ``remote.remote.RemoteTransport``."""
+        from remote.remote import RemoteTransport
+
+        return RemoteTransport.from_config(self.config(), repo_id)
+
+    def config(self):
+        return load_config(self.config_file)
+
+    def push_to(self, transport, branch=None):
+        """Push negociado: envia ao remoto só os objetos que ele não tem.
+
+        Os commits locais são comparados com os do remoto e os objetos que
+        faltam vão num único stream pelo ``transport``, comprimido conforme
+        ``remote.compression`` (``store`` ou 1-9).
+        """
+        from remote.store import RemoteStore
+        from remote.negotiate import push as negotiated_push
+        from remote.stream import compression_level
+
+        head_hash = self.get_head_commit()
+        branch = branch or self.get_current_branch() or "main"
+        store = RemoteStore(transport)
+        level = compression_level(config_get(self.config(), "remote.compression"))
+        status, sent = negotiated_push(self, store, branch, head_hash, level)
+        if status == "up-to-date":
+            print(f"✅ Remoto já está atualizado (branch '{branch}')")
+        elif status == "rejected":
+            print(f"❗️ Push rejeitado: o remoto tem commits em '{branch}' que você não tem. Faça pull antes.")
+        else:
+            print(f"📤 Commit '{head_hash}' (branch '{branch}') enviado: {sent} commit(s) novos")
+        return status
 
     def push(self, repo_id=None):
-        # 1) Conecta ao PostgreSQL
-        conn = psycopg2.connect(
-            dbname="server",
-            user="postgres",
-            password="postgres",
-            host="192.168.3.60",
-            port="5432"
-        )
-        try:
-            # 2) Primeiro push exige repo_id
-            is_first_push = not self._has_remote_link()
-            if is_first_push:
-                self._store_repo_id(repo_id)
+        # 1) Primeiro push exige repo_id; os seguintes usam o armazenado
+        if not self._has_remote_link():
+            if not repo_id:
                 print("❗️ ID do repositório obrigatório no primeiro push. Use: dee push <repo_id>")
                 return
+            self._store_repo_id(repo_id)
+        repo_id = repo_id or self._get_stored_repo_id()
 
-            # 3) Puxa repo_id armazenado para pushes subsequentes
-            stored = self._get_stored_repo_id()
-            if not repo_id and stored:
-                repo_id = stored
+        # 2) Valida formato UUID
+        try:
+            uuid.UUID(str(repo_id))
+        except ValueError:
+            print("❗️ ID do repositório inválido")
+            return
 
-            # 4) Valida formato UUID
-            try:
-                uuid.UUID(str(repo_id))
-            except ValueError:
-                print("❗️ ID do repositório inválido")
+        # 3) Uma conexão de banco para a operação inteira; SSH/SFTP vêm do pool
+        with self.open_remote(repo_id) as remote, remote.metadata.session() as db:
+            if db is not None and not db.repo_exists(repo_id):
+                print("❗️ Repositório não encontrado no servidor")
                 return
+            branch = self.get_current_branch() or "main"
+            if self.push_to(remote.transport, branch) == "ok" and db is not None:
+                db.record_push(repo_id, branch, self.get_head_commit())
+
+    def _delta_candidates(self, commit_hashes):
+        # Percorre os commits em ordem cronológica: a base candidata de cada
+        # blob é a versão anterior do mesmo caminho. Retorna a ordem de
+        # primeira aparição dos blobs (bases sempre antes dos derivados).
+        commits = [self._read_commit(h) for h in commit_hashes]
+        commits.sort(key=lambda c: c.get("timestamp", 0))
+        order = []
+        bases = {}
+        seen = set()
+        last_version = {}
+        for commit in commits:
+            for rel_path, meta in sorted(self._commit_files(commit).items()):
+                blob_hash = meta["hash"]
+                previous = last_version.get(rel_path)
+                if blob_hash not in seen:
+                    seen.add(blob_hash)
+                    order.append(blob_hash)
+                    if previous and previous != blob_hash:
+                        bases[blob_hash] = previous
+                last_version[rel_path] = blob_hash
+        return order, bases
+
+    def repack(self):
+        """Move todos os objetos soltos (e packs existentes) para um único pack.
+
+        Blobs com uma versão anterior do mesmo caminho no histórico são
+        gravados como delta contra ela, com cadeias limitadas a
+        ``MAX_DELTA_DEPTH``.
+        """
+        from core.delta import create_delta
+
+        loose = {}
+        for name in sorted(self.blob_store.iter()):
+            loose[name] = OBJ_BLOB
+        for name in sorted(self.object_store.iter()):
+            loose[name] = OBJ_TREE if is_tree_data(self.object_store.get(name)) else OBJ_COMMIT
+
+        old_packs = self._packs()
+        old_files = [
+            path
+            for pack in old_packs.packs
+            for path in (pack.pack_path, pack.index.path)
+        ]
+        if not loose and len(old_packs.packs) <= 1:
+            print("✅ Nada para reempacotar.")
+            return None
+
+        types = dict(old_packs.object_types())
+        types.update(loose)
+        commit_hashes = [h for h, t in types.items() if t == OBJ_COMMIT]
+        history_order, bases = self._delta_candidates(commit_hashes)
+        order = [h for h in history_order if h in types]
+        order += sorted(set(types) - set(order))
+
+        def read(obj_hash):
+            store = self.blob_store if types[obj_hash] == OBJ_BLOB else self.object_store
+            return self._read_object(obj_hash, store)
+
+        stats = {"delta": 0}
+
+        def objects():
+            depth = {}
+            for obj_hash in order:
+                data = read(obj_hash)
+                base = bases.get(obj_hash)
+                depth[obj_hash] = 0
+                if (
+                    base in types
+                    and depth.get(base, 0) < MAX_DELTA_DEPTH
+                    and DELTA_MIN_SIZE <= len(data) <= DELTA_MAX_SIZE
+                ):
+                    # Só vale a pena se o delta tiver no máximo metade do objeto
+                    delta = create_delta(read(base), data, max_size=len(data) // 2)
+                    if delta is not None:
+                        depth[obj_hash] = depth[base] + 1
+                        stats["delta"] += 1
+                        yield obj_hash, OBJ_REF_DELTA, bytes.fromhex(base) + delta
+                        continue
+                yield obj_hash, types[obj_hash], data
 
-            # 5) Obtém o hash do HEAD e a branch atual
-            head_hash = self.get_head_commit()
-            branch     = self.get_current_branch() or "main"
+        index_path = write_pack(objects(), self.packs_dir)
+        old_packs.close()
+        self._pack_set = None
 
-            if not head_hash:
-                print("❗️ Nenhum commit no HEAD para fazer push.")
-                return
+        # Só remove os originais depois que o novo pack foi publicado
+        new_files = {index_path, index_path[:-len(".idx")] + ".pack"}
+        for path in old_files:
+            if path not in new_files:
+                os.remove(path)
+        for name, obj_type in loose.items():
+            store = self.blob_store if obj_type == OBJ_BLOB else self.object_store
+            store.remove(name)
 
-            # 6) Monta nome e diretório remoto
-            branch      = self.get_current_branch() or "main"
-            zip_filename = f"{branch}-{head_hash}.zip"
-            zip_path     = os.path.join(self.repo_dir, zip_filename)
-
-            remote_dir  = f"/home/servidor/repos/{repo_id}/{branch}"
-            remote_path = f"{remote_dir}/{zip_filename}"
-
-            # 7) Empacota os arquivos do commit
-            self.zip_commit_files(head_hash, zip_path)
-
-            self.insert_zip_into_db(
-                zip_path=zip_path,
-                repo_link=repo_id,
-                head=head_hash,
-                branch=branch
-            )
-
-            # 8) Verifica existência do repo no banco
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    "SELECT repo_id FROM tb_repo WHERE repo_id = %s",
-                    (str(repo_id),)
-                )
-                row = cursor.fetchone()
-                if not row:
-                    print("❗️ Repositório não encontrado no servidor")
-                    return
-                repo_link_id = row[0]
-
-            # 9) Abre conexão SSH *única* para criação de pasta + SFTP
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(hostname='192.168.3.60', username='servidor', password='0110')
-
-            # 9.1) Cria o diretório remoto, incluindo pais (-p)
-            stdin, stdout, stderr = ssh.exec_command(f'mkdir -p "{remote_dir}"')
-            exit_status = stdout.channel.recv_exit_status()
-            if exit_status != 0:
-                err = stderr.read().decode().strip()
-                print(f"⚠️ Aviso: falha ao criar diretório remoto: {err}")
-
-            # 9.2) Envia o ZIP via SFTP
-            sftp = ssh.open_sftp()
-            sftp.put(zip_path, remote_path)
-            sftp.close()
-            ssh.close()
-
-            # 10) Limpa o ZIP local
-            os.remove(zip_path)
-            print(f"📤 Commit '{head_hash}' (branch '{branch}') enviado com sucesso ao repositório {repo_id}")
-        except psycopg2.Error as e:
-            print(f"Erro de banco: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+        print(
+            f"📦 Repack concluído: {len(order)} objetos "
+            f"({stats['delta']} como delta) em {os.path.basename(index_path)}"
+        )
+        return index_path
 
     def get_head_commit(self):
         content = open(self.head_file).read().strip()
@@ -382,6 +819,30 @@ class Repo:
             return open(os.path.join(self.repo_dir, ref)).read().strip()
         return content
 
+    def resolve_commit(self, name):
+        """Hash do commit indicado por ``HEAD``, nome de branch ou hash."""
+        if name == "HEAD":
+            return self.get_head_commit()
+        ref_path = os.path.join(self.heads_dir, name)
+        if os.path.isfile(ref_path):
+            return open(ref_path).read().strip()
+        if re.fullmatch(r"[0-9a-f]{40}", name):
+            return name
+        raise ValueError(f"Commit ou branch desconhecido: {name}")
+
+    def diff(self, cached=False, commits=()):
+        """Linhas do diff (geradas sob demanda); ver ``operations.diff``."""
+        from operations.diff import diff as diff_lines
+
+        commits = tuple(self.resolve_commit(c) for c in commits)
+        return diff_lines(self, cached=cached, commits=commits)
+
+    def log(self, revision="HEAD", **options):
+        """Commits do histórico (gerados sob demanda); ver ``operations.log``."""
+        from operations.log import log as log_commits
+
+        return log_commits(self, self.resolve_commit(revision), **options)
+
     def create_branch(self, branch_name, start_point=None):
         # Se .dee não existir, inicializa antes
         if not self.is_initialized():
@@ -424,13 +885,14 @@ class Repo:
             print(f"⚠️ A branch '{branch_name}' não possui commits.")
             return
 
+        # Atualiza o diretório de trabalho só nos caminhos que mudam
+        if not self.process_tree(commit_hash):
+            return
+
         # Atualiza o HEAD para apontar à nova branch
         with open(self.head_file, "w") as f:
             f.write(f"ref: refs/heads/{branch_name}")
 
-        # Restaura o conteúdo do diretório de trabalho para aquele commit
-        self.process_tree(commit_hash)
-
         print(f"✅ Agora em branch '{branch_name}'")
 
     def merge(self, source_branch, target_branch=None):
@@ -440,21 +902,268 @@ class Repo:
         self._validate_branch_name(target)
         source_hash = open(os.path.join(self.heads_dir, source_branch)).read().strip()
         target_hash = open(os.path.join(self.heads_dir, target)).read().strip()
+        if self.is_ancestor(source_hash, target_hash):
+            print(f"✅ {target} já contém {source_branch}")
+            return
         # se target é ancestral de source, fast-forward
         if self.is_ancestor(target_hash, source_hash):
+            # Na branch atual o worktree acompanha o avanço
+            if target == self.get_current_branch() and not self.process_tree(source_hash, target_hash):
+                return
             path = os.path.join(self.heads_dir, target)
             with open(path, 'w') as f:
                 f.write(source_hash)
             print(f"✅ Merge fast-forward de {source_branch} em {target}")
+        elif target != self.get_current_branch():
+            print(f"❗️ Merge de três vias só na branch atual. Faça 'dee checkout {target}' antes.")
         else:
-            print("⚠️ Merge não fast-forward: conflito detectado ou merge de três vias necessário.")
+            self._three_way_merge(source_branch, source_hash, target, target_hash)
+
+    def _three_way_merge(self, source_branch, source_hash, target, target_hash):
+        from operations.merge import merge_trees
+
+        if os.path.exists(self.merge_head_file):
+            print("❗️ Já existe um merge em andamento. Resolva os conflitos e faça commit.")
+            return
+        if self.has_changes():
+            print("❗️ Existem alterações no staging. Faça commit antes do merge.")
+            return
+        base = self.merge_base(source_hash, target_hash)
+        result = merge_trees(
+            self, base, target_hash, source_hash, ours_label=target, theirs_label=source_branch
+        )
+        index, index_mtime_ns = self._load_index()
+        if not self._apply_merge_result(result, index, index_mtime_ns, "merge"):
+            return
+
+        if result.conflicts:
+            with open(self.merge_head_file, "w") as f:
+                f.write(source_hash)
+            # O índice já difere do HEAD: o commit do merge fica liberado
+            with open(self.state_file, "wb") as f:
+                f.write(msgpack.packb({"has_changes": True}))
+            print(f"⚠️ Merge de {source_branch} em {target} com conflitos:")
+            for rel_path in sorted(result.conflicts):
+                print(f"    {rel_path}")
+            print("   Resolva os arquivos, use 'dee add' e depois 'dee commit'.")
+            return
+        commit_hash = self._create_commit(
+            f"Merge de {source_branch} em {target}", [target_hash, source_hash], index
+        )
+        print(f"✅ Merge de três vias de {source_branch} em {target}: {commit_hash}")
+
+    def _apply_merge_result(self, result, index, index_mtime_ns, operation):
+        """Leva um ``MergeResult`` ao worktree e ao índice (gravado no fim).
+
+        Arquivos resolvidos são escritos, conflitos ficam com marcadores no
+        worktree e estágios no índice. Se algum caminho tocado tiver
+        alterações locais nada é feito e retorna False.
+        """
+        from operations.checkout import find_local_changes, apply_changes
+        from operations.merge import write_conflict_file
+
+        # Nenhum caminho tocado pode ter alterações locais
+        touched = list(result.changes)
+        touched += [(p, None, h, m) for p, (_, h, m) in result.merged.items()]
+        touched += [(p, c["ours"], None, c["mode"]) for p, c in result.conflicts.items()]
+        for i, (rel_path, _, new_blob, mode) in enumerate(touched):
+            entry = index.get(rel_path)
+            touched[i] = (rel_path, entry.hash if entry else None, new_blob, mode)
+        blocked = find_local_changes(self, touched, index, index_mtime_ns)
+        if blocked:
+            print(f"❗️ Alterações locais seriam sobrescritas pelo {operation}:")
+            for rel_path in blocked:
+                print(f"    {rel_path}")
+            print("   Faça commit ou descarte essas alterações antes de continuar.")
+            return False
+
+        changes = list(result.changes)
+        for rel_path, (content, content_hash, mode) in sorted(result.merged.items()):
+            self.blob_store.put(content_hash, content)
+            entry = index.get(rel_path)
+            changes.append((rel_path, entry.hash if entry else None, content_hash, mode))
+        written, removed = apply_changes(self, changes)
+        tree_cache = self._load_tree_cache()
+        self._update_index_entries(index, tree_cache, changes, written, removed)
+
+        # Conflitos: arquivo com marcadores no worktree e estágios no índice
+        for rel_path, conflict in sorted(result.conflicts.items()):
+            if conflict["content"] is not None:
+                write_conflict_file(self, rel_path, conflict["content"], conflict["mode"])
+            entry = self._index_entry(rel_path, conflict["ours"] or conflict["theirs"], conflict["mode"])
+            entry.conflict = {
+                "base": conflict["base"],
+                "ours": conflict["ours"],
+                "theirs": conflict["theirs"],
+            }
+            index[rel_path] = entry
+            for dirname in parent_dirs(rel_path):
+                tree_cache.pop(dirname, None)
+        self._write_index(index)
+        self._save_tree_cache(tree_cache)
+        return True
 
     def rebase(self, branch, onto_branch):
+        """Reaplica sobre ``onto_branch`` os commits de ``branch`` que ele não tem.
+
+        O replay acontece em memória (``operations.rebase``): só árvores e
+        commits novos são gravados, e o worktree é atualizado uma única vez
+        no fim, se ``branch`` for a branch atual. Num conflito o rebase para
+        com o worktree no commit problemático; o estado fica em
+        ``.dee/rebase.msgpack`` para ``rebase_continue`` ou ``rebase_abort``.
+        """
+        from operations.rebase import commits_to_replay
+
         self._validate_branch_name(branch)
         self._validate_branch_name(onto_branch)
-        print(f"🔄 Rebase de {branch} em {onto_branch} iniciado")
-        # TODO: implementar lógica de replay de commits
-        print(f"✅ Rebase concluído (stub)")
+        if os.path.exists(self.rebase_state_file):
+            print("❗️ Já existe um rebase em andamento. Use 'dee rebase --continue' ou 'dee rebase --abort'.")
+            return
+        if os.path.exists(self.merge_head_file):
+            print("❗️ Existe um merge em andamento. Resolva os conflitos e faça commit antes.")
+            return
+        heads = {}
+        for name in (branch, onto_branch):
+            ref_path = os.path.join(self.heads_dir, name)
+            if not os.path.exists(ref_path):
+                print(f"❗️ Branch '{name}' não existe.")
+                return
+            heads[name] = open(ref_path).read().strip()
+        branch_head, onto_head = heads[branch], heads[onto_branch]
+        if self.is_ancestor(onto_head, branch_head):
+            print(f"✅ {branch} já está sobre {onto_branch}")
+            return
+        if self.has_changes():
+            print("❗️ Existem alterações no staging. Faça commit antes do rebase.")
+            return
+
+        commits = commits_to_replay(self, branch_head, onto_head)
+        print(f"🔄 Rebase de {branch} em {onto_branch}: {len(commits)} commit(s)")
+        state = {
+            "branch": branch,
+            "onto": onto_branch,
+            "orig_head": open(self.head_file).read().strip(),
+            "orig_commit": self.get_head_commit(),
+        }
+        return self._replay_commits(state, onto_head, commits)
+
+    def _load_rebase_state(self):
+        if not os.path.exists(self.rebase_state_file):
+            return None
+        with open(self.rebase_state_file, "rb") as f:
+            return msgpack.unpackb(f.read(), strict_map_key=False)
+
+    def _replay_commits(self, state, tip, commits):
+        from operations.rebase import replay
+
+        tip, pending, result = replay(self, commits, tip, state["onto"])
+        if result is None:
+            return self._finish_rebase(state, tip)
+        self._stop_rebase(state, tip, pending, result)
+
+    def _finish_rebase(self, state, tip):
+        branch = state["branch"]
+        stopped = os.path.exists(self.rebase_state_file)
+        on_branch = open(self.head_file).read().strip() == f"ref: refs/heads/{branch}"
+        # O worktree só acompanha se a branch está em uso (ou o rebase parou nela)
+        if (stopped or on_branch) and not self.process_tree(tip, self.get_head_commit()):
+            return None
+        with open(os.path.join(self.heads_dir, branch), "w") as f:
+            f.write(tip)
+        if stopped:
+            with open(self.head_file, "w") as f:
+                f.write(f"ref: refs/heads/{branch}")
+            os.remove(self.rebase_state_file)
+            with open(self.state_file, "wb") as f:
+                f.write(msgpack.packb({"has_changes": False}))
+        print(f"✅ Rebase concluído: {branch} agora em {tip}")
+        return tip
+
+    def _stop_rebase(self, state, tip, pending, result):
+        # O worktree vai para ``tip`` (HEAD destacado) com o commit em
+        # conflito aplicado por cima, como num merge
+        previous_commit = self.get_head_commit()
+        previous_head = open(self.head_file).read().strip()
+        if not self.process_tree(tip, previous_commit):
+            return
+        with open(self.head_file, "w") as f:
+            f.write(tip)
+        index, index_mtime_ns = self._load_index()
+        if not self._apply_merge_result(result, index, index_mtime_ns, "rebase"):
+            # Volta ao ponto em que estava antes de parar
+            self.process_tree(previous_commit, tip)
+            with open(self.head_file, "w") as f:
+                f.write(previous_head)
+            return
+        touched = {change[0] for change in result.changes}
+        touched.update(result.merged, result.conflicts)
+        state.update({
+            "current": pending[0],
+            "pending": pending[1:],
+            "touched": sorted(touched),
+        })
+        with open(self.rebase_state_file, "wb") as f:
+            f.write(msgpack.packb(state))
+        with open(self.state_file, "wb") as f:
+            f.write(msgpack.packb({"has_changes": True}))
+        print(f"⚠️ Conflito ao reaplicar {pending[0][:7]} ({len(pending) - 1} commit(s) restantes):")
+        for rel_path in sorted(result.conflicts):
+            print(f"    {rel_path}")
+        print("   Resolva os arquivos, use 'dee add' e depois 'dee rebase --continue'")
+        print("   (ou 'dee rebase --abort' para voltar ao estado anterior).")
+
+    def rebase_continue(self):
+        """Grava o commit em conflito já resolvido e segue com o replay."""
+        state = self._load_rebase_state()
+        if state is None:
+            print("❗️ Nenhum rebase em andamento.")
+            return None
+        index, _ = self._load_index()
+        conflicted = sorted(p for p, entry in index.items() if entry.conflict)
+        if conflicted:
+            print("❗️ Existem conflitos não resolvidos:")
+            for rel_path in conflicted:
+                print(f"    {rel_path}")
+            print("   Resolva os arquivos e use 'dee add' antes de continuar.")
+            return None
+        tip = self.get_head_commit()
+        if self.has_changes():
+            message = self._read_commit(state["current"]).get("message", "")
+            tip = self._create_commit(message, [tip], index)
+        return self._replay_commits(state, tip, state["pending"])
+
+    def rebase_abort(self):
+        """Desfaz o rebase em andamento: HEAD, índice e worktree voltam ao início."""
+        from operations.checkout import apply_changes
+        from operations.rebase import lookup_path
+
+        state = self._load_rebase_state()
+        if state is None:
+            print("❗️ Nenhum rebase em andamento.")
+            return
+        orig_commit = state["orig_commit"]
+        changes = {
+            rel_path: (rel_path, None, new_blob, mode)
+            for rel_path, _, new_blob, _, mode in self._diff_commits(self.get_head_commit(), orig_commit)
+        }
+        # Caminhos do commit em conflito podem diferir de qualquer commit
+        for rel_path in state["touched"]:
+            if rel_path not in changes:
+                blob, mode = lookup_path(self, orig_commit, rel_path) or (None, None)
+                changes[rel_path] = (rel_path, None, blob, mode)
+        changes = [changes[p] for p in sorted(changes)]
+        written, removed = apply_changes(self, changes)
+        index, _ = self._load_index()
+        tree_cache = self._load_tree_cache()
+        self._update_index_entries(index, tree_cache, changes, written, removed)
+        self._write_index(index)
+        self._save_tree_cache(tree_cache)
+        with open(self.head_file, "w") as f:
+            f.write(state["orig_head"])
+        os.remove(self.rebase_state_file)
+        with open(self.state_file, "wb") as f:
+            f.write(msgpack.packb({"has_changes": False}))
+        print(f"✅ Rebase de {state['branch']} abortado")
 
     def get_current_branch(self):
         content = open(self.head_file).read().strip()
@@ -463,111 +1172,109 @@ class Repo:
         return None
 
     def is_ancestor(self, ancestor, descendant):
-        return False
+        graph = self._commit_graph()
+        return graph.is_ancestor(self._graph_position(ancestor), self._graph_position(descendant))
+
+    def merge_base(self, a, b):
+        graph = self._commit_graph()
+        bases = graph.merge_bases(self._graph_position(a), self._graph_position(b))
+        return graph.hexsha(bases[0]) if bases else None
+
+    def ahead_behind(self, a, b):
+        graph = self._commit_graph()
+        return graph.ahead_behind(self._graph_position(a), self._graph_position(b))
 
     def retrieve_token(self):
         token = open(self.token_file).read()
         return token
 
-    def clone(self, repo_obj_hash, target_path):
-        """Implementação do clone com nome do repositório do banco de dados"""
-        conn = None
-        ssh = None
-        try:
-            # 1. Conexão com o banco de dados
-            conn = psycopg2.connect(
-                host="192.168.3.60",
-                database="server",
-                user="postgres",
-                password="postgres"
-            )
-            cursor = conn.cursor()
-
-            # 2. Buscar repo_link_id na tb_repo_object
-            cursor.execute(
-                "SELECT repo_link_id FROM tb_repo_object WHERE upload_hash = %s",
-                (repo_obj_hash,)
-            )
-            result = cursor.fetchone()
-            
-            if not result:
+    def clone(self, repo_obj_hash, target_path, depth=None, prefixes=()):
+        """Clona o repositório do push ``repo_obj_hash`` em ``target_path/<nome>``.
+
+        ``depth`` e ``prefixes`` fazem um clone raso/parcial; ver ``_clone_into``.
+        """
+        with self.open_remote() as remote, remote.metadata.session() as db:
+            if db is None:
+                raise ValueError("Clone por hash exige remote.metadata configurado")
+            found = db.find_push(repo_obj_hash)
+            if not found:
                 raise ValueError("Nenhum repositório encontrado com o hash fornecido")
-                
-            repo_link_id = result[0]
-
-            # 3. Buscar nome do repositório na tb_repo
-            cursor.execute(
-                "SELECT repo_name FROM tb_repo WHERE repo_id = %s",
-                (repo_link_id,)
-            )
-            result = cursor.fetchone()
-            
-            if not result:
+            repo_link_id, branch = found
+            repo_name = db.repo_name(repo_link_id)
+            if not repo_name:
                 raise ValueError("Registro na tb_repo não encontrado")
-                
-            repo_name = result[0].strip()
-            clone_path = os.path.join(target_path, repo_name)
-
-            # 4. Criar diretório para o clone
-            if os.path.exists(clone_path):
-                shutil.rmtree(clone_path)
-            os.makedirs(clone_path, exist_ok=True)
-
-            # 5. Configurar novo repositório
-            self.path = clone_path
-            self.init()  # Reutiliza o método init existente
-
-            cursor.execute(
-                "SELECT branch FROM tb_repo_object WHERE upload_hash = %s",
-                (repo_obj_hash,)
-            )
-            result = cursor.fetchone()
-            
-            if not result:
-                raise ValueError("Nenhum repositório encontrado com o hash fornecido.")
-
-            branch = result[0]
-            # 6. Download do arquivo zip
-            remote_path = f"/home/servidor/repos/{branch}-{repo_obj_hash}.zip"
-            local_zip = os.path.join(self.repo_dir, f"temp_{repo_obj_hash}.zip")
-            
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                hostname='192.168.3.60',
-                username='servidor',
-                password='0110'
-            )
-            
-            with ssh.open_sftp() as sftp:
-                sftp.get(remote_path, local_zip)
-
-            # 7. Extrair arquivos
-            with zipfile.ZipFile(local_zip, 'r') as zip_ref:
-                zip_ref.extractall(clone_path)  # Extrai direto para o diretório do repositório
-
-            # 8. Atualizar HEAD e registro remoto
-            with open(self.head_file, "w") as f:
-                f.write(repo_obj_hash)
-                
-            self._store_repo_id(repo_link_id)
-
-            return clone_path
-
-        except Exception as error:
-            # Limpeza em caso de erro
-            if 'clone_path' in locals() and os.path.exists(clone_path):
-                shutil.rmtree(clone_path)
-            return f'Erro ao clonar o repositório: {str(error)}'
-        
-        finally:
-            # 9. Limpeza final
-            if conn:
-                conn.close()
-            if ssh:
-                ssh.close()
-            if 'local_zip' in locals() and os.path.exists(local_zip):
-                os.remove(local_zip)
+
+        def fetch(cloned):
+            cloned._store_repo_id(repo_link_id)
+            with cloned.open_remote(repo_link_id) as remote:
+                cloned._fetch_branch(remote.store, branch, repo_obj_hash, depth)
+
+        return self._clone_into(
+            os.path.join(target_path, repo_name), fetch, depth, prefixes, repo_id=repo_link_id
+        )
+
+    def clone_local(self, remote_dir, branch, target_path, depth=None, prefixes=()):
+        """Clona ``branch`` de um remoto num diretório local (``dee clone --remote``)."""
+        from remote.store import RemoteStore
+        from remote.transport import LocalTransport
+
+        remote_dir = os.path.abspath(remote_dir)
+        store = RemoteStore(LocalTransport(remote_dir))
+        head = store.read_ref(branch)
+        if head is None:
+            raise ValueError(f"Branch '{branch}' não encontrada em {remote_dir}")
+
+        def fetch(cloned):
+            cloned._fetch_branch(store, branch, head, depth)
+
+        return self._clone_into(
+            os.path.join(target_path, os.path.basename(remote_dir)), fetch, depth, prefixes,
+            remote_dir=remote_dir,
+        )
+
+    def _clone_into(self, clone_path, fetch, depth, prefixes, remote_dir=None, repo_id=None):
+        """Cria o repositório em ``clone_path`` e chama ``fetch(clonado)``.
+
+        Com ``depth`` ou ``prefixes`` o clone é parcial: só os ``depth``
+        commits mais recentes são baixados, o worktree só materializa os
+        caminhos sob ``prefixes`` e os blobs não baixados ficam prometidos,
+        buscados no remoto no primeiro acesso (``core.promisor``).
+        """
+        if os.path.exists(clone_path):
+            shutil.rmtree(clone_path)
+        os.makedirs(clone_path, exist_ok=True)
+        try:
+            cloned = Repo(clone_path)
+            # O clone herda a configuração (inclusive o backend de objetos)
+            backend = config_get(load_config(self.config_file, include_user=False), "core.objects", "loose")
+            cloned.init(objects=backend)
+            if os.path.exists(self.config_file):
+                shutil.copy2(self.config_file, cloned.config_file)
+            if depth or prefixes:
+                Promisor.create(cloned.repo_dir, remote_dir=remote_dir, repo_id=repo_id, prefixes=prefixes)
+            fetch(cloned)
+        except BaseException:
+            shutil.rmtree(clone_path, ignore_errors=True)
+            raise
+        return clone_path
+
+    def _fetch_branch(self, store, branch, head, depth=None):
+        # Baixa os objetos de ``head``, avança a branch e atualiza o worktree
+        from remote.negotiate import fetch as fetch_objects, fetch_partial
+
+        previous_head = self.get_head_commit()
+        promisor = self._promisor()
+        if promisor is not None:
+            fetch_partial(self, store, head, promisor, depth)
+        else:
+            fetch_objects(self, store, head)
+        self._graph_position(head)
+        if not self.process_tree(head, previous_head):
+            raise RuntimeError("Alterações locais impedem a atualização do worktree")
+        with open(os.path.join(self.heads_dir, branch), "w") as f:
+            f.write(head)
+        with open(self.head_file, "w") as f:
+            f.write(f"ref: refs/heads/{branch}")
 
     def pull(self, repo_id=None):
         # 1) Primeiro pull: armazena o repo_id
@@ -582,62 +1289,18 @@ class Repo:
         except ValueError:
             raise ValueError("ID do repositório inválido")
 
-        # 3) Conexão ao banco para obter ultimo upload_hash
-        conn = psycopg2.connect(
-            host="192.168.3.60",
-            database="server",
-            user="postgres",
-            password="postgres"
-        )
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT upload_hash, branch 
-                  FROM tb_repo_object
-                 WHERE repo_link_id = %s
-              ORDER BY upload_timestamp DESC
-                 LIMIT 1
-            """, (repo_id,))
-            row = cur.fetchone()
-        conn.close()
-
-        if not row:
-            raise RuntimeError("Nenhum commit remoto encontrado para esse repo_id")
-
-        upload_hash, branch = row
-        zip_name = f"{branch}-{upload_hash}.zip"
-        remote_path = f"/home/servidor/repos/{repo_id}/{branch}/{zip_name}"
-        local_zip = os.path.join(self.repo_dir, zip_name)
-
-        # 4) Download via SFTP
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(hostname="192.168.3.60", username="servidor", password="0110")
-        with ssh.open_sftp() as sftp:
-            sftp.get(remote_path, local_zip)
-        ssh.close()
-
-        # 5) Extrai objetos
-        with zipfile.ZipFile(local_zip, "r") as z:
-            for member in z.namelist():
-                # cada arquivo já está no form: staging/<hash> ou objects/<hash>
-                data = z.read(member)
-                # detecta se é blob (msgpack de commit) ou staging
-                target_dir = self.objects_dir if member.startswith("objects/") else self.staging_dir
-                dest = os.path.join(target_dir, os.path.basename(member))
-                with open(dest, "wb") as f:
-                    f.write(data)
-        os.remove(local_zip)
-
-        # 6) Atualiza ref da branch
-        # grava o novo head no arquivo refs/heads/<branch>
-        head_file = os.path.join(self.heads_dir, branch)
-        with open(head_file, "wb") as f:
-            f.write(upload_hash.encode())
-        # certifica HEAD aponta pra branch
-        with open(self.head_file, "w") as f:
-            f.write(f"ref: refs/heads/{branch}")
-
-        # 7) Reconstrói o worktree
-        self.process_tree(upload_hash)
-
+        # 3) Último push: pelos metadados do servidor ou pela ref remota
+        with self.open_remote(repo_id) as remote:
+            with remote.metadata.session() as db:
+                if db is not None:
+                    row = db.latest_push(repo_id)
+                else:
+                    branch = self.get_current_branch() or "main"
+                    remote_head = remote.store.read_ref(branch)
+                    row = (remote_head, branch) if remote_head else None
+            if not row:
+                raise RuntimeError("Nenhum commit remoto encontrado para esse repo_id")
+
+            upload_hash, branch = row
+            self._fetch_branch(remote.store, branch, upload_hash)
         return upload_hash
@@ -0,0 +1,199 @@
+import os
+import stat
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from core.pipeline import default_jobs
+from core.chunking import is_manifest_file
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+# ioctl(FICLONE) do Linux: clona o arquivo por referência (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def copy_blob_file(src, dst):
+    """Copia ``src`` para ``dst`` usando o mecanismo mais barato disponível.
+
+    Tenta reflink (cópia por referência, sem duplicar blocos), depois
+    ``copy_file_range`` (cópia dentro do kernel) e por fim uma cópia comum.
+    Hardlinks não são usados: uma edição no worktree alteraria o blob
+    armazenado no repositório.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining == 0:
+                    return
+            except OSError:
+                pass
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, 1 << 20)
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def worktree_matches(repo, rel_path, blob_hash, index, index_mtime_ns):
+    """True se o arquivo do worktree tem exatamente o conteúdo ``blob_hash``.
+
+    Usa o stat do índice quando possível e só re-hasheia em caso de dúvida.
+    """
+    full_path = os.path.join(repo.path, rel_path)
+    try:
+        st = os.stat(full_path)
+    except FileNotFoundError:
+        return blob_hash is None
+    if blob_hash is None or stat.S_ISDIR(st.st_mode):
+        # Um diretório no lugar do arquivo nunca tem o conteúdo do blob
+        return False
+    entry = index.get(rel_path)
+    if (
+        entry is not None
+        and entry.hash == blob_hash
+        and repo._stat_matches(entry, st)
+        and not repo._is_racy(entry, index_mtime_ns)
+    ):
+        return True
+    return file_sha1(full_path) == blob_hash
+
+
+def find_local_changes(repo, changes, index, index_mtime_ns):
+    """Caminhos que o checkout sobrescreveria ou apagaria com alterações locais.
+
+    Um arquivo é protegido se diferir da versão do HEAD atual, ou se não for
+    rastreado e ocupar o lugar de um arquivo novo. Arquivos ausentes nunca
+    bloqueiam, pois não há conteúdo a perder. Um diretório no lugar de um
+    arquivo novo some quando os arquivos dele são apagados; só bloqueia se
+    guardar algo que o checkout não remove.
+    """
+    blocked = []
+    deleted = {rel_path for rel_path, _, new_blob, _ in changes if new_blob is None}
+    for rel_path, old_blob, new_blob, _ in changes:
+        full_path = os.path.join(repo.path, rel_path)
+        if not os.path.lexists(full_path):
+            continue
+        if os.path.isdir(full_path) and not os.path.islink(full_path):
+            if _keeps_files(repo.path, full_path, deleted):
+                blocked.append(rel_path)
+            continue
+        if worktree_matches(repo, rel_path, old_blob, index, index_mtime_ns):
+            continue
+        if new_blob is not None and worktree_matches(repo, rel_path, new_blob, index, index_mtime_ns):
+            # Já está com o conteúdo de destino
+            continue
+        blocked.append(rel_path)
+    return blocked
+
+
+def _keeps_files(root, dir_path, deleted):
+    # True se o diretório tem algo além dos arquivos que serão apagados
+    for current, _, files in os.walk(dir_path):
+        for name in files:
+            if os.path.relpath(os.path.join(current, name), root).replace(os.sep, "/") not in deleted:
+                return True
+    return False
+
+
+def _remove_empty_parents(root, path):
+    parent = os.path.dirname(path)
+    while parent != root and parent.startswith(root):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            return
+        parent = os.path.dirname(parent)
+
+
+def _write_path(repo, rel_path, blob_hash, mode):
+    dst = os.path.join(repo.path, rel_path)
+    dst_dir = os.path.dirname(dst)
+    os.makedirs(dst_dir, exist_ok=True)
+    # Escreve ao lado e renomeia: o destino nunca fica pela metade
+    fd, tmp_path = tempfile.mkstemp(dir=dst_dir, prefix=".dee-tmp-")
+    os.close(fd)
+    try:
+        loose = repo.blob_store.path(blob_hash)
+        if loose is not None and not is_manifest_file(loose):
+            copy_blob_file(loose, tmp_path)
+        else:
+            # Em pack/SQLite ou em pedaços (remontado em streaming)
+            with open(tmp_path, "wb") as f:
+                repo._write_blob(blob_hash, f)
+        os.chmod(tmp_path, mode if mode is not None else 0o644)
+        if os.path.isdir(dst) and not os.path.islink(dst):
+            # Sobra de um diretório que virou arquivo (os filhos já foram apagados)
+            os.rmdir(dst)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rel_path, os.stat(dst)
+
+
+def apply_changes(repo, changes, jobs=None):
+    """Aplica ``changes`` ao worktree: remove, cria ou sobrescreve só o necessário.
+
+    Retorna ``{caminho: stat}`` dos arquivos escritos e a lista de removidos.
+    Num clone parcial, caminhos fora do filtro não tocam o disco (só o
+    índice os acompanha, com stat None) e os blobs prometidos que serão
+    escritos são baixados num único lote antes de mexer no worktree.
+    """
+    removed = []
+    deletes = []
+    writes = []
+    written = {}
+    for rel_path, old_blob, new_blob, mode in changes:
+        if not repo._in_worktree(rel_path):
+            if new_blob is None:
+                removed.append(rel_path)
+            else:
+                written[rel_path] = None
+        elif new_blob is None:
+            deletes.append(rel_path)
+        else:
+            writes.append((rel_path, new_blob, mode))
+    repo._prefetch_blobs(blob_hash for _, blob_hash, _ in writes)
+
+    for rel_path in deletes:
+        full_path = os.path.join(repo.path, rel_path)
+        if os.path.lexists(full_path):
+            os.remove(full_path)
+            _remove_empty_parents(repo.path, full_path)
+        removed.append(rel_path)
+
+    if writes:
+        with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as executor:
+            futures = [executor.submit(_write_path, repo, *w) for w in writes]
+            for future in futures:
+                rel_path, st = future.result()
+                written[rel_path] = st
+    return written, removed
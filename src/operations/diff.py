@@ -0,0 +1,363 @@
+import os
+import mmap
+import tempfile
+from core.chunking import parse_manifest, is_manifest_file
+from operations.checkout import file_sha1
+
+
+# Linhas de contexto em volta de cada bloco alterado
+CONTEXT_LINES = 3
+# Bytes inspecionados para decidir se um arquivo é binário
+BINARY_PROBE = 8000
+
+
+def intern_lines(a_lines, b_lines):
+    """Troca cada linha por um inteiro: linhas iguais recebem o mesmo id."""
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi):
+    # "Middle snake" do algoritmo de Myers em espaço linear: caminha a partir
+    # das duas pontas até os caminhos se sobreporem. Retorna o número de
+    # edições e a diagonal (x, y) -> (u, v), relativa a (alo, blo).
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    vf = [0] * (2 * max_d + 3)
+    vb = [0] * (2 * max_d + 3)
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + vb[offset + delta - k] >= n:
+                return 2 * d - 1, x0, y0, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + vf[offset + delta - k] >= n:
+                return 2 * d, n - x, m - y, n - x0, m - y0
+    raise AssertionError("middle snake não encontrado")
+
+
+def _matches(a, alo, ahi, b, blo, bhi, out):
+    # Prefixo e sufixo comuns saem direto, sem entrar no laço de Myers
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        out.append((alo, blo))
+        alo += 1
+        blo += 1
+    suffix = []
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        suffix.append((ahi, bhi))
+    if alo < ahi and blo < bhi:
+        d, x, y, u, v = _middle_snake(a, alo, ahi, b, blo, bhi)
+        if d > 1:
+            _matches(a, alo, alo + x, b, blo, blo + y, out)
+            out.extend((alo + x + i, blo + y + i) for i in range(u - x))
+            _matches(a, alo + u, ahi, b, blo + v, bhi, out)
+        else:
+            # Uma única edição: a sequência menor está contida na maior
+            i, j = alo, blo
+            while i < ahi and j < bhi:
+                if a[i] == b[j]:
+                    out.append((i, j))
+                    i += 1
+                    j += 1
+                elif ahi - i > bhi - j:
+                    i += 1
+                else:
+                    j += 1
+    out.extend(reversed(suffix))
+
+
+def myers_diff(a, b):
+    """Opcodes ``(tag, i1, i2, j1, j2)`` que transformam ``a`` em ``b``.
+
+    ``a`` e ``b`` são listas de inteiros (ver ``intern_lines``); as tags
+    seguem ``difflib``: equal, replace, delete e insert.
+    """
+    matches = []
+    _matches(a, 0, len(a), b, 0, len(b), matches)
+    opcodes = []
+    i = j = 0
+    for mi, mj in matches + [(len(a), len(b))]:
+        if i < mi or j < mj:
+            if i < mi and j < mj:
+                tag = "replace"
+            else:
+                tag = "delete" if i < mi else "insert"
+            opcodes.append((tag, i, mi, j, mj))
+        if mi == len(a):
+            break
+        last = opcodes[-1] if opcodes else None
+        if last and last[0] == "equal" and last[2] == mi and last[4] == mj:
+            opcodes[-1] = ("equal", last[1], mi + 1, last[3], mj + 1)
+        else:
+            opcodes.append(("equal", mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return opcodes
+
+
+def _group_opcodes(opcodes, context=CONTEXT_LINES):
+    # Agrupa opcodes em hunks com ``context`` linhas de contexto
+    codes = list(opcodes)
+    if not codes:
+        return
+    tag, i1, i2, j1, j2 = codes[0]
+    if tag == "equal":
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    tag, i1, i2, j1, j2 = codes[-1]
+    if tag == "equal":
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _line(prefix, raw):
+    text = raw.decode("utf-8", errors="replace")
+    if text.endswith("\n"):
+        return prefix + text[:-1]
+    return prefix + text + "\n\\ No newline at end of file"
+
+
+def unified_diff(a_lines, b_lines, a_name, b_name, context=CONTEXT_LINES):
+    """Gera as linhas de um diff unificado entre duas listas de linhas (bytes)."""
+    a, b = intern_lines(a_lines, b_lines)
+    opcodes = myers_diff(a, b)
+    header = False
+    for group in _group_opcodes(opcodes, context):
+        if not header:
+            yield f"--- {a_name}"
+            yield f"+++ {b_name}"
+            header = True
+        i1, i2 = group[0][1], group[-1][2]
+        j1, j2 = group[0][3], group[-1][4]
+        yield f"@@ -{_range(i1, i2)} +{_range(j1, j2)} @@"
+        for tag, g_i1, g_i2, g_j1, g_j2 in group:
+            if tag == "equal":
+                for line in a_lines[g_i1:g_i2]:
+                    yield _line(" ", line)
+                continue
+            for line in a_lines[g_i1:g_i2]:
+                yield _line("-", line)
+            for line in b_lines[g_j1:g_j2]:
+                yield _line("+", line)
+
+
+def _range(start, stop):
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    if length == 0:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+class _Content:
+    """Conteúdo de um lado do diff: arquivo mapeado em memória ou bytes."""
+
+    def __init__(self, path=None, data=None, file=None):
+        self._file = file
+        self._mm = None
+        self.data = data
+        if path is not None:
+            self._file = open(path, "rb")
+        if self._file is not None:
+            if os.fstat(self._file.fileno()).st_size:
+                self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.data = self._mm
+            else:
+                self.data = b""
+
+    def is_binary(self):
+        return b"\0" in self.data[:BINARY_PROBE]
+
+    def lines(self):
+        data = self.data
+        lines = []
+        start = 0
+        size = len(data)
+        while start < size:
+            end = data.find(b"\n", start)
+            end = size if end == -1 else end + 1
+            lines.append(data[start:end])
+            start = end
+        return lines
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _blob_content(repo, blob_hash):
+    if blob_hash is None:
+        return _Content(data=b"")
+    loose = repo.blob_store.path(blob_hash)
+    if loose is not None and not is_manifest_file(loose):
+        return _Content(path=loose)
+    data = repo._read_object(blob_hash, repo.blob_store)
+    chunks = parse_manifest(blob_hash, data)
+    if chunks is None:
+        return _Content(data=data)
+    # Blob em pedaços: remontado num temporário, que é mapeado como um arquivo
+    tmp = tempfile.TemporaryFile()
+    try:
+        repo._write_chunks(blob_hash, chunks, tmp)
+        tmp.flush()
+    except BaseException:
+        tmp.close()
+        raise
+    return _Content(file=tmp)
+
+
+def file_diff(repo, rel_path, old_blob, new_blob=None, new_path=None):
+    """Diff unificado de um arquivo; só aqui os blobs são efetivamente lidos."""
+    old = _blob_content(repo, old_blob)
+    new = _Content(path=new_path) if new_path is not None else _blob_content(repo, new_blob)
+    try:
+        a_name = f"a/{rel_path}" if old_blob else "/dev/null"
+        b_name = f"b/{rel_path}" if (new_blob or new_path) else "/dev/null"
+        yield f"diff --dee a/{rel_path} b/{rel_path}"
+        if old.is_binary() or new.is_binary():
+            yield f"Binary files {a_name} and {b_name} differ"
+            return
+        yield from unified_diff(old.lines(), new.lines(), a_name, b_name)
+    finally:
+        old.close()
+        new.close()
+
+
+def commit_changes(repo, old_commit, new_commit):
+    """Caminhos alterados entre dois commits, pulando subárvores idênticas."""
+    for rel_path, old_blob, new_blob, _, _ in repo._diff_commits(old_commit, new_commit):
+        if old_blob != new_blob:
+            yield rel_path, old_blob, new_blob
+
+
+def index_changes(repo, commit_hash, index=None, head_files=None):
+    """Caminhos cujo blob no índice difere do commit (tipicamente o HEAD).
+
+    ``index`` e ``head_files`` (arquivos do commit já achatados) podem vir
+    de quem chama, para não serem carregados de novo.
+    """
+    if index is None:
+        index, _ = repo._load_index()
+    if head_files is None:
+        head_files = repo._commit_files(repo._read_commit(commit_hash))
+    for rel_path in sorted(index.keys() | head_files.keys()):
+        old_blob = (head_files.get(rel_path) or {}).get("hash")
+        entry = index.get(rel_path)
+        new_blob = entry.hash if entry else None
+        if old_blob != new_blob:
+            yield rel_path, old_blob, new_blob
+
+
+def worktree_changes(repo, index=None, index_mtime_ns=None):
+    """Arquivos do worktree diferentes do índice.
+
+    Entradas com stat idêntico (e fora da janela "racy") são puladas sem
+    leitura; as demais são re-hasheadas. Gera ``(caminho, blob, existe)``.
+    Sem ``index``, o índice (e o seu mtime) é carregado aqui.
+    """
+    if index is None:
+        index, index_mtime_ns = repo._load_index()
+    for rel_path in sorted(index):
+        entry = index[rel_path]
+        full_path = os.path.join(repo.path, rel_path)
+        try:
+            st = os.stat(full_path)
+        except FileNotFoundError:
+            if repo._in_worktree(rel_path):
+                yield rel_path, entry.hash, False
+            continue
+        if repo._stat_matches(entry, st) and not repo._is_racy(entry, index_mtime_ns):
+            continue
+        if file_sha1(full_path) != entry.hash:
+            yield rel_path, entry.hash, True
+
+
+def diff(repo, cached=False, commits=()):
+    """Gera as linhas do ``dee diff`` sem montar o patch inteiro em memória.
+
+    - sem argumentos: worktree vs índice;
+    - ``cached``: índice vs HEAD;
+    - um commit: índice vs commit (com ``cached``) ou worktree vs commit;
+    - dois commits: commit vs commit.
+
+    Num clone parcial os blobs prometidos do diff são baixados num lote só,
+    antes da primeira linha.
+    """
+    if len(commits) == 2:
+        old, new = commits
+        changes = list(commit_changes(repo, old, new))
+        repo._prefetch_blobs(h for _, old_blob, new_blob in changes for h in (old_blob, new_blob))
+        for rel_path, old_blob, new_blob in changes:
+            yield from file_diff(repo, rel_path, old_blob, new_blob)
+        return
+
+    base = commits[0] if commits else repo.get_head_commit()
+    if cached:
+        changes = list(index_changes(repo, base))
+        repo._prefetch_blobs(h for _, old_blob, new_blob in changes for h in (old_blob, new_blob))
+        for rel_path, old_blob, new_blob in changes:
+            yield from file_diff(repo, rel_path, old_blob, new_blob)
+        return
+
+    if commits:
+        # Worktree vs commit: compara o commit com o índice e o índice com o disco
+        index, index_mtime_ns = repo._load_index()
+        base_files = repo._commit_files(repo._read_commit(base))
+        dirty = {rel_path: exists for rel_path, _, exists in worktree_changes(repo, index, index_mtime_ns)}
+        for rel_path, _, new_blob in index_changes(repo, base, index, base_files):
+            dirty.setdefault(rel_path, new_blob is not None)
+        repo._prefetch_blobs((base_files.get(rel_path) or {}).get("hash") for rel_path in dirty)
+        for rel_path in sorted(dirty):
+            old_blob = (base_files.get(rel_path) or {}).get("hash")
+            full_path = os.path.join(repo.path, rel_path)
+            if dirty[rel_path] and os.path.exists(full_path):
+                yield from file_diff(repo, rel_path, old_blob, new_path=full_path)
+            elif old_blob:
+                yield from file_diff(repo, rel_path, old_blob, None)
+        return
+
+    changes = list(worktree_changes(repo))
+    repo._prefetch_blobs(blob_hash for _, blob_hash, _ in changes)
+    for rel_path, blob_hash, exists in changes:
+        full_path = os.path.join(repo.path, rel_path)
+        if exists:
+            yield from file_diff(repo, rel_path, blob_hash, new_path=full_path)
+        else:
+            yield from file_diff(repo, rel_path, blob_hash, None)
@@ -0,0 +1,161 @@
+"""Histórico de commits (``dee log``).
+
+A caminhada usa só o commit-graph (pais, gerações e timestamps) e o cache
+de metadados (``core.commit_meta``): nenhum objeto de commit é decodificado
+inteiro. Os commits saem do mais novo para o mais antigo, à medida que são
+visitados, e a caminhada para no último pedido: ``dee log -n 50`` não
+depende do tamanho do histórico.
+"""
+import re
+import time
+import heapq
+from datetime import datetime
+from core.objects import TREE
+
+
+_RELATIVE = re.compile(r"^(\d+)[\s.]*(second|minute|hour|day|week|month|year)s?(?:[\s.]+ago)?$")
+_UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "week": 7 * 24 * 60 * 60,
+    "month": 30 * 24 * 60 * 60,
+    "year": 365 * 24 * 60 * 60,
+}
+
+
+def parse_since(value, now=None):
+    """Timestamp de ``--since``: data ISO (``2024-05-01``, ``2024-05-01 12:00``)
+    ou relativa (``2 weeks``, ``3.days.ago``)."""
+    match = _RELATIVE.match(value.strip().lower())
+    if match:
+        return (time.time() if now is None else now) - int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"Data inválida em --since: {value} (use 2024-05-01 ou '2 weeks')")
+
+
+class _PathFilter:
+    """Decide se um commit alterou algum dos caminhos pedidos.
+
+    Um commit entra se o que está nos caminhos (hash e modo do arquivo, ou
+    hash da subárvore) difere do de todos os pais; um commit sem pais entra
+    se algum dos caminhos existe nele.
+    """
+
+    def __init__(self, repo, paths):
+        self.repo = repo
+        self.paths = [p.strip("/") for p in paths]
+        self._lists = {}
+        self._maps = {}
+        self._roots = {}
+
+    def read(self, tree_hash):
+        # Mesma interface de ``operations.rebase._Trees`` (usada por ``commit_tree``)
+        entries = self._lists.get(tree_hash)
+        if entries is None:
+            entries = self._lists[tree_hash] = self.repo._read_tree(tree_hash)
+        return entries
+
+    def _lookup(self, tree_hash, rel_path):
+        if not rel_path:
+            return tree_hash
+        parts = rel_path.split("/")
+        for depth, name in enumerate(parts):
+            entries = self._maps.get(tree_hash)
+            if entries is None:
+                entries = self._maps[tree_hash] = {e[0]: e for e in self.read(tree_hash)}
+            entry = entries.get(name)
+            if entry is None:
+                return None
+            if depth == len(parts) - 1:
+                return entry[2], entry[3]
+            if entry[1] != TREE:
+                return None
+            tree_hash = entry[2]
+        return None
+
+    def _root(self, commit_hash):
+        root = self._roots.get(commit_hash)
+        if root is None:
+            _, root, _ = self.repo._commit_header(commit_hash)
+            if root is None:
+                from operations.rebase import commit_tree
+
+                # Commit antigo, com o índice em "files": a árvore é montada uma vez
+                root = commit_tree(self.repo, self, self.repo._read_commit(commit_hash))
+            self._roots[commit_hash] = root
+        return root
+
+    def _state(self, commit_hash):
+        root = self._root(commit_hash)
+        return tuple(self._lookup(root, path) for path in self.paths)
+
+    def touches(self, commit_hash, parents):
+        state = self._state(commit_hash)
+        if not parents:
+            return any(found is not None for found in state)
+        return all(self._state(parent) != state for parent in parents)
+
+
+def walk(repo, head, since=None):
+    """Posições dos commits alcançáveis de ``head``, dos mais novos para os mais antigos.
+
+    A fila é ordenada por timestamp (e geração, para que um filho com o
+    mesmo timestamp saia antes do pai). Com ``since`` a caminhada termina
+    no primeiro commit mais antigo que ele.
+    """
+    graph = repo._commit_graph()
+    start = repo._graph_position(head)
+    heap = [(-graph.timestamp(start), -graph.generation(start), start)]
+    seen = {start}
+    while heap:
+        _, _, pos = heapq.heappop(heap)
+        if since is not None and graph.timestamp(pos) < since:
+            return
+        yield pos
+        for parent in graph.parents(pos):
+            if parent not in seen:
+                seen.add(parent)
+                heapq.heappush(heap, (-graph.timestamp(parent), -graph.generation(parent), parent))
+
+
+def log(repo, head, max_count=None, skip=0, since=None, paths=()):
+    """Gera ``(hash, pais, timestamp, mensagem)`` dos commits de ``head`` em diante.
+
+    ``skip`` pula os primeiros commits (paginação), ``max_count`` limita
+    quantos são gerados, ``since`` é um timestamp mínimo e ``paths``
+    restringe aos commits que alteraram algum dos caminhos.
+    """
+    graph = repo._commit_graph()
+    path_filter = _PathFilter(repo, paths) if paths else None
+    shown = 0
+    for pos in walk(repo, head, since):
+        if max_count is not None and shown >= max_count:
+            return
+        commit_hash = graph.hexsha(pos)
+        parents = [graph.hexsha(p) for p in graph.parents(pos)]
+        if path_filter is not None and not path_filter.touches(commit_hash, parents):
+            continue
+        if skip:
+            skip -= 1
+            continue
+        shown += 1
+        _, _, message = repo._commit_header(commit_hash)
+        yield commit_hash, parents, graph.timestamp(pos), message
+
+
+def format_commit(commit_hash, parents, timestamp, message, oneline=False):
+    """Texto de um commit na saída do ``dee log``."""
+    lines = (message or "").strip().splitlines()
+    if oneline:
+        return f"{commit_hash[:7]} {lines[0] if lines else ''}\n"
+    out = [f"commit {commit_hash}"]
+    if len(parents) > 1:
+        out.append("Merge: " + " ".join(p[:7] for p in parents))
+    out.append(f"Date:   {datetime.fromtimestamp(timestamp).strftime('%a %b %d %H:%M:%S %Y')}")
+    out.append("")
+    out.extend(f"    {line}" for line in lines)
+    return "\n".join(out) + "\n\n"
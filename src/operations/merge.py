@@ -0,0 +1,213 @@
+import os
+import hashlib
+from core.pipeline import run_pipeline, default_jobs
+from operations.diff import intern_lines, myers_diff, BINARY_PROBE
+
+
+# Com menos merges de conteúdo que isso não compensa subir processos
+PROCESS_POOL_MIN = 8
+
+MARKER_SIZE = 7
+
+
+def _match_map(a, b):
+    # Linha de ``a`` -> linha de ``b`` para as linhas comuns do diff
+    mapping = {}
+    for tag, i1, i2, j1, _ in myers_diff(a, b):
+        if tag == "equal":
+            for offset in range(i2 - i1):
+                mapping[i1 + offset] = j1 + offset
+    return mapping
+
+
+def _ensure_newline(lines):
+    if lines and not lines[-1].endswith(b"\n"):
+        return lines[:-1] + [lines[-1] + b"\n"]
+    return lines
+
+
+def merge_lines(base, ours, theirs, ours_label="ours", theirs_label="theirs"):
+    """Merge de três vias linha a linha (diff3).
+
+    Percorre a base procurando linhas que continuam iguais nos dois lados;
+    entre esses pontos estáveis, um bloco alterado só de um lado é aceito e
+    um bloco alterado de formas diferentes vira conflito com marcadores.
+    Retorna ``(linhas, número_de_conflitos)``.
+    """
+    base_ids, ours_ids = intern_lines(base, ours)
+    _, theirs_ids = intern_lines(base, theirs)
+    # Os ids de base_ids são os mesmos nas duas chamadas: a base é internada primeiro
+    to_ours = _match_map(base_ids, ours_ids)
+    to_theirs = _match_map(base_ids, theirs_ids)
+
+    out = []
+    conflicts = 0
+    i = j = k = 0
+    n_base, n_ours, n_theirs = len(base), len(ours), len(theirs)
+    while True:
+        if i < n_base and to_ours.get(i) == j and to_theirs.get(i) == k:
+            out.append(base[i])
+            i += 1
+            j += 1
+            k += 1
+            continue
+        # Próximo ponto estável: linha da base presente nos dois lados
+        stable = i
+        while stable < n_base and not (stable in to_ours and stable in to_theirs):
+            stable += 1
+        if stable < n_base:
+            next_j, next_k = to_ours[stable], to_theirs[stable]
+        else:
+            next_j, next_k = n_ours, n_theirs
+        base_chunk = base[i:stable]
+        ours_chunk = ours[j:next_j]
+        theirs_chunk = theirs[k:next_k]
+        if ours_chunk == base_chunk:
+            out.extend(theirs_chunk)
+        elif theirs_chunk == base_chunk or ours_chunk == theirs_chunk:
+            out.extend(ours_chunk)
+        else:
+            conflicts += 1
+            out.append(b"<" * MARKER_SIZE + f" {ours_label}\n".encode())
+            out.extend(_ensure_newline(ours_chunk))
+            out.append(b"=" * MARKER_SIZE + b"\n")
+            out.extend(_ensure_newline(theirs_chunk))
+            out.append(b">" * MARKER_SIZE + f" {theirs_label}\n".encode())
+        if stable >= n_base:
+            break
+        i, j, k = stable, next_j, next_k
+    return out, conflicts
+
+
+def merge_blobs(args):
+    """Worker do pool: ``(base, ours, theirs, rótulo_ours, rótulo_theirs)``.
+
+    Retorna ``(conteúdo, sha1, conflitou)``. Conteúdo binário não é mesclado:
+    fica a versão ``ours`` e o caminho é marcado como conflito.
+    """
+    base, ours, theirs, ours_label, theirs_label = args
+    if any(b"\0" in data[:BINARY_PROBE] for data in (base, ours, theirs)):
+        return ours, hashlib.sha1(ours).hexdigest(), True
+    lines, conflicts = merge_lines(
+        base.splitlines(keepends=True), ours.splitlines(keepends=True),
+        theirs.splitlines(keepends=True), ours_label, theirs_label
+    )
+    content = b"".join(lines)
+    return content, hashlib.sha1(content).hexdigest(), conflicts > 0
+
+
+class MergeResult:
+    """Resultado de ``merge_trees``.
+
+    - ``changes``: ``(caminho, blob_ours, blob_novo, modo)`` a aplicar no
+      worktree para os caminhos resolvidos sem conflito;
+    - ``merged``: ``{caminho: (conteúdo, sha1, modo)}`` dos merges de conteúdo
+      sem conflito (os blobs ainda não foram gravados);
+    - ``conflicts``: ``{caminho: {"base", "ours", "theirs", "content", "mode"}}``.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.merged = {}
+        self.conflicts = {}
+
+
+def merge_mode(base_mode, ours_mode, theirs_mode):
+    """Modo do arquivo num merge de três vias.
+
+    Vale o de ``theirs`` se ``ours`` manteve o modo da base; senão fica o de
+    ``ours`` (que também cobre os dois lados com o mesmo modo novo).
+    """
+    return theirs_mode if ours_mode == base_mode else ours_mode
+
+
+def merge_trees(repo, base, ours, theirs, ours_label="HEAD", theirs_label="theirs", jobs=None):
+    """Merge de três vias entre os commits ``ours`` e ``theirs``.
+
+    Só os caminhos alterados em relação à base são visitados (diff de árvores
+    com poda por hash). Quem mudou de um lado só é resolvido pelo hash, sem
+    ler conteúdo; apenas os arquivos que divergiram nos dois lados passam pelo
+    merge de conteúdo, distribuído num pool de workers.
+    """
+    ours_changes = {p: change for p, *change in repo._diff_commits(base, ours)}
+    theirs_changes = {p: change for p, *change in repo._diff_commits(base, theirs)}
+
+    result = MergeResult()
+    content_merges = []
+    for rel_path in sorted(theirs_changes):
+        base_blob, theirs_blob, base_mode, theirs_mode = theirs_changes[rel_path]
+        if rel_path not in ours_changes:
+            # Só o outro lado mudou: ours ainda está igual à base
+            result.changes.append((rel_path, base_blob, theirs_blob, theirs_mode))
+            continue
+        _, ours_blob, _, ours_mode = ours_changes[rel_path]
+        mode = merge_mode(base_mode, ours_mode, theirs_mode)
+        if ours_blob == theirs_blob:
+            if ours_blob is not None and mode != ours_mode:
+                # Mesmo conteúdo, mas só o outro lado mudou o modo (chmod)
+                result.changes.append((rel_path, ours_blob, theirs_blob, mode))
+            continue
+        if ours_blob is None or theirs_blob is None:
+            # Alterado de um lado e removido do outro
+            kept_blob = ours_blob or theirs_blob
+            result.conflicts[rel_path] = {
+                "base": base_blob,
+                "ours": ours_blob,
+                "theirs": theirs_blob,
+                "content": None,
+                "mode": ours_mode if ours_blob else theirs_mode,
+            }
+            if ours_blob is None:
+                result.changes.append((rel_path, None, kept_blob, theirs_mode))
+            continue
+        content_merges.append((rel_path, base_blob, ours_blob, theirs_blob, ours_mode, mode))
+
+    if not content_merges:
+        return result
+    repo._prefetch_blobs(h for _, base_blob, ours_blob, theirs_blob, _, _ in content_merges
+                         for h in (base_blob, ours_blob, theirs_blob))
+
+    modes = {}
+    blobs = {}
+
+    def producer():
+        # Os blobs são lidos aqui, fora dos workers, para que o worker seja
+        # uma função pura (e possa rodar em outro processo).
+        for rel_path, base_blob, ours_blob, theirs_blob, ours_mode, mode in content_merges:
+            modes[rel_path] = (ours_mode, mode)
+            blobs[rel_path] = (base_blob, ours_blob, theirs_blob)
+            base_data = repo._read_blob(base_blob) if base_blob else b""
+            yield rel_path, (
+                base_data, repo._read_blob(ours_blob), repo._read_blob(theirs_blob),
+                ours_label, theirs_label,
+            )
+
+    jobs = jobs or default_jobs()
+    use_processes = jobs > 1 and len(content_merges) >= PROCESS_POOL_MIN
+    for rel_path, outcome in run_pipeline(producer(), merge_blobs, jobs=jobs, use_processes=use_processes):
+        if isinstance(outcome, BaseException):
+            raise outcome
+        content, content_hash, conflicted = outcome
+        base_blob, ours_blob, theirs_blob = blobs[rel_path]
+        ours_mode, mode = modes[rel_path]
+        if conflicted:
+            result.conflicts[rel_path] = {
+                "base": base_blob,
+                "ours": ours_blob,
+                "theirs": theirs_blob,
+                "content": content,
+                "mode": mode,
+            }
+        elif content_hash != ours_blob or mode != ours_mode:
+            result.merged[rel_path] = (content, content_hash, mode)
+    return result
+
+
+def write_conflict_file(repo, rel_path, content, mode):
+    """Grava no worktree o arquivo com os marcadores de conflito."""
+    full_path = os.path.join(repo.path, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(content)
+    os.chmod(full_path, mode if mode is not None else 0o644)
+
@@ -0,0 +1,159 @@
+"""Rebase por replay em memória.
+
+Cada commit é reaplicado só com dados de objetos: as mudanças dele em
+relação ao primeiro pai (diff de árvores) são aplicadas à árvore da nova
+base com ``edit_tree``, que regrava apenas as subárvores no caminho dos
+arquivos alterados. Nada é escrito no worktree durante o replay; quem
+chama materializa o resultado uma vez, no fim, ou no commit que conflitar.
+"""
+from core.objects import BLOB, TREE, edit_tree, serialize_tree
+from operations.merge import MergeResult, merge_blobs, merge_mode
+
+
+class _Trees:
+    """Árvores lidas durante o replay, guardadas por hash (são imutáveis)."""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self._lists = {}
+        self._maps = {}
+
+    def read(self, tree_hash):
+        entries = self._lists.get(tree_hash)
+        if entries is None:
+            entries = self._lists[tree_hash] = self.repo._read_tree(tree_hash)
+        return entries
+
+    def lookup(self, tree_hash, rel_path):
+        """``(hash, modo)`` do arquivo ``rel_path`` na árvore, ou None."""
+        parts = rel_path.split("/")
+        for depth, name in enumerate(parts):
+            entries = self._maps.get(tree_hash)
+            if entries is None:
+                entries = self._maps[tree_hash] = {e[0]: e for e in self.read(tree_hash)}
+            entry = entries.get(name)
+            if entry is None:
+                return None
+            if depth == len(parts) - 1:
+                return (entry[2], entry[3]) if entry[1] == BLOB else None
+            if entry[1] != TREE:
+                return None
+            tree_hash = entry[2]
+        return None
+
+
+def commit_tree(repo, trees, commit_data):
+    """Árvore raiz do commit; commits antigos (índice em ``files``) ganham uma."""
+    if "tree" in commit_data:
+        return commit_data["tree"]
+    edits = {
+        rel_path: (meta["hash"], int(meta["mode"], 8) if meta.get("mode") else None)
+        for rel_path, meta in commit_data.get("files", {}).items()
+    }
+    return edit_tree(trees.read, repo._write_object, None, edits) or repo._write_object(serialize_tree([]))
+
+
+def commits_to_replay(repo, branch_head, onto_head):
+    """Commits de ``branch_head`` que não estão em ``onto_head``, mais antigos primeiro.
+
+    Commits de merge não são reaplicados (o histórico fica linear).
+    """
+    graph = repo._commit_graph()
+    positions = graph.only_in(repo._graph_position(branch_head), repo._graph_position(onto_head))
+    return [
+        graph.hexsha(pos) for pos in positions
+        if len(graph.parents(pos)) <= 1
+    ]
+
+
+def replay_commit(repo, trees, commit_hash, commit_data, onto_tree, onto_label):
+    """Aplica sobre ``onto_tree`` as mudanças de ``commit_hash`` em relação ao 1º pai.
+
+    Retorna ``(nova_árvore, resultado)``. Sem conflitos, ``nova_árvore`` é o
+    hash da árvore resultante; com conflitos é None e ``resultado`` (um
+    ``MergeResult`` com o lado "ours" = nova base) descreve o que aplicar
+    no worktree.
+    """
+    parents = repo._commit_parents(commit_hash, commit_data)
+    summary = (commit_data.get("message") or "").strip().splitlines()
+    theirs_label = f"{commit_hash[:7]} ({summary[0]})" if summary else commit_hash[:7]
+    result = MergeResult()
+    edits = {}
+    for rel_path, base_blob, new_blob, base_mode, new_mode in repo._diff_commits(
+        parents[0] if parents else None, commit_hash
+    ):
+        ours_blob, ours_mode = trees.lookup(onto_tree, rel_path) or (None, None)
+        mode = merge_mode(base_mode, ours_mode, new_mode)
+        if ours_blob == base_blob or (ours_blob == new_blob and mode != ours_mode):
+            # A nova base não mexeu no conteúdo (ou só o commit mudou o modo)
+            edits[rel_path] = (new_blob, mode) if new_blob is not None else None
+            result.changes.append((rel_path, ours_blob, new_blob, mode))
+        elif ours_blob == new_blob:
+            # A mudança já está na nova base
+            continue
+        elif ours_blob is None or new_blob is None:
+            # Alterado de um lado e removido do outro
+            result.conflicts[rel_path] = {
+                "base": base_blob,
+                "ours": ours_blob,
+                "theirs": new_blob,
+                "content": None,
+                "mode": ours_mode if ours_blob else new_mode,
+            }
+            if ours_blob is None:
+                result.changes.append((rel_path, None, new_blob, new_mode))
+        else:
+            content, content_hash, conflicted = merge_blobs((
+                repo._read_blob(base_blob) if base_blob else b"",
+                repo._read_blob(ours_blob),
+                repo._read_blob(new_blob),
+                onto_label,
+                theirs_label,
+            ))
+            if conflicted:
+                result.conflicts[rel_path] = {
+                    "base": base_blob,
+                    "ours": ours_blob,
+                    "theirs": new_blob,
+                    "content": content,
+                    "mode": mode,
+                }
+            else:
+                result.merged[rel_path] = (content, content_hash, mode)
+                edits[rel_path] = (content_hash, mode)
+    if result.conflicts:
+        return None, result
+    for content, content_hash, _ in result.merged.values():
+        repo.blob_store.put(content_hash, content)
+    new_tree = edit_tree(trees.read, repo._write_object, onto_tree, edits)
+    return new_tree or repo._write_object(serialize_tree([])), result
+
+
+def replay(repo, commits, tip, onto_label):
+    """Reaplica ``commits`` (mais antigos primeiro) sobre o commit ``tip``.
+
+    Cada commit reaplicado vira um commit novo com a mesma mensagem; os que
+    não mudam nada na nova base (a mudança já estava lá) são descartados.
+    Retorna ``(ponta, pendentes, resultado)``: sem conflitos ``pendentes`` é
+    vazio e ``resultado`` None; senão o primeiro de ``pendentes`` é o commit
+    que conflitou, ``resultado`` o seu ``MergeResult`` e ``ponta`` o último
+    commit aplicado.
+    """
+    trees = _Trees(repo)
+    tip_tree = commit_tree(repo, trees, repo._read_commit(tip))
+    for i, commit_hash in enumerate(commits):
+        commit_data = repo._read_commit(commit_hash)
+        new_tree, result = replay_commit(repo, trees, commit_hash, commit_data, tip_tree, onto_label)
+        if new_tree is None:
+            return tip, commits[i:], result
+        if new_tree == tip_tree:
+            continue
+        tip = repo._write_commit(commit_data.get("message", ""), new_tree, [tip])
+        tip_tree = new_tree
+    return tip, [], None
+
+
+def lookup_path(repo, commit_hash, rel_path):
+    """``(hash, modo)`` de ``rel_path`` no commit, ou None."""
+    trees = _Trees(repo)
+    return trees.lookup(commit_tree(repo, trees, repo._read_commit(commit_hash)), rel_path)
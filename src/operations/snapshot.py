@@ -0,0 +1,205 @@
+import os
+import bisect
+import msgpack
+from core.objects import build_trees, serialize_tree, parse_tree, diff_trees
+from operations.checkout import file_sha1
+from operations.watcher import FileMonitor
+
+
+MONITOR_STATE = "fsmonitor-state.msgpack"
+
+
+class Status:
+    """Fotografia de worktree, índice e HEAD usada pelo ``dee status``."""
+
+    def __init__(self):
+        self.branch = None
+        self.merging = False
+        self.rebasing = False
+        # (tipo, caminho) com tipo em "novo", "modificado", "removido"
+        self.staged = []
+        self.unstaged = []
+        self.conflicts = []
+        self.untracked = []
+
+    def is_clean(self):
+        return not (self.staged or self.unstaged or self.conflicts or self.untracked)
+
+
+def staged_changes(repo, index, commit_hash):
+    """Diferenças índice vs ``commit_hash`` como ``(caminho, blob_antigo, blob_novo)``.
+
+    Uma mudança só de modo (``chmod``) aparece com os dois blobs iguais.
+
+    As árvores do índice são montadas em memória reaproveitando o cache de
+    árvores, e o diff poda toda subárvore com o mesmo hash do commit. Com o
+    cache intacto desde o último commit, a raiz bate e nada é lido.
+    """
+    commit_data = repo._read_commit(commit_hash)
+    if "tree" not in commit_data:
+        head_files = repo._commit_files(commit_data)
+        for rel_path in sorted(index.keys() | head_files.keys()):
+            old_meta = head_files.get(rel_path) or {}
+            old_blob = old_meta.get("hash")
+            entry = index.get(rel_path)
+            new_blob = entry.hash if entry else None
+            old_mode = int(old_meta["mode"], 8) if old_meta.get("mode") else None
+            if old_blob != new_blob or (entry is not None and old_mode not in (None, entry.mode)):
+                yield rel_path, old_blob, new_blob
+        return
+
+    pending = {}
+
+    def write_object(data):
+        # Árvores novas ficam só em memória: status não grava nada
+        tree_hash = repo._hash_object(data)
+        pending[tree_hash] = data
+        return tree_hash
+
+    def read_tree(tree_hash):
+        data = pending.get(tree_hash)
+        return parse_tree(data) if data is not None else repo._read_tree(tree_hash)
+
+    tree_cache = repo._load_tree_cache()
+    if index:
+        root = build_trees(index, tree_cache, write_object)
+    else:
+        root = write_object(serialize_tree([]))
+    for rel_path, old_blob, new_blob, _, _ in diff_trees(read_tree, commit_data["tree"], root):
+        yield rel_path, old_blob, new_blob
+
+
+def _scan_dir(repo, top, found):
+    # Varredura com scandir: {caminho_relativo: stat} dos arquivos sob ``top``
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if repo._should_ignore(entry.path):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        found[os.path.relpath(entry.path, repo.path)] = entry.stat(follow_symlinks=False)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+
+def worktree_changes(repo, index, index_mtime_ns, candidates=None):
+    """Compara worktree e índice.
+
+    Sem ``candidates`` varre o worktree inteiro. Com ``candidates`` (caminhos
+    sujos vindos do monitor) só esses caminhos, e o que estiver sob eles,
+    são examinados. Retorna ``(modificados, removidos, não_rastreados)``.
+    """
+    found = {}
+    if candidates is None:
+        _scan_dir(repo, repo.path, found)
+        checked = index.keys()
+    else:
+        tracked = sorted(index)
+        checked = set()
+        for rel_path in candidates:
+            full_path = os.path.join(repo.path, rel_path)
+            if repo._should_ignore(full_path):
+                continue
+            checked.add(rel_path)
+            # Entradas do índice sob um diretório que sumiu ou foi movido
+            prefix = rel_path + os.sep
+            start = bisect.bisect_left(tracked, prefix)
+            while start < len(tracked) and tracked[start].startswith(prefix):
+                checked.add(tracked[start])
+                start += 1
+            try:
+                st = os.stat(full_path, follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if os.path.isdir(full_path):
+                _scan_dir(repo, full_path, found)
+            else:
+                found[rel_path] = st
+
+    modified, deleted, untracked = [], [], []
+    for rel_path in checked:
+        entry = index.get(rel_path)
+        if entry is None:
+            continue
+        st = found.get(rel_path)
+        if st is None:
+            # Fora do filtro de um clone parcial, ausente é o esperado
+            if repo._in_worktree(rel_path):
+                deleted.append(rel_path)
+        elif not repo._stat_matches(entry, st) or repo._is_racy(entry, index_mtime_ns):
+            if file_sha1(os.path.join(repo.path, rel_path)) != entry.hash:
+                modified.append(rel_path)
+    untracked = [rel_path for rel_path in found if rel_path not in index]
+    return sorted(modified), sorted(deleted), sorted(untracked)
+
+
+def _load_monitor_state(repo):
+    path = os.path.join(repo.repo_dir, MONITOR_STATE)
+    try:
+        with open(path, "rb") as f:
+            return msgpack.unpackb(f.read(), strict_map_key=False)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_monitor_state(repo, token, dirty):
+    path = os.path.join(repo.repo_dir, MONITOR_STATE)
+    with open(path, "wb") as f:
+        f.write(msgpack.packb({"token": token, "dirty": sorted(dirty)}))
+
+
+def monitor_candidates(repo):
+    """Caminhos que podem ter mudado, segundo o monitor (``dee watch``).
+
+    Retorna ``(candidatos, token)``. ``candidatos`` é None quando não há
+    monitor ativo ou o token salvo não vale mais: é preciso varrer tudo.
+    ``token`` é o ponto do diário a salvar depois da varredura (lido antes
+    dela, para que nada que mude durante a varredura se perca).
+    """
+    monitor = FileMonitor(repo)
+    state = _load_monitor_state(repo)
+    if state:
+        changed = monitor.changed_since(state.get("token"))
+        if changed is not None:
+            token, paths = changed
+            return paths | set(state.get("dirty", [])), token
+    return None, monitor.current_token()
+
+
+def status(repo):
+    """Monta o ``Status`` comparando worktree vs índice vs HEAD."""
+    result = Status()
+    result.branch = repo.get_current_branch()
+    result.merging = os.path.exists(repo.merge_head_file)
+    result.rebasing = os.path.exists(repo.rebase_state_file)
+    index, index_mtime_ns = repo._load_index()
+
+    for rel_path, old_blob, new_blob in staged_changes(repo, index, repo.get_head_commit()):
+        entry = index.get(rel_path)
+        if entry is not None and entry.conflict:
+            continue
+        if old_blob is None:
+            result.staged.append(("novo", rel_path))
+        elif new_blob is None:
+            result.staged.append(("removido", rel_path))
+        else:
+            result.staged.append(("modificado", rel_path))
+    result.conflicts = sorted(p for p, entry in index.items() if entry.conflict)
+
+    candidates, token = monitor_candidates(repo)
+    modified, deleted, untracked = worktree_changes(repo, index, index_mtime_ns, candidates)
+    if token is not None:
+        # O que continua diferente do índice entra de novo na próxima consulta
+        _save_monitor_state(repo, token, modified + deleted + untracked)
+
+    conflicted = set(result.conflicts)
+    result.unstaged = [("modificado", p) for p in modified if p not in conflicted]
+    result.unstaged += [("removido", p) for p in deleted]
+    result.unstaged.sort(key=lambda change: change[1])
+    result.untracked = untracked
+    return result
@@ -0,0 +1,248 @@
+"""Monitor de arquivos do worktree baseado em inotify (Linux).
+
+O processo ``dee watch`` observa o worktree e anota num diário
+(``.dee/fsmonitor.journal``) o caminho relativo de tudo que muda. A primeira
+linha do diário identifica a geração do monitor; um token é
+``geração:offset`` e os caminhos sujos desde um token são as linhas do diário
+a partir daquele offset. Se o monitor reinicia, perde eventos (fila estourada)
+ou o diário é rotacionado, a geração muda e os tokens antigos deixam de valer:
+quem consulta volta a varrer o worktree inteiro uma vez.
+"""
+import os
+import uuid
+import errno
+import signal
+import select
+import struct
+import ctypes
+import ctypes.util
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")
+
+JOURNAL_NAME = "fsmonitor.journal"
+PID_NAME = "fsmonitor.pid"
+# Acima disso o diário é recomeçado com uma nova geração
+JOURNAL_MAX = 8 << 20
+
+
+def _libc():
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError(errno.ENOSYS, "inotify não disponível nesta plataforma")
+    return libc
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class FileMonitor:
+    """Lado cliente: consulta o diário escrito por ``dee watch``."""
+
+    def __init__(self, repo):
+        self.journal_path = os.path.join(repo.repo_dir, JOURNAL_NAME)
+        self.pid_path = os.path.join(repo.repo_dir, PID_NAME)
+
+    def is_running(self):
+        try:
+            with open(self.pid_path) as f:
+                pid = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return False
+        return pid > 0 and _pid_alive(pid)
+
+    def _read(self, offset=None):
+        # Retorna (geração, offset_final, linhas completas a partir de offset)
+        try:
+            with open(self.journal_path, "rb") as f:
+                generation = f.readline()
+                if not generation.endswith(b"\n"):
+                    return None, 0, []
+                start = f.tell() if offset is None else offset
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return None, 0, []
+        # Linha incompleta no fim: o monitor ainda está escrevendo
+        complete = data.rfind(b"\n") + 1
+        lines = data[:complete].split(b"\n")[:-1] if offset is not None else []
+        return generation.strip().decode(), start + complete, lines
+
+    def current_token(self):
+        """Token do ponto atual do diário, ou None sem monitor ativo."""
+        if not self.is_running():
+            return None
+        generation, end, _ = self._read()
+        if generation is None:
+            return None
+        return f"{generation}:{end}"
+
+    def changed_since(self, token):
+        """``(novo_token, caminhos)`` alterados desde ``token``.
+
+        Retorna None se o token não vale mais (outra geração ou monitor parado).
+        """
+        if not token or not self.is_running():
+            return None
+        generation, _, offset = token.rpartition(":")
+        current, end, lines = self._read(int(offset))
+        if current is None or current != generation:
+            return None
+        paths = {line.decode("utf-8", errors="surrogateescape") for line in lines if line}
+        return f"{current}:{end}", paths
+
+
+class Watcher:
+    """Lado servidor: observa o worktree com inotify e alimenta o diário."""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.root = repo.path
+        self.journal_path = os.path.join(repo.repo_dir, JOURNAL_NAME)
+        self.pid_path = os.path.join(repo.repo_dir, PID_NAME)
+        self._libc = _libc()
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs = {}
+        self._journal = None
+        # Caminhos anotados desde o último flush (dict como conjunto ordenado)
+        self._pending = {}
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(err, f"inotify_add_watch({path}): {os.strerror(err)}")
+        self._dirs[wd] = path
+
+    def _watch_tree(self, top, record=False):
+        # Observa ``top`` e subdiretórios; com ``record``, anota os arquivos
+        # encontrados (criados antes de o watch existir).
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            if self.repo._should_ignore(path):
+                continue
+            self._add_watch(path)
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif record:
+                            self._record(entry.path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def _new_generation(self):
+        if self._journal is not None:
+            self._journal.close()
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(uuid.uuid4().hex.encode() + b"\n")
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, "ab", buffering=0)
+
+    def _record(self, path):
+        if self.repo._should_ignore(path):
+            return
+        rel_path = os.path.relpath(path, self.root)
+        self._pending[os.fsencode(rel_path) + b"\n"] = None
+
+    def _flush(self):
+        if self._pending:
+            self._journal.write(b"".join(self._pending))
+            self._pending = {}
+        if self._journal.tell() > JOURNAL_MAX:
+            self._new_generation()
+
+    def _handle(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + name_len].rstrip(b"\0")
+            offset += _EVENT.size + name_len
+            if mask & IN_Q_OVERFLOW:
+                # Eventos perdidos: tokens anteriores deixam de valer
+                self._pending = {}
+                self._new_generation()
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None:
+                continue
+            path = os.path.join(parent, os.fsdecode(name)) if name else parent
+            if path == self.root:
+                continue
+            self._record(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path, record=True)
+
+    def run(self):
+        # SIGTERM encerra pelo mesmo caminho do Ctrl+C, limpando pid e diário
+        signal.signal(signal.SIGTERM, _interrupt)
+        self._pending = {}
+        self._watch_tree(self.root)
+        # O diário só aparece depois que todos os watches existem
+        self._new_generation()
+        with open(self.pid_path, "w") as f:
+            f.write(str(os.getpid()))
+        try:
+            while os.path.isdir(self.repo.repo_dir):
+                ready, _, _ = select.select([self._fd], [], [], 5.0)
+                if not ready:
+                    continue
+                self._handle(os.read(self._fd, 1 << 16))
+                self._flush()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        for path in (self.pid_path, self.journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
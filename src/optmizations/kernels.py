@@ -0,0 +1,120 @@
+"""Camada de kernels: cache persistente do Numba e fallback em NumPy.
+
+Os kernels de ``numba_utils`` são compilados com ``cache=True`` num
+diretório por usuário, separado por versão do Numba e CPU
+(``~/.cache/dee/numba/<numba>-<cpu>``): só a primeira execução numa
+máquina paga a compilação; as seguintes carregam o código nativo do disco.
+O ``install.sh`` aquece esse cache com ``dee doctor --kernels``.
+
+Sem Numba, com ``DEE_KERNELS=numpy`` ou se a compilação falhar, os mesmos
+cálculos rodam em NumPy puro.
+"""
+import os
+import time
+from core.config import user_cache_dir
+
+
+# ``numpy`` força o fallback em NumPy puro
+KERNELS_ENV = "DEE_KERNELS"
+
+_cache_dir = None
+
+
+def _numba_version():
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        return version("numba")
+    except PackageNotFoundError:
+        return None
+
+
+def cache_dir():
+    """Diretório do cache de kernels desta versão do Numba nesta CPU."""
+    global _cache_dir
+    if _cache_dir is None:
+        try:
+            import llvmlite.binding as llvm
+
+            cpu = llvm.get_host_cpu_name()
+        except ImportError:
+            cpu = "generic"
+        _cache_dir = user_cache_dir("numba", f"{_numba_version()}-{cpu}")
+    return _cache_dir
+
+
+def configure_cache():
+    """Aponta o cache do Numba para ``cache_dir()``.
+
+    Precisa rodar antes do primeiro ``import numba`` (o Numba lê
+    ``NUMBA_CACHE_DIR`` ao ser importado); um valor já definido pelo
+    usuário é respeitado. Retorna False se o Numba não deve ser usado.
+    """
+    if os.getenv(KERNELS_ENV, "").lower() == "numpy" or _numba_version() is None:
+        return False
+    if "NUMBA_CACHE_DIR" not in os.environ:
+        path = cache_dir()
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            # Sem cache gravável o Numba ainda funciona, compilando a cada processo
+            return True
+        os.environ["NUMBA_CACHE_DIR"] = path
+    return True
+
+
+def _cached_files(path):
+    count = 0
+    for _, _, names in os.walk(path):
+        count += sum(name.endswith(".nbc") for name in names)
+    return count
+
+
+def warm_up():
+    """Chama cada kernel uma vez, compilando-o (ou carregando do cache).
+
+    Retorna ``[(nome, segundos)]``.
+    """
+    import numpy as np
+    from optmizations import numba_utils
+
+    data = np.frombuffer(b"dee kernels" * 64, dtype=np.uint8)
+    offsets = np.array([0, 100, data.shape[0]], dtype=np.int64)
+    timings = []
+    for name, call in (
+        ("adler32", lambda: numba_utils.adler32(data)),
+        ("adler32_batch", lambda: numba_utils.adler32_batch(data, offsets)),
+        ("adler32_batch (threads)", lambda: numba_utils.run_in_worker(numba_utils.adler32_batch, data, offsets)),
+        ("cdc_cuts", lambda: numba_utils.cdc_cuts(data, 64, 128, 512)),
+        ("delta_ops", lambda: numba_utils.delta_ops(data, data, 16, 16)),
+    ):
+        start = time.perf_counter()
+        call()
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+
+def report():
+    """Qual implementação está ativa e quanto custa aquecer cada kernel.
+
+    Chama cada kernel uma vez (o que também grava o cache, se ainda não
+    existir) e retorna um dicionário com backend, diretório do cache,
+    se ele já existia e o tempo de aquecimento por kernel.
+    """
+    path = os.getenv("NUMBA_CACHE_DIR") or cache_dir()
+    cached_before = _cached_files(path)
+    start = time.perf_counter()
+    from optmizations import numba_utils
+    import_time = time.perf_counter() - start
+    timings = warm_up()
+
+    return {
+        "backend": numba_utils.backend(),
+        "fallback_reason": numba_utils.fallback_reason(),
+        "numba_version": _numba_version(),
+        "cache_dir": path,
+        "cache_hit": cached_before > 0,
+        "cached_files": _cached_files(path),
+        "import_time": import_time,
+        "warm_up": timings,
+    }
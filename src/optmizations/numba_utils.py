@@ -1,11 +1,548 @@
-from numba import njit
+import threading
 import numpy as np
+from optmizations.kernels import configure_cache
 
+HAVE_NUMBA = False
+if configure_cache():
+    try:
+        from numba import njit, prange
+        from numba.core.errors import NumbaError
+        HAVE_NUMBA = True
+    except ImportError:  # pragma: no cover - depende do ambiente
+        pass
 
-@njit
-def fast_checksum(data):
-    checksum = 0
-    for b in data:
-        checksum += b
-        checksum %= 2**32
-    return checksum
+# Motivo pelo qual os kernels caíram para NumPy em tempo de execução
+_fallback_reason = None
+# Erros de compilação/carga (tipagem, LLVM, cache) que levam ao fallback
+_COMPILE_ERRORS = (NumbaError, RuntimeError, OSError) if HAVE_NUMBA else ()
+
+
+# Parâmetros do Adler-32 (mesmo resultado de zlib.adler32)
+ADLER_MOD = 65521
+# Bytes acumulados em int64 antes de reduzir módulo ADLER_MOD. Com blocos
+# de 64 KiB, ``b`` fica abaixo de 255 * 2**31, longe do limite de 64 bits.
+ADLER_BLOCK = 1 << 16
+
+# Chunking por conteúdo (FastCDC): hash "gear" de janela de 64 bytes; o
+# corte acontece onde os bits altos do hash zeram. Antes do tamanho médio a
+# máscara tem um bit a mais (corte mais difícil), depois um a menos: os
+# pedaços se concentram perto da média ("normalized chunking").
+CDC_WINDOW = 64
+
+# Deltas: hash polinomial (módulo 2**64) das janelas de ``block_size``
+# bytes; as janelas do alvo são atualizadas byte a byte (rolling hash)
+DELTA_PRIME = np.uint64(0x100000001B3)
+# Tamanho máximo de uma inserção no delta (mantém os varints curtos)
+DELTA_MAX_INSERT = 1 << 20
+# Janelas do alvo com hash calculado por vez no fallback em NumPy: o
+# segmento começa pequeno (depois de uma cópia o próximo trecho costuma
+# casar logo) e dobra enquanto não aparecem candidatos
+DELTA_SEGMENT_MIN = 1 << 12
+DELTA_SEGMENT_MAX = 1 << 20
+# Bits do filtro que descarta janelas sem nenhum bloco da base com o mesmo hash
+DELTA_FILTER_BITS = 24
+# Instruções do delta: (DELTA_COPY, offset na base, tamanho) e
+# (DELTA_INSERT, início, fim) de um trecho literal do alvo
+DELTA_COPY = 1
+DELTA_INSERT = 2
+
+
+def _gear_table():
+    # Tabela fixa (splitmix64 com semente constante): os cortes precisam ser
+    # iguais em qualquer máquina, senão os pedaços não se deduplicam
+    table = []
+    state = 0x6465652D63646321
+    for _ in range(256):
+        state = (state + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        table.append(z ^ (z >> 31))
+    return np.array(table, dtype=np.uint64)
+
+
+CDC_GEAR = _gear_table()
+
+
+def cdc_masks(avg_size):
+    """Máscaras (difícil, fácil) dos bits altos para o tamanho médio ``avg_size``."""
+    bits = avg_size.bit_length() - 1
+    hard = ((1 << (bits + 1)) - 1) << (64 - (bits + 1))
+    easy = ((1 << (bits - 1)) - 1) << (64 - (bits - 1))
+    return np.uint64(hard), np.uint64(easy)
+
+
+def _adler32_numpy(data, value=1):
+    """Adler-32 incremental em NumPy puro, reduzindo em blocos largos."""
+    a = value & 0xFFFF
+    b = (value >> 16) & 0xFFFF
+    for start in range(0, data.shape[0], ADLER_BLOCK):
+        block = data[start:start + ADLER_BLOCK].astype(np.int64)
+        n = block.shape[0]
+        weights = np.arange(n, 0, -1, dtype=np.int64)
+        b = (b + n * a + int(np.dot(weights, block))) % ADLER_MOD
+        a = (a + int(block.sum())) % ADLER_MOD
+    return (b << 16) | a
+
+
+def _adler32_batch_numpy(buffer, offsets):
+    """Adler-32 de vários arquivos concatenados, totalmente vetorizado.
+
+    Para o segmento ``[s, e)``: ``a = 1 + sum(d)`` e
+    ``b = n + e * sum(d) - sum(j * d[j])``, tudo calculado módulo ADLER_MOD
+    para não estourar 64 bits em buffers grandes.
+    """
+    starts = offsets[:-1].astype(np.int64)
+    ends = offsets[1:].astype(np.int64)
+    lengths = ends - starts
+    if starts.shape[0] == 0:
+        return np.empty(0, dtype=np.uint32)
+    data = np.append(buffer.astype(np.int64), 0)
+    positions = np.arange(data.shape[0], dtype=np.int64) % ADLER_MOD
+    sums = np.add.reduceat(data, starts)
+    weighted = np.add.reduceat(positions * data, starts)
+    sums[lengths == 0] = 0
+    weighted[lengths == 0] = 0
+    a = (1 + sums) % ADLER_MOD
+    b = (lengths + (ends % ADLER_MOD) * (sums % ADLER_MOD) - weighted) % ADLER_MOD
+    return ((b << 16) | a).astype(np.uint32)
+
+
+if HAVE_NUMBA:
+    def _jit(**options):
+        # Código nativo cacheado em disco (ver ``optmizations.kernels``);
+        # sem diretório de cache utilizável, compila a cada processo.
+        def decorate(func):
+            try:
+                return njit(cache=True, **options)(func)
+            except RuntimeError:
+                return njit(**options)(func)
+        return decorate
+
+    @_jit(nogil=True)
+    def _adler32_kernel(data, value):
+        a = np.int64(value & 0xFFFF)
+        b = np.int64((value >> 16) & 0xFFFF)
+        n = data.shape[0]
+        start = 0
+        while start < n:
+            stop = min(start + ADLER_BLOCK, n)
+            # Sem módulo dentro do laço: reduz uma vez por bloco
+            for i in range(start, stop):
+                a += data[i]
+                b += a
+            a %= ADLER_MOD
+            b %= ADLER_MOD
+            start = stop
+        return (b << 16) | a
+
+    # Versão paralela (prange) para chamadas a partir da thread principal.
+    # A camada de threads do Numba não pode ser iniciada nem disputada por
+    # threads de worker, que usam a versão serial sem GIL: o paralelismo, nesse
+    # caso, já vem do próprio pool. São funções distintas porque o cache do
+    # Numba é indexado pela função, não pelas opções de compilação.
+    @_jit(parallel=True)
+    def _adler32_batch_parallel(buffer, offsets):
+        count = offsets.shape[0] - 1
+        out = np.empty(count, dtype=np.uint32)
+        for i in prange(count):
+            out[i] = _adler32_kernel(buffer[offsets[i]:offsets[i + 1]], 1)
+        return out
+
+    @_jit(nogil=True)
+    def _adler32_batch_serial(buffer, offsets):
+        count = offsets.shape[0] - 1
+        out = np.empty(count, dtype=np.uint32)
+        for i in range(count):
+            out[i] = _adler32_kernel(buffer[offsets[i]:offsets[i + 1]], 1)
+        return out
+
+
+def _cdc_numpy(data, min_size, avg_size, max_size, mask_hard, mask_easy, gear):
+    """Cortes do FastCDC em NumPy: hashes de todas as janelas, depois a escolha.
+
+    O hash na posição ``i`` só depende dos 64 bytes até ``i`` e como
+    ``min_size >= CDC_WINDOW`` a janela nunca cruza o início do pedaço: o
+    resultado é o mesmo do kernel, que calcula o hash pedaço a pedaço.
+    """
+    n = data.shape[0]
+    values = gear[data]
+    window = values.copy()
+    for k in range(1, min(CDC_WINDOW, n)):
+        window[k:] += values[:-k] << np.uint64(k)
+    hard = np.flatnonzero((window & mask_hard) == 0)
+    easy = np.flatnonzero((window & mask_easy) == 0)
+    cuts = []
+    start = 0
+    while start < n:
+        end = min(start + max_size, n)
+        cut = end
+        first = start + min_size - 1
+        normal = min(start + avg_size, end)
+        i = np.searchsorted(hard, first)
+        if i < hard.shape[0] and hard[i] < normal:
+            cut = int(hard[i]) + 1
+        else:
+            i = np.searchsorted(easy, max(first, normal))
+            if i < easy.shape[0] and easy[i] < end:
+                cut = int(easy[i]) + 1
+        cuts.append(cut)
+        start = cut
+    return np.array(cuts, dtype=np.int64)
+
+
+if HAVE_NUMBA:
+    @_jit(nogil=True)
+    def _cdc_kernel(data, min_size, avg_size, max_size, mask_hard, mask_easy, gear):
+        n = data.shape[0]
+        cuts = np.empty(n // min_size + 2, dtype=np.int64)
+        count = 0
+        start = 0
+        while start < n:
+            end = min(start + max_size, n)
+            normal = min(start + avg_size, end)
+            cut = end
+            h = np.uint64(0)
+            # Aquece a janela com os 64 bytes anteriores ao primeiro corte possível
+            i = start + min_size - CDC_WINDOW
+            while i < start + min_size - 1 and i < end:
+                h = (h << np.uint64(1)) + gear[data[i]]
+                i += 1
+            found = False
+            while i < normal:
+                h = (h << np.uint64(1)) + gear[data[i]]
+                if (h & mask_hard) == 0:
+                    cut = i + 1
+                    found = True
+                    break
+                i += 1
+            while not found and i < end:
+                h = (h << np.uint64(1)) + gear[data[i]]
+                if (h & mask_easy) == 0:
+                    cut = i + 1
+                    found = True
+                i += 1
+            cuts[count] = cut
+            count += 1
+            start = cut
+        return cuts[:count]
+
+
+def _varint_size(value):
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+def _insert_size(length):
+    # Bytes ocupados no delta por ``length`` bytes literais (em partes de DELTA_MAX_INSERT)
+    full, rest = divmod(length, DELTA_MAX_INSERT)
+    size = full * (1 + _varint_size(DELTA_MAX_INSERT) + DELTA_MAX_INSERT)
+    if rest:
+        size += 1 + _varint_size(rest) + rest
+    return size
+
+
+def _match_length_numpy(base, base_pos, target, target_pos):
+    # Compara em janelas crescentes até a primeira diferença
+    limit = min(base.shape[0] - base_pos, target.shape[0] - target_pos)
+    length = 0
+    window = 4096
+    while length < limit:
+        step = min(window, limit - length)
+        differ = np.flatnonzero(
+            base[base_pos + length:base_pos + length + step]
+            != target[target_pos + length:target_pos + length + step]
+        )
+        if differ.shape[0]:
+            return length + int(differ[0])
+        length += step
+        window = min(window * 2, DELTA_MAX_INSERT)
+    return length
+
+
+def _window_hashes(data, start, stop, width):
+    # Hash de cada janela ``data[i:i + width]`` com ``i`` em ``[start, stop)``
+    h = np.zeros(stop - start, dtype=np.uint64)
+    for k in range(width):
+        h = h * DELTA_PRIME + data[start + k:stop + k].astype(np.uint64)
+    return h
+
+
+def _delta_ops_numpy(base, target, block_size, min_copy, max_size):
+    """Instruções do delta em NumPy: só os pontos com hash em comum são visitados.
+
+    Os blocos alinhados da base vão para uma tabela ordenada de hashes; os
+    hashes das janelas do alvo são calculados em segmentos e os candidatos
+    encontrados com ``searchsorted``. O laço em Python anda de candidato em
+    candidato (ou pula a cópia inteira), nunca byte a byte.
+    """
+    blocks = base.shape[0] // block_size
+    columns = base[:blocks * block_size].reshape(blocks, block_size)
+    hashes = np.zeros(blocks, dtype=np.uint64)
+    for k in range(block_size):
+        hashes = hashes * DELTA_PRIME + columns[:, k].astype(np.uint64)
+    order = np.argsort(hashes, kind="stable")
+    known, first = np.unique(hashes[order], return_index=True)
+    offsets = order[first].astype(np.int64) * block_size
+    filter_mask = np.uint64((1 << DELTA_FILTER_BITS) - 1)
+    present = np.zeros(1 << DELTA_FILTER_BITS, dtype=bool)
+    present[(known & filter_mask).astype(np.int64)] = True
+
+    n = target.shape[0]
+    last = n - block_size
+    ops = []
+    cost = _varint_size(base.shape[0]) + _varint_size(n)
+    pending = pos = 0
+    segment = DELTA_SEGMENT_MIN
+    segment_end = 0
+    hits = candidates = None
+    while pos <= last:
+        if pos >= segment_end:
+            segment_end = min(pos + segment, last + 1)
+            h = _window_hashes(target, pos, segment_end, block_size)
+            maybe = np.flatnonzero(present[(h & filter_mask).astype(np.int64)])
+            slots = np.searchsorted(known, h[maybe])
+            found = slots < known.shape[0]
+            found[found] = known[slots[found]] == h[maybe][found]
+            hits = maybe[found] + pos
+            candidates = offsets[slots[found]]
+            if not hits.shape[0]:
+                segment = min(segment * 2, DELTA_SEGMENT_MAX)
+        i = np.searchsorted(hits, pos)
+        pos = int(hits[i]) if i < hits.shape[0] else segment_end
+        if max_size >= 0 and cost + (pos - pending) > max_size:
+            return None
+        if i == hits.shape[0]:
+            continue
+        base_pos = int(candidates[i])
+        length = _match_length_numpy(base, base_pos, target, pos)
+        if length < min_copy:
+            pos += 1
+            continue
+        if pending < pos:
+            ops.append((DELTA_INSERT, pending, pos))
+            cost += _insert_size(pos - pending)
+        ops.append((DELTA_COPY, base_pos, length))
+        cost += 1 + _varint_size(base_pos) + _varint_size(length)
+        pos += length
+        pending = pos
+        segment = DELTA_SEGMENT_MIN
+        if max_size >= 0 and cost > max_size:
+            return None
+    if pending < n:
+        ops.append((DELTA_INSERT, pending, n))
+        cost += _insert_size(n - pending)
+    if max_size >= 0 and cost > max_size:
+        return None
+    return np.array(ops, dtype=np.int64).reshape(-1, 3)
+
+
+if HAVE_NUMBA:
+    @_jit(nogil=True)
+    def _varint_size_kernel(value):
+        size = 1
+        while value >= 0x80:
+            value >>= 7
+            size += 1
+        return size
+
+    @_jit(nogil=True)
+    def _insert_size_kernel(length):
+        full = length // DELTA_MAX_INSERT
+        rest = length % DELTA_MAX_INSERT
+        size = full * (1 + _varint_size_kernel(DELTA_MAX_INSERT) + DELTA_MAX_INSERT)
+        if rest:
+            size += 1 + _varint_size_kernel(rest) + rest
+        return size
+
+    @_jit(nogil=True)
+    def _delta_kernel(base, target, block_size, min_copy, max_size, prime):
+        # Tabela de endereçamento aberto com os blocos alinhados da base. Cada
+        # posição junta os 32 bits altos do hash e offset + 1 (0 = vazia), para
+        # que a consulta custe um único acesso à memória; a cópia é sempre
+        # conferida byte a byte
+        blocks = base.shape[0] // block_size
+        size = 1
+        while size < blocks + blocks // 2 + 1:
+            size <<= 1
+        mask = size - 1
+        table = np.zeros(size, dtype=np.uint64)
+        low = np.uint64(0xFFFFFFFF)
+        for block in range(blocks):
+            h = np.uint64(0)
+            for k in range(block * block_size, (block + 1) * block_size):
+                h = h * prime + np.uint64(base[k])
+            key = h >> np.uint64(32)
+            slot = np.int64(h & np.uint64(mask))
+            while table[slot] != 0 and (table[slot] >> np.uint64(32)) != key:
+                slot = (slot + 1) & mask
+            if table[slot] == 0:
+                table[slot] = (key << np.uint64(32)) | np.uint64(block * block_size + 1)
+
+        top = np.uint64(1)
+        for _ in range(block_size):
+            top *= prime
+        ops = np.empty((1024, 3), dtype=np.int64)
+        count = 0
+        n = target.shape[0]
+        last = n - block_size
+        cost = _varint_size_kernel(base.shape[0]) + _varint_size_kernel(n)
+        pending = 0
+        pos = 0
+        h = np.uint64(0)
+        hashed = -1
+        while pos <= last:
+            if hashed != pos:
+                h = np.uint64(0)
+                for k in range(pos, pos + block_size):
+                    h = h * prime + np.uint64(target[k])
+                hashed = pos
+            key = h >> np.uint64(32)
+            slot = np.int64(h & np.uint64(mask))
+            base_pos = -1
+            while table[slot] != 0:
+                if (table[slot] >> np.uint64(32)) == key:
+                    base_pos = np.int64(table[slot] & low) - 1
+                    break
+                slot = (slot + 1) & mask
+            length = 0
+            if base_pos >= 0:
+                limit = min(base.shape[0] - base_pos, n - pos)
+                while length < limit and base[base_pos + length] == target[pos + length]:
+                    length += 1
+            if length >= min_copy:
+                if count + 2 > ops.shape[0]:
+                    grown = np.empty((ops.shape[0] * 2, 3), dtype=np.int64)
+                    grown[:count] = ops[:count]
+                    ops = grown
+                if pending < pos:
+                    ops[count, 0] = DELTA_INSERT
+                    ops[count, 1] = pending
+                    ops[count, 2] = pos
+                    count += 1
+                    cost += _insert_size_kernel(pos - pending)
+                ops[count, 0] = DELTA_COPY
+                ops[count, 1] = base_pos
+                ops[count, 2] = length
+                count += 1
+                cost += 1 + _varint_size_kernel(base_pos) + _varint_size_kernel(length)
+                pos += length
+                pending = pos
+                if max_size >= 0 and cost > max_size:
+                    return ops[:0], False
+                continue
+            if pos < last:
+                h = h * prime + np.uint64(target[pos + block_size]) - np.uint64(target[pos]) * top
+                hashed = pos + 1
+            pos += 1
+            if max_size >= 0 and cost + (pos - pending) > max_size:
+                return ops[:0], False
+        if pending < n:
+            if count + 1 > ops.shape[0]:
+                grown = np.empty((ops.shape[0] + 1, 3), dtype=np.int64)
+                grown[:count] = ops[:count]
+                ops = grown
+            ops[count, 0] = DELTA_INSERT
+            ops[count, 1] = pending
+            ops[count, 2] = n
+            count += 1
+            cost += _insert_size_kernel(n - pending)
+        if max_size >= 0 and cost > max_size:
+            return ops[:0], False
+        return ops[:count], True
+
+
+def _numba_failed(error):
+    # Falha de compilação (LLVM, CPU não suportada, ...): segue em NumPy
+    global HAVE_NUMBA, _fallback_reason
+    HAVE_NUMBA = False
+    _fallback_reason = f"{type(error).__name__}: {error}"
+
+
+def backend():
+    """``"numba"`` ou ``"numpy"``: a implementação em uso pelos kernels."""
+    return "numba" if HAVE_NUMBA else "numpy"
+
+
+def fallback_reason():
+    return _fallback_reason
+
+
+def run_in_worker(func, *args):
+    """Executa ``func`` numa thread que não é a principal (caminho dos workers)."""
+    result = []
+    worker = threading.Thread(target=lambda: result.append(func(*args)))
+    worker.start()
+    worker.join()
+    return result[0]
+
+
+def adler32(data, value=1):
+    """Checksum Adler-32 de um array uint8, continuando a partir de ``value``.
+
+    Equivalente a ``zlib.adler32(data, value)``; permite atualizar o checksum
+    bloco a bloco durante a leitura em streaming.
+    """
+    if HAVE_NUMBA:
+        try:
+            return int(_adler32_kernel(data, value))
+        except _COMPILE_ERRORS as e:
+            _numba_failed(e)
+    return _adler32_numpy(data, value)
+
+
+def adler32_batch(buffer, offsets):
+    """Adler-32 de vários arquivos empacotados num único buffer uint8.
+
+    ``offsets`` tem ``n + 1`` posições: o arquivo ``i`` ocupa
+    ``buffer[offsets[i]:offsets[i + 1]]``. Retorna um array uint32 com os
+    ``n`` checksums, calculados numa única chamada ao kernel.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if HAVE_NUMBA:
+        try:
+            if threading.current_thread() is threading.main_thread():
+                return _adler32_batch_parallel(buffer, offsets)
+            return _adler32_batch_serial(buffer, offsets)
+        except _COMPILE_ERRORS as e:
+            _numba_failed(e)
+    return _adler32_batch_numpy(buffer, offsets)
+
+
+def cdc_cuts(data, min_size, avg_size, max_size):
+    """Pontos de corte (fins dos pedaços) de ``data`` pelo FastCDC.
+
+    ``data`` é um array uint8; o último corte é sempre ``len(data)``. Os
+    cortes dependem só do conteúdo a partir do início de cada pedaço, então
+    uma edição no meio de um arquivo grande muda apenas os pedaços vizinhos.
+    Exige ``min_size >= CDC_WINDOW``.
+    """
+    mask_hard, mask_easy = cdc_masks(avg_size)
+    if HAVE_NUMBA:
+        try:
+            return _cdc_kernel(data, min_size, avg_size, max_size, mask_hard, mask_easy, CDC_GEAR)
+        except _COMPILE_ERRORS as e:
+            _numba_failed(e)
+    return _cdc_numpy(data, min_size, avg_size, max_size, mask_hard, mask_easy, CDC_GEAR)
+
+
+def delta_ops(base, target, block_size, min_copy, max_size=-1):
+    """Instruções do delta que transforma ``base`` em ``target`` (arrays uint8).
+
+    Retorna um array ``(n, 3)``: ``(DELTA_COPY, offset, tamanho)`` copia da
+    base e ``(DELTA_INSERT, início, fim)`` insere ``target[início:fim]``.
+    Blocos alinhados de ``block_size`` bytes da base são indexados; cópias
+    menores que ``min_copy`` não são usadas. Retorna None se o delta
+    codificado passar de ``max_size`` bytes (negativo = sem limite).
+    """
+    # A tabela do kernel guarda os offsets em 32 bits
+    if HAVE_NUMBA and base.shape[0] < (1 << 32) - 1:
+        try:
+            ops, fits = _delta_kernel(base, target, block_size, min_copy, max_size, DELTA_PRIME)
+            return ops if fits else None
+        except _COMPILE_ERRORS as e:
+            _numba_failed(e)
+    return _delta_ops_numpy(base, target, block_size, min_copy, max_size)
@@ -0,0 +1,445 @@
+import os
+import heapq
+import msgpack
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from core.pack import OBJ_BLOB, OBJ_COMMIT, OBJ_TREE, OBJ_CHUNKED
+from core.objects import TREE, parse_tree, flatten_tree
+from core.chunking import parse_manifest
+from remote.stream import read_stream, ReadAhead
+
+
+# Commits perguntados ao remoto por rodada de negociação
+NEGOTIATION_BATCH = 256
+# Threads que gravam os objetos recebidos
+FETCH_WRITERS = 4
+# Objetos recebidos aguardando gravação (limita os temporários em disco)
+FETCH_MAX_PENDING = 64
+# Existe enquanto um fetch não terminou de gravar tudo (em ``.dee``)
+FETCH_MARKER = "FETCH_INCOMPLETE"
+# Bytes pedidos por leitura em faixas (fetch parcial e busca sob demanda)
+RANGE_BATCH_BYTES = 32 << 20
+
+
+def find_missing_commits(repo, store, head):
+    """Negocia com o remoto quais commits a partir de ``head`` faltam lá.
+
+    Os commits são perguntados em lotes, do mais novo para o mais antigo
+    (ordem de geração do commit-graph). Um commit que o remoto já tem
+    encerra a caminhada por aquele ramo: seus ancestrais também estão lá.
+    Retorna ``(faltantes, fronteira)``: os commits a enviar, do mais antigo
+    para o mais novo, e os commits conhecidos pelo remoto onde a busca parou.
+    """
+    graph = repo._commit_graph()
+    start = repo._graph_position(head)
+    heap = [(-graph.generation(start), start)]
+    seen = {start}
+    missing = []
+    boundary = []
+    while heap:
+        batch = [heapq.heappop(heap)[1] for _ in range(min(NEGOTIATION_BATCH, len(heap)))]
+        known = store.known_commits([graph.hexsha(pos) for pos in batch])
+        for pos in batch:
+            if graph.hexsha(pos) in known:
+                boundary.append(graph.hexsha(pos))
+                continue
+            missing.append(pos)
+            for parent in graph.parents(pos):
+                if parent not in seen:
+                    seen.add(parent)
+                    heapq.heappush(heap, (-graph.generation(parent), parent))
+    missing.sort(key=graph.generation)
+    return [graph.hexsha(pos) for pos in missing], boundary
+
+
+def _walk_tree(repo, tree_hash, trees, blobs, skip_trees=()):
+    # Coleta árvores e blobs alcançáveis, sem repetir subárvores já vistas
+    stack = [tree_hash]
+    while stack:
+        current = stack.pop()
+        if current in trees or current in skip_trees:
+            continue
+        trees.add(current)
+        for _, kind, obj_hash, _ in repo._read_tree(current):
+            if kind == TREE:
+                stack.append(obj_hash)
+            else:
+                blobs.add(obj_hash)
+
+
+def _commit_objects(repo, commit_hash, trees, blobs, skip_trees=()):
+    commit_data = repo._read_commit(commit_hash)
+    if "tree" in commit_data:
+        _walk_tree(repo, commit_data["tree"], trees, blobs, skip_trees)
+    else:
+        blobs.update(meta["hash"] for meta in repo._commit_files(commit_data).values())
+
+
+def _object_source(repo, obj_type, obj_hash):
+    # Objetos soltos vão pelo caminho (lidos em blocos pelo stream); os que
+    # estão em pack ou no SQLite já vêm em memória
+    store = _object_store(repo, obj_type)
+    path = store.path(obj_hash)
+    if path is not None:
+        try:
+            return obj_type, obj_hash, os.path.getsize(path), path
+        except FileNotFoundError:
+            pass
+    data = repo._read_object(obj_hash, store)
+    return obj_type, obj_hash, len(data), data
+
+
+def objects_to_send(repo, missing, boundary):
+    """Objetos dos commits ``missing`` que o remoto ainda não tem.
+
+    Tudo o que é alcançável pelos commits da ``fronteira`` já está no remoto
+    e é excluído; subárvores inteiras em comum são puladas sem ser abertas.
+    Gera ``(tipo, hash, tamanho, bytes_ou_caminho)`` na ordem blobs, árvores,
+    commits, para que um commit nunca chegue antes do seu conteúdo.
+    """
+    remote_trees, remote_blobs = set(), set()
+    for commit_hash in boundary:
+        _commit_objects(repo, commit_hash, remote_trees, remote_blobs)
+
+    trees, blobs = set(), set()
+    for commit_hash in missing:
+        _commit_objects(repo, commit_hash, trees, blobs, remote_trees)
+
+    # Blobs em pedaços vão como manifesto, depois dos pedaços que o remoto
+    # não tem (os dos blobs em pedaços da fronteira já estão lá)
+    blobs = sorted(blobs - remote_blobs)
+    manifests = {}
+    for blob_hash in blobs:
+        chunks = repo._chunk_manifest(blob_hash)
+        if chunks is not None:
+            manifests[blob_hash] = chunks
+    chunks = set()
+    if manifests:
+        remote_chunks = set()
+        # Só os presentes: num clone parcial os demais estão prometidos
+        for blob_hash in repo._has_objects(remote_blobs, repo.blob_store):
+            remote_chunks.update(h for h, _ in repo._chunk_manifest(blob_hash) or ())
+        chunks = {h for listed in manifests.values() for h, _ in listed} - remote_chunks - remote_blobs
+    for chunk_hash in sorted(chunks - set(blobs)):
+        yield _object_source(repo, OBJ_BLOB, chunk_hash)
+    for blob_hash in blobs:
+        if blob_hash not in manifests:
+            yield _object_source(repo, OBJ_BLOB, blob_hash)
+    for blob_hash in manifests:
+        yield _object_source(repo, OBJ_CHUNKED, blob_hash)
+    for tree_hash in sorted(trees):
+        yield _object_source(repo, OBJ_TREE, tree_hash)
+    for commit_hash in missing:
+        yield _object_source(repo, OBJ_COMMIT, commit_hash)
+
+
+def push(repo, store, branch, head, level=None):
+    """Envia ``head`` para ``branch`` no remoto.
+
+    ``level`` é o nível de compressão do stream (None = sem compressão).
+    Retorna ``(status, commits_enviados)`` com status ``"up-to-date"``,
+    ``"rejected"`` (o remoto tem commits que não temos) ou ``"ok"``.
+    """
+    store.init()
+    remote_head = store.read_ref(branch)
+    if remote_head == head:
+        return "up-to-date", 0
+    if remote_head is not None:
+        # Só fast-forward: a ponta remota precisa ser ancestral da local
+        if not repo._has_object(remote_head, repo.object_store) or not repo.is_ancestor(remote_head, head):
+            return "rejected", 0
+    missing, boundary = find_missing_commits(repo, store, head)
+    if missing:
+        store.upload_pack(objects_to_send(repo, missing, boundary), missing, level)
+    if not store.update_ref(branch, remote_head, head):
+        return "rejected", len(missing)
+    return "ok", len(missing)
+
+
+def _object_store(repo, obj_type):
+    return repo.blob_store if obj_type in (OBJ_BLOB, OBJ_CHUNKED) else repo.object_store
+
+
+def _drain(pending, limit):
+    # Espera gravações até sobrarem ``limit`` pendentes; propaga erros
+    while len(pending) > limit:
+        done, _ = wait(pending, return_when=FIRST_EXCEPTION)
+        for future in done:
+            pending.pop(future)
+            future.result()
+
+
+def _dependency_order(held, references):
+    # Ordena ``{hash: dados}`` para que cada objeto venha depois dos que ele
+    # cita (``references(dados)``) e que também estão em ``held``
+    order, done = [], set()
+    for root in held:
+        stack = [(root, False)]
+        while stack:
+            obj_hash, expanded = stack.pop()
+            if obj_hash in done:
+                continue
+            if expanded:
+                done.add(obj_hash)
+                order.append(obj_hash)
+                continue
+            stack.append((obj_hash, True))
+            stack.extend((ref, False) for ref in references(held[obj_hash]) if ref in held and ref not in done)
+    return order
+
+
+def _tree_references(data):
+    return [obj_hash for _, kind, obj_hash, _ in parse_tree(data) if kind == TREE]
+
+
+def _commit_references(data):
+    commit_data = msgpack.unpackb(data, strict_map_key=False)
+    return [commit_data.get("tree")] + commit_data.get("parents", [])
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def fetch(repo, store, head):
+    """Baixa do remoto os objetos que faltam localmente para ``head``.
+
+    Só os packs cujo manifesto cita algum objeto ausente são lidos, e dentro
+    deles os objetos que já existem são pulados sem ser descomprimidos. O
+    download roda numa thread à frente da leitura (``ReadAhead``), cada
+    objeto vai para um temporário do store de destino com o SHA-1 conferido
+    enquanto chega, e um pool de threads move os blobs para o store.
+
+    Árvores e commits (e manifestos de blobs em pedaços) ficam nos
+    temporários até todos os blobs estarem gravados; depois entram em ordem
+    de dependência, commits por último. Enquanto isso existe
+    ``.dee/FETCH_INCOMPLETE``, apagado só no fim: um fetch interrompido é
+    retomado mesmo que ``head`` já esteja no store. Um objeto corrompido
+    interrompe o fetch com ValueError antes de qualquer ref ser atualizada.
+    Retorna quantos objetos foram gravados.
+    """
+    marker = os.path.join(repo.repo_dir, FETCH_MARKER)
+    if repo._has_object(head, repo.object_store) and not os.path.exists(marker):
+        return 0
+    with open(marker, "w") as f:
+        f.write(head)
+    received = set()
+    # Gravados só depois dos blobs: manifestos, árvores e commits
+    held = {OBJ_CHUNKED: {}, OBJ_TREE: {}, OBJ_COMMIT: {}}
+
+    def temp_file(obj_type):
+        return _object_store(repo, obj_type).temp_file()
+
+    with ThreadPoolExecutor(max_workers=FETCH_WRITERS) as writers:
+        pending = {}
+        try:
+            for pack_id in store.list_packs():
+                manifest = store.read_manifest(pack_id)
+                by_type = {}
+                for obj_hash, obj_type, _, _ in manifest["objects"]:
+                    if obj_hash not in received:
+                        by_type.setdefault(obj_type in (OBJ_BLOB, OBJ_CHUNKED), set()).add(obj_hash)
+                # Uma consulta em lote por store, não um stat por objeto
+                missing = set()
+                for is_blob, hashes in by_type.items():
+                    local = repo.blob_store if is_blob else repo.object_store
+                    missing |= hashes - repo._has_objects(hashes, local)
+                if not missing:
+                    continue
+                with store.open_pack(pack_id) as f:
+                    reader = ReadAhead(f)
+                    try:
+                        for obj_type, obj_hash, tmp_path in read_stream(reader, missing, temp_file):
+                            received.add(obj_hash)
+                            if obj_type in held:
+                                held[obj_type][obj_hash] = tmp_path
+                                continue
+                            future = writers.submit(_object_store(repo, obj_type).put_file, obj_hash, tmp_path)
+                            pending[future] = tmp_path
+                            _drain(pending, FETCH_MAX_PENDING)
+                    finally:
+                        reader.close()
+            _drain(pending, 0)
+            if head not in received and not repo._has_object(head, repo.object_store):
+                raise ValueError(f"Commit {head} não encontrado no remoto")
+
+            # Os pedaços já estão gravados: os manifestos podem entrar
+            for obj_hash, tmp_path in list(held[OBJ_CHUNKED].items()):
+                repo.blob_store.put_file(obj_hash, tmp_path)
+                del held[OBJ_CHUNKED][obj_hash]
+            for obj_type, references in ((OBJ_TREE, _tree_references), (OBJ_COMMIT, _commit_references)):
+                paths = held[obj_type]
+                data = {obj_hash: _read_file(tmp_path) for obj_hash, tmp_path in paths.items()}
+                for obj_hash in _dependency_order(data, references):
+                    repo.object_store.put_file(obj_hash, paths.pop(obj_hash))
+        finally:
+            for future, tmp_path in pending.items():
+                # put_file apaga o temporário; os que nem começaram ficam aqui
+                if future.cancel() and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            for paths in held.values():
+                for tmp_path in paths.values():
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+    os.remove(marker)
+    return len(received)
+
+
+def download_objects(store, locations, hashes):
+    """Baixa só os registros de ``hashes``, lendo faixas de bytes dos packs.
+
+    ``locations`` vem de ``RemoteStore.locate_objects``. As faixas de cada
+    pack são pedidas em ordem de offset e em lotes de até
+    ``RANGE_BATCH_BYTES``. Gera ``(tipo, hash, dados)``, com o SHA-1 de
+    cada objeto conferido.
+    """
+    by_pack = {}
+    for obj_hash in hashes:
+        found = locations.get(obj_hash)
+        if found is None:
+            raise ValueError(f"Objeto {obj_hash} não encontrado no remoto")
+        pack_id, _, start, end = found
+        by_pack.setdefault(pack_id, []).append((start, end))
+    wanted = set(hashes)
+    for pack_id, ranges in sorted(by_pack.items()):
+        ranges.sort()
+        batches, size = [[]], 0
+        for start, end in ranges:
+            if size >= RANGE_BATCH_BYTES:
+                batches.append([])
+                size = 0
+            batches[-1].append((start, end))
+            size += end - start
+        for batch in batches:
+            for obj_type, obj_hash, data in store.read_objects(pack_id, batch):
+                if obj_hash not in wanted:
+                    raise ValueError(f"Manifesto inconsistente no remoto: {obj_hash}")
+                yield obj_type, obj_hash, data
+
+
+def _store_blobs(repo, store, locations, hashes):
+    # Grava os blobs baixados; os que vêm em pedaços trazem junto os pedaços
+    # que faltam localmente, e o manifesto só é gravado depois deles
+    count = 0
+    manifests = {}
+    for obj_type, obj_hash, data in download_objects(store, locations, hashes):
+        if obj_type == OBJ_CHUNKED:
+            manifests[obj_hash] = data
+            continue
+        repo.blob_store.put(obj_hash, data)
+        count += 1
+    if manifests:
+        chunks = {h for obj_hash, data in manifests.items() for h, _ in parse_manifest(obj_hash, data)}
+        count += _store_blobs(repo, store, locations, chunks - repo._has_objects(chunks, repo.blob_store))
+        repo.blob_store.put_many(manifests.items())
+        count += len(manifests)
+    return count
+
+
+def fetch_partial(repo, store, head, promisor, depth=None):
+    """Fetch de clone parcial/raso: só os commits e caminhos pedidos.
+
+    - commits: a partir de ``head``, nível a nível, até ``depth`` commits
+      (None = até os que já existem localmente). Os mais antigos trazidos
+      sem os pais formam a fronteira rasa;
+    - árvores: todas as dos commits trazidos (são pequenas e permitem
+      listar qualquer caminho sem rede);
+    - blobs: só os da árvore de ``head`` cobertos pelo filtro. Os demais
+      blobs citados pelas árvores novas ficam prometidos.
+
+    Só são lidas do remoto as faixas de bytes desses objetos. Commits e
+    árvores ficam em memória até o fim e são gravados depois dos blobs e do
+    registro de prometidos e da fronteira: se o fetch for interrompido, nada
+    gravado cita um objeto que não existe nem está prometido. Retorna quantos
+    objetos foram gravados.
+    """
+    if repo._has_object(head, repo.object_store):
+        return 0
+    locations = store.locate_objects()
+    if head not in locations:
+        raise ValueError(f"Commit {head} não encontrado no remoto")
+    pending = {}
+
+    def receive(hashes):
+        for _, obj_hash, data in download_objects(store, locations, hashes):
+            pending[obj_hash] = data
+
+    # 1) Commits, do mais novo para o mais antigo
+    if depth is None:
+        # Sem limite, os commits que faltam vêm num único lote
+        remote_commits = [h for h, found in locations.items() if found[1] == OBJ_COMMIT]
+        receive(set(remote_commits) - repo._has_objects(remote_commits, repo.object_store))
+    commits, shallow = {}, []
+    level, seen, generation = [head], {head}, 1
+    while level:
+        local = repo._has_objects(level, repo.object_store)
+        receive([h for h in level if h not in local and h not in pending])
+        next_level = []
+        for commit_hash in level:
+            if commit_hash in local:
+                continue
+            commit_data = msgpack.unpackb(pending[commit_hash], strict_map_key=False)
+            commits[commit_hash] = commit_data
+            parents = commit_data.get("parents", [])
+            if depth is not None and generation >= depth:
+                if parents:
+                    shallow.append(commit_hash)
+                continue
+            for parent in parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    next_level.append(parent)
+        level = next_level
+        generation += 1
+
+    # 2) Árvores dos commits novos, nível a nível; árvores locais já têm os
+    # blobs baixados ou prometidos e não são abertas
+    trees, blobs = {}, set()
+    level = list({data.get("tree") for data in commits.values()} - {None})
+    seen = set(level)
+    while level:
+        local = repo._has_objects(level, repo.object_store)
+        receive([h for h in level if h not in local and h not in pending])
+        next_level = []
+        for tree_hash in level:
+            if tree_hash in local:
+                continue
+            trees[tree_hash] = pending[tree_hash]
+            for _, kind, obj_hash, _ in parse_tree(pending[tree_hash]):
+                if kind != TREE:
+                    blobs.add(obj_hash)
+                elif obj_hash not in seen:
+                    seen.add(obj_hash)
+                    next_level.append(obj_hash)
+        level = next_level
+    for commit_data in commits.values():
+        blobs.update(meta["hash"] for meta in commit_data.get("files", {}).values())
+
+    # 3) Blobs: os do filtro na árvore de head agora, o resto prometido
+    def read_tree(tree_hash):
+        data = trees.get(tree_hash)
+        return parse_tree(data) if data is not None else repo._read_tree(tree_hash)
+
+    head_data = commits[head]
+    head_files = (
+        flatten_tree(read_tree, head_data["tree"]) if "tree" in head_data else head_data.get("files", {})
+    )
+    eager = {meta["hash"] for rel_path, meta in head_files.items() if promisor.covers(rel_path)}
+    blobs |= eager
+    missing = blobs - repo._has_objects(blobs, repo.blob_store)
+    written = _store_blobs(repo, store, locations, missing & eager)
+    promisor.promise(missing - eager)
+    promisor.add_shallow(shallow)
+    repo.object_store.put_many(trees.items())
+    # Commits por último, dos mais antigos para os mais novos
+    repo.object_store.put_many((h, pending[h]) for h in reversed(list(commits)))
+    return written + len(trees) + len(commits)
+
+
+def fetch_promised(repo, store, promisor, hashes):
+    """Baixa os blobs prometidos ``hashes`` (busca sob demanda de um clone parcial)."""
+    locations = promisor.locations(store)
+    if any(h not in locations for h in hashes):
+        # O remoto recebeu pushes depois que os manifestos foram lidos
+        locations = promisor.locations(store, refresh=True)
+    return _store_blobs(repo, store, locations, hashes)
@@ -0,0 +1,68 @@
+import atexit
+import threading
+
+
+class SSHPool:
+    """Conexões SSH reaproveitadas dentro do processo.
+
+    Cada destino (host, porta, usuário) tem um único ``paramiko.Transport``;
+    comandos abrem canais novos nele e as operações de arquivo compartilham
+    um único cliente SFTP. Assim um push paga o handshake SSH uma vez só.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._sftp = {}
+
+    def client(self, host, port=22, username=None, password=None, key_filename=None):
+        import paramiko
+
+        key = (host, port, username)
+        with self._lock:
+            client = self._clients.get(key)
+            transport = client.get_transport() if client is not None else None
+            if transport is None or not transport.is_active():
+                client = paramiko.SSHClient()
+                client.load_system_host_keys()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(
+                    hostname=host,
+                    port=port,
+                    username=username,
+                    password=password,
+                    key_filename=key_filename,
+                )
+                self._clients[key] = client
+                self._sftp.pop(key, None)
+            return client
+
+    def sftp(self, host, port=22, username=None, password=None, key_filename=None):
+        client = self.client(host, port, username, password, key_filename)
+        key = (host, port, username)
+        with self._lock:
+            sftp = self._sftp.get(key)
+            if sftp is None:
+                sftp = client.open_sftp()
+                self._sftp[key] = sftp
+            return sftp
+
+    def exec(self, host, command, port=22, username=None, password=None, key_filename=None):
+        """Executa ``command`` num canal novo do transporte compartilhado."""
+        client = self.client(host, port, username, password, key_filename)
+        _, stdout, stderr = client.exec_command(command)
+        status = stdout.channel.recv_exit_status()
+        return status, stdout.read().decode(), stderr.read().decode()
+
+    def close(self):
+        with self._lock:
+            for sftp in self._sftp.values():
+                sftp.close()
+            for client in self._clients.values():
+                client.close()
+            self._sftp.clear()
+            self._clients.clear()
+
+
+pool = SSHPool()
+atexit.register(pool.close)
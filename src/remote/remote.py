@@ -0,0 +1,63 @@
+import posixpath
+from urllib.parse import urlparse, unquote
+from core.config import config_get
+from remote.transport import LocalTransport, SFTPTransport
+from remote.metadata import open_metadata
+from remote.store import RemoteStore
+
+
+class RemoteTransport:
+    """Remoto configurado em ``[remote]`` (``.dee/config`` ou ``~/.deeconfig``).
+
+    - ``url``: ``file:///caminho`` ou ``ssh://usuário@host[:porta]/caminho``;
+      o repositório fica em ``<caminho>/<repo_id>``;
+    - ``password`` / ``key_file``: autenticação SSH (opcionais: sem eles
+      valem o agente e as chaves padrão);
+    - ``metadata``: ``sqlite:///...`` ou ``postgresql://...`` (opcional);
+    - ``compression``: ``store`` ou nível zlib de 1 a 9 do stream de push
+      (padrão 6).
+
+    Junta o acesso a arquivos (``transport``), o layout remoto (``store``) e
+    os metadados do servidor (``metadata``).
+    """
+
+    def __init__(self, transport, metadata, repo_id=None):
+        self.transport = transport
+        self.store = RemoteStore(transport)
+        self.metadata = metadata
+        self.repo_id = repo_id
+
+    @classmethod
+    def from_config(cls, config, repo_id=None):
+        url = config_get(config, "remote.url")
+        if not url:
+            raise ValueError(
+                "Remoto não configurado. Use: dee config remote.url ssh://usuário@host/caminho"
+            )
+        parsed = urlparse(url)
+        base = unquote(parsed.path) or "/"
+        root = posixpath.join(base, str(repo_id)) if repo_id else base
+        if parsed.scheme == "file":
+            transport = LocalTransport(root)
+        elif parsed.scheme == "ssh":
+            transport = SFTPTransport(
+                parsed.hostname,
+                root,
+                port=parsed.port or 22,
+                username=parsed.username,
+                password=config_get(config, "remote.password"),
+                key_filename=config_get(config, "remote.key_file"),
+            )
+        else:
+            raise ValueError(f"Esquema de remoto não suportado: {url}")
+        metadata = open_metadata(config_get(config, "remote.metadata"))
+        return cls(transport, metadata, repo_id)
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,140 @@
+import posixpath
+import uuid
+import msgpack
+from remote.stream import write_stream, decode_record, END_RECORD_SIZE
+
+
+class RemoteStore:
+    """Layout de um repositório remoto sobre um ``Transport``.
+
+    - ``refs/heads/<branch>``: hash do commit da branch;
+    - ``packs/<id>.dstm``: stream de objetos de um push;
+    - ``packs/<id>.manifest``: objetos do stream (hash, tipo, offset, tamanho);
+    - ``commits``: hashes de todos os commits armazenados, um por linha.
+
+    Um pack só é anunciado (manifesto e lista de commits) depois que o stream
+    foi gravado por inteiro, e a ref só avança depois disso. Enquanto uma ref
+    é atualizada existe ``refs/heads/<branch>.lock``, criado de forma
+    exclusiva no remoto.
+    """
+
+    PACKS = "packs"
+    HEADS = "refs/heads"
+    COMMITS = "commits"
+    LOCK_SUFFIX = ".lock"
+
+    def __init__(self, transport):
+        self.transport = transport
+        self._commits = None
+
+    def init(self):
+        self.transport.makedirs(self.PACKS)
+        self.transport.makedirs(self.HEADS)
+
+    def read_ref(self, branch):
+        path = posixpath.join(self.HEADS, branch)
+        if not self.transport.exists(path):
+            return None
+        return self.transport.read_bytes(path).decode().strip() or None
+
+    def list_refs(self):
+        return {
+            branch: self.read_ref(branch)
+            for branch in self.transport.listdir(self.HEADS)
+            if not branch.endswith(self.LOCK_SUFFIX)
+        }
+
+    def update_ref(self, branch, old, new):
+        """Avança ``branch`` de ``old`` para ``new`` (compare-and-swap).
+
+        A leitura e a escrita acontecem com a trava da ref: dois pushes
+        simultâneos não conseguem os dois avançar a partir do mesmo ``old``.
+        False se a ref não está mais em ``old`` ou se outro cliente está com
+        a trava (um ``.lock`` que sobrou de um push interrompido precisa ser
+        apagado à mão).
+        """
+        path = posixpath.join(self.HEADS, branch)
+        lock_path = path + self.LOCK_SUFFIX
+        if not self.transport.create_exclusive(lock_path):
+            return False
+        try:
+            if self.read_ref(branch) != old:
+                return False
+            # A escrita troca o arquivo por rename: quem lê vê a ref antiga ou a nova
+            self.transport.write_bytes(path, new.encode())
+            return True
+        finally:
+            self.transport.remove(lock_path)
+
+    def _load_commits(self):
+        if self._commits is None:
+            self._commits = set()
+            if self.transport.exists(self.COMMITS):
+                self._commits.update(self.transport.read_bytes(self.COMMITS).decode().split())
+        return self._commits
+
+    def known_commits(self, commit_hashes):
+        """Quais dos ``commit_hashes`` o remoto já armazena."""
+        commits = self._load_commits()
+        return {h for h in commit_hashes if h in commits}
+
+    def upload_pack(self, objects, commit_hashes, level=None):
+        """Grava ``objects`` num único stream e anuncia o pack. Retorna o id.
+
+        O stream vai direto para o remoto, sem arquivo temporário local;
+        ``level`` é o nível de compressão zlib (None = sem compressão).
+        """
+        pack_id = uuid.uuid4().hex
+        upload = self.transport.open_write(posixpath.join(self.PACKS, f"{pack_id}.dstm"))
+        try:
+            manifest = write_stream(upload, objects, level)
+        except BaseException:
+            upload.abort()
+            raise
+        upload.commit()
+        self.transport.write_bytes(
+            posixpath.join(self.PACKS, f"{pack_id}.manifest"),
+            msgpack.packb({"objects": manifest, "commits": list(commit_hashes)}),
+        )
+        if commit_hashes:
+            with self.transport.open_append(self.COMMITS) as f:
+                f.write("".join(f"{h}\n" for h in commit_hashes).encode())
+            self._load_commits().update(commit_hashes)
+        return pack_id
+
+    def list_packs(self):
+        return sorted(
+            name[:-len(".manifest")]
+            for name in self.transport.listdir(self.PACKS)
+            if name.endswith(".manifest")
+        )
+
+    def read_manifest(self, pack_id):
+        data = self.transport.read_bytes(posixpath.join(self.PACKS, f"{pack_id}.manifest"))
+        return msgpack.unpackb(data, strict_map_key=False)
+
+    def open_pack(self, pack_id):
+        return self.transport.open_read(posixpath.join(self.PACKS, f"{pack_id}.dstm"))
+
+    def locate_objects(self):
+        """``{hash: (pack, tipo, início, fim)}`` dos registros de todos os packs.
+
+        O manifesto só guarda onde cada registro começa: o fim é o início do
+        seguinte e, no último, o começo do registro que encerra o stream.
+        """
+        located = {}
+        for pack_id in self.list_packs():
+            objects = self.read_manifest(pack_id)["objects"]
+            if not objects:
+                continue
+            end = self.transport.size(posixpath.join(self.PACKS, f"{pack_id}.dstm")) - END_RECORD_SIZE
+            for obj_hash, obj_type, offset, _ in reversed(objects):
+                located.setdefault(obj_hash, (pack_id, obj_type, offset, end))
+                end = offset
+        return located
+
+    def read_objects(self, pack_id, ranges):
+        """Lê só os registros ``(início, fim)`` do pack, gerando ``(tipo, hash, dados)``."""
+        path = posixpath.join(self.PACKS, f"{pack_id}.dstm")
+        for record in self.transport.read_ranges(path, [(start, end - start) for start, end in ranges]):
+            yield decode_record(record)
@@ -0,0 +1,331 @@
+"""Formato do stream de objetos trocado com o remoto.
+
+Cabeçalho ``<4sBB>`` (magic, versão, codec padrão). Cada objeto começa com
+``<B20sQB>`` (tipo, hash, tamanho, codec) seguido dos dados em blocos
+``<I>`` + bytes, terminados por um bloco de tamanho 0. Um registro com tipo 0
+encerra o stream. Com blocos, nem quem escreve nem quem lê precisa ter um
+objeto grande inteiro na memória.
+"""
+import io
+import os
+import zlib
+import queue
+import struct
+import hashlib
+import threading
+from core.pack import OBJ_CHUNKED
+from core.chunking import parse_manifest
+
+
+STREAM_MAGIC = b"DSTM"
+STREAM_VERSION = 2
+# Objetos gravados como estão
+CODEC_STORE = 0
+# Objetos comprimidos com zlib
+CODEC_ZLIB = 1
+
+# Tamanho dos blocos lidos e enviados
+CHUNK_SIZE = 1 << 20
+# Blocos prontos aguardando envio: limita a memória a ~QUEUE_CHUNKS * CHUNK_SIZE
+QUEUE_CHUNKS = 16
+# Amostra usada para decidir se vale comprimir um objeto
+PROBE_SIZE = 64 * 1024
+# Nível usado quando ``remote.compression`` não está configurado
+DEFAULT_LEVEL = 6
+
+_HEADER = struct.Struct("<4sBB")
+_RECORD = struct.Struct("<B20sQB")
+_CHUNK = struct.Struct("<I")
+_END = 0
+# Tamanho do registro que encerra o stream (o último objeto termina antes dele)
+END_RECORD_SIZE = _RECORD.size
+_DONE = object()
+
+
+def compression_level(value):
+    """Converte ``remote.compression`` num nível zlib; None = sem compressão.
+
+    Aceita ``store``/``none``/``0`` (sem compressão) ou um nível de 1 a 9.
+    """
+    if value is None or value == "":
+        return DEFAULT_LEVEL
+    value = str(value).strip().lower()
+    if value in ("store", "none", "off", "0"):
+        return None
+    try:
+        level = int(value)
+    except ValueError:
+        level = -1
+    if not 1 <= level <= 9:
+        raise ValueError(f"remote.compression inválido: {value} (use store ou 1-9)")
+    return level
+
+
+def _read_exact(f, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = f.read(remaining)
+        if not chunk:
+            raise ValueError("Stream de objetos truncado")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _source_chunks(source):
+    # ``source`` é bytes ou o caminho de um arquivo (lido em blocos)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield bytes(view[start:start + CHUNK_SIZE])
+        return
+    with open(source, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _compressible(first_chunk, level):
+    # Conteúdo já comprimido (imagens, zips, ...) quase não encolhe: a amostra
+    # do início decide se o objeto inteiro vai comprimido ou como está.
+    sample = first_chunk[:PROBE_SIZE]
+    return len(zlib.compress(sample, level)) < len(sample) * 0.9
+
+
+def _encode_objects(objects, level):
+    """Gera os bytes do stream, bloco a bloco."""
+    default_codec = CODEC_STORE if level is None else CODEC_ZLIB
+    yield _HEADER.pack(STREAM_MAGIC, STREAM_VERSION, default_codec)
+    for obj_type, obj_hash, size, source in objects:
+        chunks = _source_chunks(source)
+        first = next(chunks, b"")
+        codec = CODEC_ZLIB if level is not None and first and _compressible(first, level) else CODEC_STORE
+        yield _RECORD.pack(obj_type, bytes.fromhex(obj_hash), size, codec)
+        compressor = zlib.compressobj(level) if codec == CODEC_ZLIB else None
+        for chunk in _prepend(first, chunks):
+            out = compressor.compress(chunk) if compressor else chunk
+            if out:
+                yield _CHUNK.pack(len(out)) + out
+        if compressor:
+            out = compressor.flush()
+            if out:
+                yield _CHUNK.pack(len(out)) + out
+        yield _CHUNK.pack(0)
+    yield _RECORD.pack(_END, b"\0" * 20, 0, CODEC_STORE)
+
+
+def _prepend(first, rest):
+    if first:
+        yield first
+    yield from rest
+
+
+def write_stream(out, objects, level=None):
+    """Grava ``objects`` em ``out``: ``(tipo, hash, tamanho, bytes_ou_caminho)``.
+
+    A leitura e a compressão (``level`` 0-9; None = sem compressão) rodam
+    numa thread de trabalho, que alimenta uma fila limitada; esta thread só
+    escreve em ``out``, de modo que compressão e rede se sobrepõem e a
+    memória fica limitada a alguns blocos. Retorna o manifesto:
+    ``[hash, tipo, offset_do_registro, tamanho]`` por objeto.
+    """
+    pieces = queue.Queue(maxsize=QUEUE_CHUNKS)
+    manifest = []
+    failure = []
+    stop = threading.Event()
+
+    def produce():
+        offset = 0
+        try:
+            for piece in _encode_objects(_track(objects, manifest, lambda: offset), level):
+                if stop.is_set():
+                    return
+                pieces.put(piece)
+                offset += len(piece)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            pieces.put(_DONE)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            piece = pieces.get()
+            if piece is _DONE:
+                break
+            out.write(piece)
+    except BaseException:
+        stop.set()
+        # Libera a thread caso ela esteja bloqueada na fila cheia
+        while worker.is_alive():
+            try:
+                pieces.get_nowait()
+            except queue.Empty:
+                worker.join(0.05)
+        raise
+    worker.join()
+    if failure:
+        raise failure[0]
+    return manifest
+
+
+def _track(objects, manifest, current_offset):
+    # Anota no manifesto o offset em que cada registro começa
+    for obj_type, obj_hash, size, source in objects:
+        manifest.append([obj_hash, obj_type, current_offset(), size])
+        yield obj_type, obj_hash, size, source
+
+
+class ReadAhead:
+    """Leitor que baixa ``f`` numa thread enquanto o stream é processado.
+
+    Blocos de ``CHUNK_SIZE`` vão para uma fila limitada (no máximo
+    ``QUEUE_CHUNKS`` blocos em memória); ``read`` consome dessa fila, de modo
+    que o download do próximo trecho se sobrepõe ao processamento do atual.
+    """
+
+    def __init__(self, f):
+        self._blocks = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._buffer = memoryview(b"")
+        self._failure = []
+        self._stop = threading.Event()
+        self._eof = False
+        self._worker = threading.Thread(target=self._download, args=(f,), daemon=True)
+        self._worker.start()
+
+    def _download(self, f):
+        try:
+            while not self._stop.is_set():
+                block = f.read(CHUNK_SIZE)
+                if not block:
+                    break
+                self._blocks.put(block)
+        except BaseException as e:
+            self._failure.append(e)
+        finally:
+            self._blocks.put(_DONE)
+
+    def read(self, size):
+        while not self._buffer and not self._eof:
+            block = self._blocks.get()
+            if block is _DONE:
+                self._eof = True
+                if self._failure:
+                    raise self._failure[0]
+            else:
+                self._buffer = memoryview(block)
+        data = bytes(self._buffer[:size])
+        self._buffer = self._buffer[size:]
+        return data
+
+    def close(self):
+        self._stop.set()
+        # Esvazia a fila para a thread não ficar presa num put
+        while self._worker.is_alive():
+            try:
+                self._blocks.get_nowait()
+            except queue.Empty:
+                self._worker.join(0.05)
+
+
+def _skip_chunks(f):
+    while True:
+        (length,) = _CHUNK.unpack(_read_exact(f, _CHUNK.size))
+        if not length:
+            return
+        _read_exact(f, length)
+
+
+def _copy_object(f, obj_type, obj_hash, size, codec, write):
+    # Passa os blocos de um objeto para ``write`` conferindo tamanho e SHA-1.
+    # O manifesto de um blob em pedaços fica sob o SHA-1 do arquivo inteiro:
+    # ele é conferido pelo hash que carrega (cada pedaço tem o seu registro)
+    decompressor = zlib.decompressobj() if codec == CODEC_ZLIB else None
+    digest = hashlib.sha1()
+    manifest = [] if obj_type == OBJ_CHUNKED else None
+    received = 0
+    while True:
+        (length,) = _CHUNK.unpack(_read_exact(f, _CHUNK.size))
+        if length:
+            chunk = _read_exact(f, length)
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+        elif decompressor:
+            chunk = decompressor.flush()
+        else:
+            break
+        digest.update(chunk)
+        received += len(chunk)
+        write(chunk)
+        if manifest is not None:
+            manifest.append(chunk)
+        if not length:
+            break
+    if manifest is not None:
+        valid = parse_manifest(obj_hash, b"".join(manifest)) is not None
+    else:
+        valid = digest.hexdigest() == obj_hash
+    if received != size or not valid:
+        raise ValueError(f"Objeto corrompido no stream: {obj_hash}")
+
+
+def _read_object(f, obj_type, obj_hash, size, codec):
+    parts = []
+    _copy_object(f, obj_type, obj_hash, size, codec, parts.append)
+    return b"".join(parts)
+
+
+def _spill_object(f, obj_type, obj_hash, size, codec, temp_file):
+    # Grava o objeto num temporário enquanto chega: a memória fica em um bloco
+    fd, tmp_path = temp_file(obj_type)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            _copy_object(f, obj_type, obj_hash, size, codec, out.write)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def read_stream(f, wanted=None, temp_file=None):
+    """Lê um stream gerando ``(tipo, hash, dados)``.
+
+    O SHA-1 de cada objeto é calculado bloco a bloco, à medida que os dados
+    chegam, e conferido com o hash do registro; um objeto corrompido
+    interrompe a leitura com ValueError. Com ``wanted``, objetos fora do
+    conjunto são pulados sem descomprimir nem calcular hash.
+
+    Com ``temp_file(tipo) -> (fd, caminho)`` (ex.: ``ObjectStore.temp_file``
+    do store de destino), cada objeto é gravado num temporário enquanto
+    chega e o item gerado traz o caminho no lugar dos dados: nenhum objeto
+    fica inteiro na memória. O temporário passa a ser de quem recebe o item.
+    """
+    magic, version, _ = _HEADER.unpack(_read_exact(f, _HEADER.size))
+    if magic != STREAM_MAGIC or version != STREAM_VERSION:
+        raise ValueError("Stream de objetos inválido")
+    while True:
+        obj_type, raw_hash, size, codec = _RECORD.unpack(_read_exact(f, _RECORD.size))
+        if obj_type == _END:
+            return
+        obj_hash = raw_hash.hex()
+        if wanted is not None and obj_hash not in wanted:
+            _skip_chunks(f)
+            continue
+        if temp_file is None:
+            yield obj_type, obj_hash, _read_object(f, obj_type, obj_hash, size, codec)
+        else:
+            yield obj_type, obj_hash, _spill_object(f, obj_type, obj_hash, size, codec, temp_file)
+
+
+def decode_record(record):
+    """Decodifica um único registro (lido por faixa de bytes): ``(tipo, hash, dados)``."""
+    f = io.BytesIO(record)
+    obj_type, raw_hash, size, codec = _RECORD.unpack(_read_exact(f, _RECORD.size))
+    if obj_type == _END:
+        raise ValueError("Registro de objeto inválido")
+    obj_hash = raw_hash.hex()
+    return obj_type, obj_hash, _read_object(f, obj_type, obj_hash, size, codec)
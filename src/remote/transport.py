@@ -0,0 +1,262 @@
+import os
+import uuid
+import shlex
+import shutil
+import tempfile
+import posixpath
+from abc import ABC, abstractmethod
+from remote.pool import pool
+
+
+class Transport(ABC):
+    """Acesso a arquivos de um remoto, relativo à raiz do repositório remoto.
+
+    O remoto é "burro": só guarda arquivos. Toda a lógica (negociação,
+    montagem do stream, atualização de refs) fica no cliente, de modo que o
+    mesmo protocolo funciona sobre um diretório local ou sobre SFTP.
+    """
+
+    @abstractmethod
+    def exists(self, path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def listdir(self, path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def makedirs(self, path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def open_read(self, path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def open_write(self, path):
+        """Arquivo para escrita que só aparece em ``path`` ao ser commitado.
+
+        Retorna um objeto com ``write``, ``commit()`` e ``abort()``.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def open_append(self, path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_exclusive(self, path):
+        """Cria ``path`` vazio só se ele não existe; False se já existia.
+
+        A criação é atômica no remoto, o que serve de trava entre clientes.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove(self, path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self, path):
+        raise NotImplementedError
+
+    def read_ranges(self, path, ranges):
+        """Gera os bytes de cada ``(offset, tamanho)`` de ``path``, na ordem pedida."""
+        with self.open_read(path) as f:
+            for offset, length in ranges:
+                f.seek(offset)
+                yield f.read(length)
+
+    def read_bytes(self, path):
+        with self.open_read(path) as f:
+            return f.read()
+
+    def write_bytes(self, path, data):
+        upload = self.open_write(path)
+        try:
+            upload.write(data)
+        except BaseException:
+            upload.abort()
+            raise
+        upload.commit()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _LocalUpload:
+    # Escreve num temporário ao lado e renomeia no commit
+    def __init__(self, path):
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def commit(self):
+        self._file.close()
+        os.chmod(self.tmp_path, 0o644)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class LocalTransport(Transport):
+    """Remoto num diretório local (outro disco, pasta compartilhada, testes)."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, path):
+        return os.path.join(self.root, path)
+
+    def exists(self, path):
+        return os.path.exists(self._path(path))
+
+    def listdir(self, path):
+        try:
+            return os.listdir(self._path(path))
+        except FileNotFoundError:
+            return []
+
+    def makedirs(self, path):
+        os.makedirs(self._path(path), exist_ok=True)
+
+    def open_read(self, path):
+        return open(self._path(path), "rb")
+
+    def open_write(self, path):
+        return _LocalUpload(self._path(path))
+
+    def open_append(self, path):
+        return open(self._path(path), "ab")
+
+    def create_exclusive(self, path):
+        try:
+            fd = os.open(self._path(path), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def size(self, path):
+        return os.path.getsize(self._path(path))
+
+    def remove(self, path):
+        full_path = self._path(path)
+        if os.path.isdir(full_path):
+            shutil.rmtree(full_path)
+        elif os.path.exists(full_path):
+            os.remove(full_path)
+
+
+class _SFTPUpload:
+    # Escreve em ``.tmp-*`` no remoto e renomeia (posix-rename) no commit
+    def __init__(self, sftp, path):
+        self._sftp = sftp
+        self.path = path
+        dirname, name = posixpath.split(path)
+        self.tmp_path = posixpath.join(dirname, f".tmp-{uuid.uuid4().hex}-{name}")
+        self._file = sftp.open(self.tmp_path, "wb")
+        # Não espera o ACK de cada bloco: as escritas seguem em pipeline
+        self._file.set_pipelined(True)
+
+    def write(self, data):
+        self._file.write(data)
+        return len(data)
+
+    def commit(self):
+        self._file.close()
+        self._sftp.chmod(self.tmp_path, 0o644)
+        self._sftp.posix_rename(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            self._sftp.remove(self.tmp_path)
+        except IOError:
+            pass
+
+
+class SFTPTransport(Transport):
+    """Remoto acessado por SFTP sobre a conexão SSH compartilhada do pool."""
+
+    def __init__(self, host, root, port=22, username=None, password=None, key_filename=None):
+        self.root = root
+        self._auth = dict(port=port, username=username, password=password, key_filename=key_filename)
+        self.host = host
+
+    @property
+    def _sftp(self):
+        return pool.sftp(self.host, **self._auth)
+
+    def _path(self, path):
+        return posixpath.join(self.root, path)
+
+    def exists(self, path):
+        try:
+            self._sftp.stat(self._path(path))
+            return True
+        except IOError:
+            return False
+
+    def listdir(self, path):
+        try:
+            return self._sftp.listdir(self._path(path))
+        except IOError:
+            return []
+
+    def makedirs(self, path):
+        target = self._path(path)
+        if self.exists(path):
+            return
+        # Um único comando num canal do mesmo transporte, em vez de um
+        # mkdir SFTP por nível
+        status, _, err = pool.exec(self.host, f"mkdir -p {shlex.quote(target)}", **self._auth)
+        if status != 0:
+            raise OSError(f"Falha ao criar diretório remoto {target}: {err.strip()}")
+
+    def open_read(self, path):
+        f = self._sftp.open(self._path(path), "rb")
+        f.prefetch()
+        return f
+
+    def open_write(self, path):
+        return _SFTPUpload(self._sftp, self._path(path))
+
+    def open_append(self, path):
+        return self._sftp.open(self._path(path), "ab")
+
+    def create_exclusive(self, path):
+        # "x" vira SSH_FXF_CREAT | SSH_FXF_EXCL: o servidor recusa se o arquivo existe
+        try:
+            self._sftp.open(self._path(path), "wx").close()
+        except IOError:
+            if self.exists(path):
+                return False
+            raise
+        return True
+
+    def size(self, path):
+        return self._sftp.stat(self._path(path)).st_size
+
+    def read_ranges(self, path, ranges):
+        # readv pede todas as faixas em pipeline, sem esperar cada resposta
+        with self._sftp.open(self._path(path), "rb") as f:
+            yield from f.readv(list(ranges))
+
+    def remove(self, path):
+        try:
+            self._sftp.remove(self._path(path))
+        except IOError:
+            pass
@@ -0,0 +1,42 @@
+import os
+import pytest
+from core.storage import Repo
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """Repositório recém-inicializado em ``tmp_path/work`` (e cwd do teste)."""
+    monkeypatch.setenv("DEE_NO_DAEMON", "1")
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    repo = Repo(str(work))
+    repo.init()
+    return repo
+
+
+def _write(repo, rel_path, content, mode=None):
+    full_path = os.path.join(repo.path, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(content.encode() if isinstance(content, str) else content)
+    if mode is not None:
+        os.chmod(full_path, mode)
+    return full_path
+
+
+def _commit_all(repo, message):
+    repo.add(["."], jobs=1)
+    return repo.commit(message)
+
+
+@pytest.fixture
+def write():
+    """``write(repo, caminho, conteúdo, modo=None)``: grava um arquivo no worktree."""
+    return _write
+
+
+@pytest.fixture
+def commit_all():
+    """``commit_all(repo, mensagem)``: ``dee add .`` e ``dee commit``; retorna o hash."""
+    return _commit_all
@@ -0,0 +1,65 @@
+import os
+import hashlib
+from types import SimpleNamespace
+from core import index as index_module
+from core.objects import flatten_tree
+from core.storage import Repo
+from operations.snapshot import staged_changes
+
+
+def test_add_skips_unchanged_files(repo, write, commit_all):
+    write(repo, "a.txt", "um\n")
+    commit_all(repo, "primeiro")
+    index, _ = repo._load_index()
+    before = index["a.txt"]
+
+    repo.add(["."], jobs=1)
+    index, _ = repo._load_index()
+    assert index["a.txt"].hash == before.hash
+    assert not repo.has_changes()
+
+
+def test_add_stages_chmod_only_change(repo, write, commit_all):
+    path = write(repo, "run.sh", "echo oi\n", mode=0o644)
+    head = commit_all(repo, "script")
+
+    os.chmod(path, 0o755)
+    repo.add(["."], jobs=1)
+
+    index, _ = repo._load_index()
+    entry = index["run.sh"]
+    assert entry.mode == 0o755
+    assert repo.has_changes()
+    changes = list(staged_changes(repo, index, head))
+    assert [c[0] for c in changes] == ["run.sh"]
+    assert changes[0][1] == changes[0][2] == entry.hash
+
+    commit = repo.commit("chmod")
+    tree = repo._read_commit(commit)["tree"]
+    assert flatten_tree(repo._read_tree, tree)["run.sh"]["mode"] == oct(0o755)
+
+
+def test_edit_in_the_same_second_as_add_is_not_lost(repo, write, monkeypatch):
+    # Sistema de arquivos com timestamps de 1 s: a edição não muda o stat
+    monkeypatch.setattr(
+        Repo, "_stat_matches",
+        lambda self, entry, st: entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns,
+    )
+    second = 1_700_000_000 * 10**9
+    clock = SimpleNamespace(time_ns=lambda: second + 10**9 // 2)
+    monkeypatch.setattr(index_module, "time", clock)
+
+    path = write(repo, "a.txt", "aaa\n")
+    os.utime(path, ns=(second, second))
+    repo.add(["a.txt"], jobs=1)
+    write(repo, "a.txt", "bbb\n")
+    os.utime(path, ns=(second, second))
+
+    # Um add posterior, de outro arquivo, regrava o índice
+    clock.time_ns = lambda: second + 5 * 10**9
+    write(repo, "b.txt", "b\n")
+    repo.add(["b.txt"], jobs=1)
+
+    repo.add(["."], jobs=1)
+    index, _ = repo._load_index()
+    assert index["a.txt"].hash == hashlib.sha1(b"bbb\n").hexdigest()
@@ -0,0 +1,55 @@
+import os
+
+
+def _read(repo, rel_path):
+    with open(os.path.join(repo.path, rel_path)) as f:
+        return f.read()
+
+
+def test_checkout_touches_only_changed_paths(repo, write, commit_all):
+    write(repo, "fixo.txt", "igual\n")
+    write(repo, "muda.txt", "v1\n")
+    commit_all(repo, "base")
+    repo.create_branch("outra")
+    write(repo, "muda.txt", "v2\n")
+    commit_all(repo, "v2")
+    fixed_inode = os.stat(os.path.join(repo.path, "fixo.txt")).st_ino
+
+    repo.checkout("outra")
+    assert _read(repo, "muda.txt") == "v1\n"
+    assert os.stat(os.path.join(repo.path, "fixo.txt")).st_ino == fixed_inode
+
+
+def test_checkout_between_directory_and_file(repo, write, commit_all):
+    repo.create_branch("arquivo")
+    write(repo, "a/x.txt", "dentro do diretório\n")
+    commit_all(repo, "a é diretório")
+
+    repo.checkout("arquivo")
+    # O diretório que ficou vazio é removido junto com o arquivo
+    assert not os.path.exists(os.path.join(repo.path, "a"))
+    write(repo, "a", "agora é arquivo\n")
+    commit_all(repo, "a é arquivo")
+
+    repo.checkout("main")
+    assert _read(repo, "a/x.txt") == "dentro do diretório\n"
+    repo.checkout("arquivo")
+    assert _read(repo, "a") == "agora é arquivo\n"
+    repo.checkout("main")
+    assert os.path.isdir(os.path.join(repo.path, "a"))
+
+
+def test_checkout_keeps_untracked_file_in_replaced_directory(repo, write, commit_all, capsys):
+    repo.create_branch("arquivo")
+    write(repo, "a/x.txt", "versionado\n")
+    commit_all(repo, "a é diretório")
+    repo.checkout("arquivo")
+    write(repo, "a", "arquivo\n")
+    commit_all(repo, "a é arquivo")
+    repo.checkout("main")
+
+    write(repo, "a/novo.txt", "não versionado\n")
+    repo.checkout("arquivo")
+    assert "seriam sobrescritas" in capsys.readouterr().out
+    assert _read(repo, "a/novo.txt") == "não versionado\n"
+    assert repo.get_current_branch() == "main"
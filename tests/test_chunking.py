@@ -0,0 +1,102 @@
+import hashlib
+import numpy as np
+import pytest
+from core import chunking
+from core.chunking import chunking_params, encode_manifest, parse_manifest, parse_size
+from core.config import config_set
+from core.object_store import LooseObjectStore
+from core.pipeline import ingest_chunked
+from optmizations import numba_utils
+from optmizations.numba_utils import cdc_cuts, cdc_masks
+
+
+PARAMS = chunking_params("16k", "4k")
+
+
+def _data(size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8)
+
+
+def _pieces(data, cuts):
+    bounds = [0] + list(cuts)
+    return [bytes(data[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def test_chunking_params():
+    assert parse_size("64m") == 64 << 20
+    assert chunking_params(None) is None
+    assert chunking_params("0") is None
+    assert PARAMS == {"threshold": 16 << 10, "min": 1 << 10, "avg": 4 << 10, "max": 32 << 10}
+    with pytest.raises(ValueError):
+        chunking_params("1m", "1k")
+
+
+def test_cuts_respect_bounds():
+    data = _data(300_000)
+    cuts = cdc_cuts(data, PARAMS["min"], PARAMS["avg"], PARAMS["max"])
+    assert cuts[-1] == len(data)
+    sizes = np.diff(np.concatenate([[0], cuts]))
+    assert sizes[:-1].min() >= PARAMS["min"]
+    assert sizes.max() <= PARAMS["max"]
+    assert PARAMS["avg"] // 2 < sizes.mean() < PARAMS["avg"] * 2
+
+
+def test_kernel_matches_numpy_fallback():
+    data = _data(200_000, seed=1)
+    mask_hard, mask_easy = cdc_masks(PARAMS["avg"])
+    args = (PARAMS["min"], PARAMS["avg"], PARAMS["max"], mask_hard, mask_easy, numba_utils.CDC_GEAR)
+    expected = numba_utils._cdc_numpy(data, *args)
+    assert np.array_equal(cdc_cuts(data, PARAMS["min"], PARAMS["avg"], PARAMS["max"]), expected)
+
+
+def test_edit_changes_only_neighbouring_chunks():
+    data = _data(400_000, seed=2)
+    edited = np.concatenate([data[:200_000], _data(100, seed=3), data[200_000:]])
+    before = _pieces(data, cdc_cuts(data, PARAMS["min"], PARAMS["avg"], PARAMS["max"]))
+    after = _pieces(edited, cdc_cuts(edited, PARAMS["min"], PARAMS["avg"], PARAMS["max"]))
+    assert len(set(after) - set(before)) <= 3
+
+
+def test_manifest_round_trip():
+    chunks = [("a" * 40, 10), ("b" * 40, 5)]
+    manifest = encode_manifest("c" * 40, 15, chunks)
+    assert parse_manifest("c" * 40, manifest) == chunks
+    assert parse_manifest("d" * 40, manifest) is None
+    assert parse_manifest("c" * 40, b"conteudo comum") is None
+
+
+def test_ingest_chunked_is_independent_of_the_window(tmp_path, monkeypatch):
+    data = _data(300_000, seed=4)
+    path = tmp_path / "grande.bin"
+    path.write_bytes(data.tobytes())
+    # Janela menor que o arquivo: vários cortes atravessam leituras
+    monkeypatch.setattr(chunking, "CDC_BUFFER", 1)
+    store = LooseObjectStore(str(tmp_path / "objects"))
+    file_hash, _, _ = ingest_chunked(str(path), store, PARAMS)
+
+    assert file_hash == hashlib.sha1(data.tobytes()).hexdigest()
+    chunks = parse_manifest(file_hash, store.get(file_hash))
+    expected = _pieces(data, cdc_cuts(data, PARAMS["min"], PARAMS["avg"], PARAMS["max"]))
+    assert [n for _, n in chunks] == [len(p) for p in expected]
+    assert b"".join(store.get(h) for h, _ in chunks) == data.tobytes()
+
+
+def test_add_deduplicates_chunks(repo, write, commit_all):
+    config_set(repo.config_file, "chunking.threshold", "16k")
+    config_set(repo.config_file, "chunking.avg_size", "4k")
+    data = _data(200_000, seed=5).tobytes()
+    write(repo, "grande.bin", data)
+    commit_all(repo, "grande")
+    stored = set(repo.blob_store.iter())
+
+    edited = data[:100_000] + b"!" * 64 + data[100_000:]
+    write(repo, "grande.bin", edited)
+    commit_all(repo, "editado")
+    new_objects = set(repo.blob_store.iter()) - stored
+
+    edited_hash = hashlib.sha1(edited).hexdigest()
+    assert parse_manifest(edited_hash, repo.blob_store.get(edited_hash)) is not None
+    assert repo._read_blob(edited_hash) == edited
+    # Só o manifesto novo e os pedaços em volta da edição
+    assert edited_hash in new_objects
+    assert len(new_objects) <= 4
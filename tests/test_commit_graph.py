@@ -0,0 +1,81 @@
+import hashlib
+import pytest
+from core.commit_graph import CommitGraph
+
+
+def _sha(name):
+    return hashlib.sha1(name.encode()).hexdigest()
+
+
+@pytest.fixture
+def graph(tmp_path):
+    """Grafo com uma linha principal longa e um ramo que volta num merge.
+
+        c0 - c1 - ... - c19 - m
+               \\             /
+                b0 - b1 - b2
+    """
+    graph = CommitGraph(str(tmp_path / "commit-graph"))
+    graph.append(_sha("c0"), [], 0.0)
+    for i in range(1, 20):
+        graph.append(_sha(f"c{i}"), [_sha(f"c{i - 1}")], float(i))
+    graph.append(_sha("b0"), [_sha("c1")], 1.5)
+    graph.append(_sha("b1"), [_sha("b0")], 2.5)
+    graph.append(_sha("b2"), [_sha("b1")], 3.5)
+    graph.append(_sha("m"), [_sha("c19"), _sha("b2")], 20.0)
+    yield graph
+    graph.close()
+
+
+def _pos(graph, name):
+    return graph.lookup(_sha(name))
+
+
+def test_generations(graph):
+    assert graph.generation(_pos(graph, "c0")) == 1
+    assert graph.generation(_pos(graph, "c19")) == 20
+    assert graph.generation(_pos(graph, "b2")) == 5
+    assert graph.generation(_pos(graph, "m")) == 21
+
+
+def test_is_ancestor(graph):
+    assert graph.is_ancestor(_pos(graph, "b0"), _pos(graph, "m"))
+    assert graph.is_ancestor(_pos(graph, "c0"), _pos(graph, "b2"))
+    assert not graph.is_ancestor(_pos(graph, "b0"), _pos(graph, "c19"))
+    assert not graph.is_ancestor(_pos(graph, "m"), _pos(graph, "c0"))
+
+
+def test_is_ancestor_prunes_by_generation(graph, monkeypatch):
+    visited = []
+    parents = graph.parents
+
+    def counting_parents(pos):
+        visited.append(pos)
+        return parents(pos)
+
+    monkeypatch.setattr(graph, "parents", counting_parents)
+    # b1 tem geração 4: a linha principal abaixo de c3 nunca é percorrida
+    assert not graph.is_ancestor(_pos(graph, "b1"), _pos(graph, "c19"))
+    assert len(visited) <= 17
+    assert _pos(graph, "c2") not in visited
+
+
+def test_merge_bases_and_ahead_behind(graph):
+    assert graph.merge_bases(_pos(graph, "c19"), _pos(graph, "b2")) == [_pos(graph, "c1")]
+    assert graph.ahead_behind(_pos(graph, "b2"), _pos(graph, "c19")) == (3, 18)
+
+
+def test_compact_keeps_the_graph(graph, tmp_path):
+    before = {
+        name: (graph.generation(_pos(graph, name)), sorted(graph.hexsha(p) for p in graph.parents(_pos(graph, name))))
+        for name in ("c0", "c5", "b1", "m")
+    }
+    graph.compact()
+    reopened = CommitGraph(str(tmp_path / "commit-graph"))
+    assert reopened.base_count == len(reopened) == 24
+    for name, (generation, parents) in before.items():
+        pos = _pos(reopened, name)
+        assert reopened.generation(pos) == generation
+        assert sorted(reopened.hexsha(p) for p in reopened.parents(pos)) == parents
+    assert reopened.is_ancestor(_pos(reopened, "b0"), _pos(reopened, "m"))
+    reopened.close()
@@ -0,0 +1,101 @@
+import os
+import socket
+import pytest
+from cli import daemon
+from core.storage import Repo
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+@pytest.fixture
+def running(repo, monkeypatch):
+    """Daemon real do ``repo``, encerrado no fim do teste."""
+    monkeypatch.setenv("PYTHONPATH", SRC_DIR)
+    monkeypatch.setenv("DEE_DISABLE_UPDATE_CHECK", "1")
+    monkeypatch.delenv("DEE_NO_DAEMON")
+    pid = daemon.start(repo, idle_timeout=60)
+    yield pid
+    daemon.stop(repo)
+
+
+def _messages(sock):
+    messages = []
+    while True:
+        message = daemon._recv(sock)
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def test_commands_run_in_the_daemon(repo, write, running, capfd):
+    assert daemon.start(repo) == running
+    assert daemon.request(repo.repo_dir, "ping")["pid"] == running
+
+    assert daemon.forward(["current"]) == 0
+    assert capfd.readouterr().out == "Branch atual: main\n"
+
+    write(repo, "a.txt", "um\n")
+    assert daemon.forward(["add", "."]) == 0
+    assert daemon.forward(["commit", "um"]) == 0
+    head = Repo(repo.path).get_head_commit()
+    assert Repo(repo.path)._read_commit(head)["message"] == "um"
+
+    # Alteração feita fora do daemon: o índice em memória não fica velho
+    write(repo, "a.txt", "dois\n")
+    capfd.readouterr()
+    assert daemon.forward(["status"]) == 0
+    assert "a.txt" in capfd.readouterr().out
+
+    assert daemon.forward(["inexistente"]) == 2
+    assert "inexistente" in capfd.readouterr().err
+    assert daemon.request(repo.repo_dir, "ping")["commands"] == 5
+
+
+def test_stop_removes_socket_and_pid(repo, running):
+    assert daemon.stop(repo)
+    assert not os.path.exists(os.path.join(repo.repo_dir, daemon.SOCKET_NAME))
+    assert not os.path.exists(os.path.join(repo.repo_dir, daemon.PID_NAME))
+    assert daemon.forward(["current"]) is None
+    assert daemon.request(repo.repo_dir, "ping") is None
+    assert not daemon.stop(repo)
+
+
+def test_forward_ignores_a_dead_socket(repo, monkeypatch):
+    monkeypatch.delenv("DEE_NO_DAEMON")
+    # Socket de um daemon que morreu sem apagar o arquivo
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(os.path.join(".dee", daemon.SOCKET_NAME))
+    server.close()
+    assert daemon.forward(["current"]) is None
+    assert daemon.request(repo.repo_dir, "ping") is None
+
+
+def test_run_streams_output_and_exit_code(repo, monkeypatch):
+    monkeypatch.setenv("DEE_DISABLE_UPDATE_CHECK", "1")
+    server, client = socket.socketpair()
+    with server, client:
+        daemon._run(server, ["current"])
+        server.shutdown(socket.SHUT_WR)
+        assert _messages(client) == [{"out": "Branch atual: main\n"}, {"exit": 0}]
+
+
+def test_channel_buffers_and_survives_client_disconnect(monkeypatch):
+    monkeypatch.setattr(daemon, "OUTPUT_BUFFER", 10)
+    server, client = socket.socketpair()
+    with server:
+        channel = daemon._Channel(server, "out")
+        channel.write("12345")
+        client.setblocking(False)
+        with pytest.raises(BlockingIOError):
+            client.recv(1)
+        channel.write("67890")
+        client.setblocking(True)
+        assert daemon._recv(client) == {"out": "1234567890"}
+        with pytest.raises(TypeError):
+            channel.write(b"bytes")
+
+        client.close()
+        channel.write("x" * 20)
+        channel.write("y" * 20)
+        assert channel.closed_by_client
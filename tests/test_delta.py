@@ -0,0 +1,49 @@
+import random
+import numpy as np
+import pytest
+from core.delta import create_delta, apply_delta, _OP_COPY
+from optmizations import numba_utils
+
+
+def _cases():
+    rng = random.Random(6)
+    base = bytes(rng.getrandbits(8) for _ in range(20000))
+    yield base, base
+    yield base, base[:5000] + b"inserido no meio" + base[5000:]
+    yield base, base[10000:] + base[:10000]
+    yield base, base[:-300]
+    yield base, bytes(rng.getrandbits(8) for _ in range(3000))
+    yield b"", b"alvo sem base"
+    yield b"base curta", b""
+    yield b"x" * 5000, b"x" * 7000
+
+
+@pytest.mark.parametrize("base, target", list(_cases()))
+def test_delta_round_trip(base, target):
+    delta = create_delta(base, target)
+    assert apply_delta(base, delta) == target
+
+
+def test_delta_of_similar_blob_is_small():
+    base = bytes(random.Random(1).getrandbits(8) for _ in range(50000))
+    target = base[:25000] + b"linha nova\n" + base[25000:]
+    delta = create_delta(base, target)
+    assert len(delta) < 200
+    assert _OP_COPY in delta
+
+
+def test_delta_over_max_size_is_refused():
+    rng = random.Random(2)
+    base = bytes(rng.getrandbits(8) for _ in range(4000))
+    target = bytes(rng.getrandbits(8) for _ in range(4000))
+    assert create_delta(base, target, max_size=len(target) // 2) is None
+    assert create_delta(base, base, max_size=len(base) // 2) is not None
+
+
+def test_kernel_matches_numpy_fallback():
+    rng = np.random.default_rng(3)
+    base = rng.integers(0, 256, 30000, dtype=np.uint8)
+    target = np.concatenate([base[:9000], rng.integers(0, 256, 500, dtype=np.uint8), base[9000:]])
+    kernel = numba_utils.delta_ops(base, target, 16, 16)
+    fallback = numba_utils._delta_ops_numpy(base, target, 16, 16, -1)
+    assert np.array_equal(kernel, fallback)
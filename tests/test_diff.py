@@ -0,0 +1,88 @@
+import random
+import pytest
+from core.storage import Repo
+from operations.diff import diff, intern_lines, myers_diff, unified_diff
+
+
+def _apply(a, b, opcodes):
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+
+def _lcs(a, b):
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            prev, row[j + 1] = row[j + 1], prev + 1 if x == y else max(row[j + 1], row[j])
+    return row[-1]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_myers_diff_is_minimal(seed):
+    rng = random.Random(seed)
+    a = [rng.randrange(5) for _ in range(rng.randrange(40))]
+    b = [rng.randrange(5) for _ in range(rng.randrange(40))]
+    opcodes = myers_diff(a, b)
+    assert _apply(a, b, opcodes) == b
+    # Opcodes contíguos cobrindo as duas sequências inteiras
+    assert opcodes == [] or (opcodes[0][1], opcodes[0][3]) == (0, 0)
+    for prev, cur in zip(opcodes, opcodes[1:]):
+        assert (prev[2], prev[4]) == (cur[1], cur[3])
+    equal = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal")
+    assert equal == _lcs(a, b)
+
+
+def test_myers_diff_edges():
+    assert myers_diff([], []) == []
+    assert myers_diff([1, 2], []) == [("delete", 0, 2, 0, 0)]
+    assert myers_diff([], [1, 2]) == [("insert", 0, 0, 0, 2)]
+    assert myers_diff([1, 2, 3], [1, 2, 3]) == [("equal", 0, 3, 0, 3)]
+
+
+def test_intern_lines_shares_ids():
+    a, b = intern_lines([b"x\n", b"y\n"], [b"y\n", b"z\n"])
+    assert a[1] == b[0]
+    assert len(set(a + b)) == 3
+
+
+def test_unified_diff():
+    old = [b"um\n", b"dois\n", b"tres\n"]
+    new = [b"um\n", b"2\n", b"tres\n", b"quatro"]
+    assert list(unified_diff(old, new, "a/f", "b/f")) == [
+        "--- a/f",
+        "+++ b/f",
+        "@@ -1,3 +1,4 @@",
+        " um",
+        "-dois",
+        "+2",
+        " tres",
+        "+quatro\n\\ No newline at end of file",
+    ]
+    assert list(unified_diff(old, old, "a/f", "b/f")) == []
+
+
+def test_diff_worktree_against_commit(repo, write, commit_all, monkeypatch):
+    write(repo, "a.txt", "um\n")
+    write(repo, "b.txt", "b\n")
+    first = commit_all(repo, "um")
+    write(repo, "a.txt", "dois\n")
+    commit_all(repo, "dois")
+    write(repo, "a.txt", "tres\n")
+    write(repo, "novo.txt", "novo\n")
+    repo.add(["novo.txt"], jobs=1)
+
+    loads = []
+    load_index = Repo._load_index
+    monkeypatch.setattr(Repo, "_load_index", lambda self: loads.append(1) or load_index(self))
+    lines = list(diff(repo, commits=(first,)))
+    assert len(loads) == 1
+    assert "-um" in lines and "+tres" in lines
+    assert "+++ b/novo.txt" in lines
+    assert not any("b.txt" in line for line in lines)
@@ -0,0 +1,102 @@
+import os
+import sys
+import subprocess
+import pytest
+from click.testing import CliRunner
+from cli.commands import cli
+from optmizations import kernels, numba_utils
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+KERNEL_NAMES = ("adler32", "adler32_batch", "adler32_batch (threads)", "cdc_cuts", "delta_ops")
+
+
+def _doctor(tmp_path, **env):
+    # ``dee doctor --kernels`` num processo novo, como no install.sh
+    base = {k: v for k, v in os.environ.items() if k not in ("DEE_KERNELS", "NUMBA_CACHE_DIR")}
+    env = dict(
+        base, PYTHONPATH=SRC_DIR, DEE_DISABLE_UPDATE_CHECK="1",
+        XDG_CACHE_HOME=str(tmp_path / "cache"), **env,
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", "from cli.commands import cli; cli(['doctor', '--kernels'], prog_name='dee')"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+@pytest.fixture
+def clean_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("DEE_DISABLE_UPDATE_CHECK", "1")
+    monkeypatch.delenv("NUMBA_CACHE_DIR", raising=False)
+    monkeypatch.delenv("DEE_KERNELS", raising=False)
+    monkeypatch.setattr(kernels, "_cache_dir", None)
+
+
+def test_doctor_without_flag_shows_usage(clean_env):
+    result = CliRunner().invoke(cli, ["doctor"])
+    assert result.exit_code == 0
+    assert result.output.strip() == "Use: dee doctor --kernels"
+
+
+def test_doctor_reports_fallback_reason(clean_env, monkeypatch):
+    monkeypatch.setattr(kernels, "report", lambda: {
+        "backend": "numpy",
+        "fallback_reason": "LLVM indisponível",
+        "numba_version": None,
+        "cache_dir": "/cache",
+        "cache_hit": False,
+        "cached_files": 0,
+        "import_time": 0.0123,
+        "warm_up": [("adler32", 0.002)],
+    })
+    result = CliRunner().invoke(cli, ["doctor", "--kernels"])
+    assert result.output.splitlines() == [
+        "⚠️ Kernels: NumPy puro (fallback)",
+        "   Motivo: LLVM indisponível",
+        "   Cache: /cache (0 arquivo(s))",
+        "   Importação: 12.3 ms",
+        "   adler32: 2.0 ms",
+    ]
+
+
+def test_doctor_kernels_with_numpy_backend(tmp_path):
+    output = _doctor(tmp_path, DEE_KERNELS="numpy")
+    assert output.startswith("⚠️ Kernels: NumPy puro (fallback)")
+    for name in KERNEL_NAMES:
+        assert f"   {name}: " in output
+
+
+@pytest.mark.skipif(not numba_utils.HAVE_NUMBA, reason="Numba indisponível")
+def test_doctor_kernels_fills_and_reuses_the_disk_cache(tmp_path):
+    cache = tmp_path / "numba"
+    first = _doctor(tmp_path, NUMBA_CACHE_DIR=str(cache))
+    assert "(compilados agora e gravados no cache)" in first
+    assert any(name.endswith(".nbc") for _, _, names in os.walk(cache) for name in names)
+
+    second = _doctor(tmp_path, NUMBA_CACHE_DIR=str(cache))
+    assert "(cache em disco)" in second
+    for name in KERNEL_NAMES:
+        assert f"   {name}: " in second
+
+
+def test_configure_cache_uses_a_per_user_directory(clean_env, tmp_path):
+    if kernels._numba_version() is None:
+        pytest.skip("Numba não instalado")
+    assert kernels.configure_cache()
+    path = os.environ["NUMBA_CACHE_DIR"]
+    assert path.startswith(str(tmp_path / "cache" / "dee" / "numba" / kernels._numba_version()))
+    assert os.path.isdir(path)
+
+
+def test_configure_cache_respects_user_settings(clean_env, monkeypatch, tmp_path):
+    monkeypatch.setenv("NUMBA_CACHE_DIR", str(tmp_path / "meu-cache"))
+    kernels.configure_cache()
+    assert os.environ["NUMBA_CACHE_DIR"] == str(tmp_path / "meu-cache")
+
+    monkeypatch.delenv("NUMBA_CACHE_DIR")
+    monkeypatch.setenv("DEE_KERNELS", "numpy")
+    assert not kernels.configure_cache()
+    assert "NUMBA_CACHE_DIR" not in os.environ
@@ -0,0 +1,96 @@
+import os
+import pytest
+from core import index as index_module
+from core.index import Index, IndexEntry, write_index
+
+
+def _entry(n, mode=0o644):
+    return IndexEntry(f"{n:040x}", mode, checksum=n)
+
+
+def _snapshot(index):
+    return {path: (entry.hash, entry.mode, entry.checksum, entry.conflict) for path, entry in index.items()}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "index")
+    write_index(path, {f"dir/f{i:03}": _entry(i) for i in range(100)})
+    return path
+
+
+def test_index_round_trip(path):
+    index = Index(path)
+    assert len(index) == 100
+    assert index["dir/f042"].hash == f"{42:040x}"
+    assert index["dir/f042"].checksum == 42
+    assert "dir/f100" not in index
+    assert list(index) == sorted(index)
+    index.close()
+
+
+def test_index_stat_and_conflicts_round_trip(path):
+    st = os.stat(path)
+    entries = {"a": IndexEntry("1" * 40, 0o755, st), "b": IndexEntry("2" * 40, conflict={"ours": "2" * 40})}
+    write_index(path, entries)
+    index = Index(path)
+    assert index["a"].mode == 0o755
+    assert (index["a"].mtime_ns, index["a"].size, index["a"].ino) == (st.st_mtime_ns, st.st_size, st.st_ino)
+    assert index["b"].mtime_ns is None
+    assert index["b"].conflict == {"ours": "2" * 40}
+    index.close()
+
+
+def test_journal_is_replayed(path):
+    index = Index(path)
+    index["dir/f000"] = _entry(1000, 0o755)
+    index["novo"] = _entry(2000)
+    del index["dir/f050"]
+    index.save()
+    expected = _snapshot(index)
+    index.close()
+    assert os.path.exists(path + ".journal")
+
+    reopened = Index(path)
+    assert _snapshot(reopened) == expected
+    assert len(reopened) == 100
+    assert "dir/f050" not in reopened
+    reopened.close()
+
+
+def test_truncated_journal_record_is_dropped(path):
+    index = Index(path)
+    index["a"] = _entry(1)
+    index.save()
+    index["b"] = _entry(2)
+    index.save()
+    index.close()
+    with open(path + ".journal", "r+b") as f:
+        f.truncate(os.path.getsize(path + ".journal") - 5)
+
+    reopened = Index(path)
+    assert "a" in reopened
+    assert "b" not in reopened
+    assert len(reopened) == 101
+    reopened.close()
+
+
+def test_large_journal_is_compacted(path, monkeypatch):
+    monkeypatch.setattr(index_module, "JOURNAL_MIN_COMPACT", 4)
+    monkeypatch.setattr(index_module, "JOURNAL_RATIO", 1000)
+    index = Index(path)
+    for i in range(3):
+        index[f"extra{i}"] = _entry(500 + i)
+        index.save()
+    assert os.path.exists(path + ".journal")
+    index["extra3"] = _entry(503)
+    index["extra4"] = _entry(504)
+    index.save()
+    assert not os.path.exists(path + ".journal")
+    expected = _snapshot(index)
+    index.close()
+
+    reopened = Index(path)
+    assert _snapshot(reopened) == expected
+    assert len(reopened) == 105
+    reopened.close()
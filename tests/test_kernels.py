@@ -0,0 +1,71 @@
+import zlib
+import hashlib
+import numpy as np
+import pytest
+from core.hashing import compute_checksum_batch, hash_blob, pack_buffers
+from optmizations import numba_utils
+from optmizations.numba_utils import ADLER_BLOCK, adler32, adler32_batch, run_in_worker
+
+
+def _contents():
+    rng = np.random.default_rng(0)
+    sizes = [0, 1, 5, 4095, ADLER_BLOCK - 1, ADLER_BLOCK, 3 * ADLER_BLOCK + 17]
+    contents = [rng.integers(0, 256, n, dtype=np.uint8).tobytes() for n in sizes]
+    # Bytes 0xFF maximizam as somas antes da redução módulo 65521
+    contents.append(b"\xff" * (2 * ADLER_BLOCK + 3))
+    return contents
+
+
+def _array(data):
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def test_adler32_matches_zlib():
+    for data in _contents():
+        assert adler32(_array(data)) == zlib.adler32(data)
+        assert numba_utils._adler32_numpy(_array(data)) == zlib.adler32(data)
+
+
+def test_adler32_continues_from_a_previous_value():
+    data = _contents()[-2]
+    value = 1
+    for start in range(0, len(data), 10_000):
+        value = adler32(_array(data[start:start + 10_000]), value)
+    assert value == zlib.adler32(data)
+
+
+def test_adler32_batch_matches_zlib():
+    contents = _contents()
+    buffer, offsets = pack_buffers(contents)
+    expected = [zlib.adler32(data) for data in contents]
+    assert list(adler32_batch(buffer, offsets)) == expected
+    assert list(numba_utils._adler32_batch_numpy(buffer, offsets)) == expected
+    # Fora da thread principal o kernel serial é usado
+    assert list(run_in_worker(adler32_batch, buffer, offsets)) == expected
+    assert list(compute_checksum_batch(contents)) == expected
+
+
+def test_pack_buffers_offsets():
+    buffer, offsets = pack_buffers([b"ab", b"", b"cde"])
+    assert buffer.tobytes() == b"abcde"
+    assert list(offsets) == [0, 2, 2, 5]
+
+
+def test_hash_blob_uses_the_blob_header():
+    assert hash_blob(b"oi\n") == hashlib.sha1(b"blob 3\0oi\n").hexdigest()
+
+
+@pytest.mark.skipif(not numba_utils.HAVE_NUMBA, reason="Numba indisponível")
+def test_compile_error_falls_back_to_numpy(monkeypatch):
+    def broken(*args):
+        raise RuntimeError("LLVM indisponível")
+
+    monkeypatch.setattr(numba_utils, "_adler32_kernel", broken)
+    # Registrados aqui para que o monkeypatch os restaure no fim do teste
+    monkeypatch.setattr(numba_utils, "HAVE_NUMBA", True)
+    monkeypatch.setattr(numba_utils, "_fallback_reason", None)
+    data = _contents()[3]
+    assert adler32(_array(data)) == zlib.adler32(data)
+    assert numba_utils.backend() == "numpy"
+    assert "LLVM" in numba_utils.fallback_reason()
+
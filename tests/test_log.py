@@ -0,0 +1,133 @@
+import os
+import msgpack
+import pytest
+from click.testing import CliRunner
+from cli.commands import cli
+from core import commit_meta
+from core.commit_meta import CommitMeta, decode_commit_header
+from core.storage import Repo
+
+
+def _sha(i):
+    return f"{i:02x}" * 20
+
+
+@pytest.fixture
+def history(repo, write, commit_all):
+    """Três commits: ``a.txt``, ``b.txt`` e de novo ``a.txt``."""
+    write(repo, "a.txt", "1\n")
+    first = commit_all(repo, "primeiro")
+    write(repo, "dir/b.txt", "b\n")
+    second = commit_all(repo, "segundo\n\ncorpo")
+    write(repo, "a.txt", "2\n")
+    third = commit_all(repo, "terceiro")
+    return repo, [third, second, first]
+
+
+def _messages(repo, **options):
+    return [message for _, _, _, message in repo.log(**options)]
+
+
+def test_commit_meta_tail_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(commit_meta, "TAIL_LIMIT", 4)
+    path = str(tmp_path / "commit-meta")
+    meta = CommitMeta(path)
+    for i in range(10):
+        meta.add(_sha(i), 1000 + i, _sha(100 + i), f"commit {i}")
+    meta.add(_sha(3), 0, None, "repetido")
+    # Oito registros já no índice (duas compactações), dois na cauda
+    assert (meta.count, len(meta)) == (8, 10)
+    assert meta.get(_sha(3)) == (1003, _sha(103), "commit 3")
+    meta.close()
+
+    reopened = CommitMeta(path)
+    assert len(reopened) == 10
+    assert [reopened.get(_sha(i))[2] for i in range(10)] == [f"commit {i}" for i in range(10)]
+    assert reopened.get(_sha(50)) is None
+    reopened.close()
+
+
+def test_commit_meta_drops_a_partial_record(tmp_path):
+    path = str(tmp_path / "commit-meta")
+    meta = CommitMeta(path)
+    meta.add(_sha(1), 1, None, "um")
+    meta.add(_sha(2), 2, None, "dois")
+    meta.close()
+    # Gravação interrompida no meio do segundo registro
+    os.truncate(path, os.path.getsize(path) - 3)
+
+    meta = CommitMeta(path)
+    assert len(meta) == 1
+    assert meta.get(_sha(2)) is None
+    meta.add(_sha(3), 3, None, "três")
+    meta.close()
+    meta = CommitMeta(path)
+    assert [meta.get(_sha(i)) for i in (1, 2, 3)] == [(1, None, "um"), None, (3, None, "três")]
+    meta.close()
+
+
+def test_decode_commit_header_skips_the_legacy_index():
+    data = msgpack.packb({
+        "timestamp": 5, "message": "antigo",
+        "files": {"a.txt": {"hash": "a" * 40, "mode": "0o644"}}, "parent": None,
+    })
+    assert decode_commit_header(data) == {"timestamp": 5, "message": "antigo", "parent": None}
+
+
+def test_log_order_and_pagination(history):
+    repo, commits = history
+    assert [c for c, _, _, _ in repo.log()][:3] == commits
+    assert _messages(repo, max_count=2) == ["terceiro", "segundo\n\ncorpo"]
+    assert _messages(repo, skip=1, max_count=1) == ["segundo\n\ncorpo"]
+    assert _messages(repo, paths=["a.txt"]) == ["terceiro", "primeiro"]
+    assert _messages(repo, paths=["dir"]) == ["segundo\n\ncorpo"]
+    assert _messages(repo, since=repo._commit_header(commits[0])[0] + 1) == []
+    assert len(_messages(repo)) == 4
+
+
+def test_log_reads_only_the_metadata_cache(history, monkeypatch):
+    repo, _ = history
+
+    def no_objects(*args, **kwargs):
+        raise AssertionError("log não deve ler objetos de commit")
+
+    monkeypatch.setattr(Repo, "_read_commit", no_objects)
+    monkeypatch.setattr(Repo, "_read_object", no_objects)
+    assert _messages(Repo(repo.path), max_count=3) == ["terceiro", "segundo\n\ncorpo", "primeiro"]
+
+
+@pytest.mark.parametrize("compacted", [False, True])
+def test_log_rebuilds_the_cache_after_a_truncated_data_file(history, monkeypatch, compacted):
+    repo, commits = history
+    expected = _messages(repo)
+    if compacted:
+        repo._commit_meta().compact()
+    repo._commit_meta().close()
+    # Metade do arquivo de dados some: abaixo do que o índice cobre, se houver
+    os.truncate(repo.meta_file, os.path.getsize(repo.meta_file) // 2)
+
+    fresh = Repo(repo.path)
+    assert len(fresh._commit_meta()) < 4
+    assert _messages(fresh) == expected
+    fresh._commit_meta().close()
+
+    # Os registros que faltavam foram regravados a partir dos objetos
+    rebuilt = CommitMeta(repo.meta_file)
+    assert len(rebuilt) == 4
+    assert rebuilt.get(commits[1])[2] == "segundo\n\ncorpo"
+    rebuilt.close()
+
+
+def test_log_command(history, monkeypatch):
+    repo, commits = history
+    monkeypatch.setenv("DEE_DISABLE_UPDATE_CHECK", "1")
+    runner = CliRunner()
+    result = runner.invoke(cli, ["log", "--oneline", "-n", "2"])
+    assert result.output == f"{commits[0][:7]} terceiro\n{commits[1][:7]} segundo\n"
+
+    result = runner.invoke(cli, ["log", "main", "dir", "--no-pager"])
+    assert result.output.startswith(f"commit {commits[1]}\nDate:   ")
+    assert result.output.endswith("\n\n    segundo\n    \n    corpo\n\n")
+
+    result = runner.invoke(cli, ["log", "--since", "amanhã"])
+    assert result.output.startswith("❗️ Data inválida")
@@ -0,0 +1,98 @@
+import os
+from operations.merge import merge_lines, merge_blobs, merge_trees
+
+
+def _lines(text):
+    return text.encode().splitlines(keepends=True)
+
+
+def _merge(base, ours, theirs):
+    out, conflicts = merge_lines(_lines(base), _lines(ours), _lines(theirs))
+    return b"".join(out).decode(), conflicts
+
+
+def test_merge_lines_takes_each_side():
+    base = "a\nb\nc\nd\ne\n"
+    ours = "A\nb\nc\nd\ne\n"
+    theirs = "a\nb\nc\nd\nE\n"
+    assert _merge(base, ours, theirs) == ("A\nb\nc\nd\nE\n", 0)
+
+
+def test_merge_lines_same_change_on_both_sides():
+    base = "a\nb\nc\n"
+    both = "a\nB\nc\n"
+    assert _merge(base, both, both) == (both, 0)
+
+
+def test_merge_lines_conflict_markers():
+    text, conflicts = _merge("a\nb\nc\n", "a\nnosso\nc\n", "a\ndeles\nc\n")
+    assert conflicts == 1
+    assert text == "a\n<<<<<<< ours\nnosso\n=======\ndeles\n>>>>>>> theirs\nc\n"
+
+
+def test_merge_lines_insertions_and_deletions():
+    base = "1\n2\n3\n4\n"
+    ours = "0\n1\n2\n3\n4\n"
+    theirs = "1\n2\n4\n"
+    assert _merge(base, ours, theirs) == ("0\n1\n2\n4\n", 0)
+
+
+def test_merge_blobs_leaves_binary_as_conflict():
+    content, _, conflicted = merge_blobs((b"\0base", b"\0ours", b"\0theirs", "HEAD", "outra"))
+    assert conflicted
+    assert content == b"\0ours"
+
+
+def test_merge_trees(repo, write, commit_all):
+    write(repo, "ambos.txt", "1\n2\n3\n4\n5\n")
+    write(repo, "deles.txt", "original\n")
+    write(repo, "modo.sh", "echo oi\n", mode=0o644)
+    base = commit_all(repo, "base")
+    repo.create_branch("outra")
+
+    write(repo, "ambos.txt", "um\n2\n3\n4\n5\n")
+    write(repo, "modo.sh", "echo tchau\n")
+    ours = commit_all(repo, "nosso")
+
+    repo.checkout("outra")
+    write(repo, "ambos.txt", "1\n2\n3\n4\ncinco\n")
+    write(repo, "deles.txt", "alterado\n")
+    write(repo, "modo.sh", "echo tchau\n")
+    os.chmod(os.path.join(repo.path, "modo.sh"), 0o755)
+    theirs = commit_all(repo, "deles")
+
+    result = merge_trees(repo, base, ours, theirs, jobs=1)
+    assert not result.conflicts
+    assert result.merged["ambos.txt"][0] == b"um\n2\n3\n4\ncinco\n"
+    changes = {path: (new_blob, mode) for path, _, new_blob, mode in result.changes}
+    assert set(changes) == {"deles.txt", "modo.sh"}
+    # Mesmo blob dos dois lados, mas só o outro mudou o modo
+    assert changes["modo.sh"][1] == 0o755
+
+
+def test_merge_trees_mode_is_three_way(repo, write, commit_all):
+    write(repo, "deles.sh", "1\n2\n3\n", mode=0o644)
+    write(repo, "nosso.sh", "1\n2\n3\n", mode=0o644)
+    write(repo, "igual.sh", "echo oi\n", mode=0o644)
+    base = commit_all(repo, "base")
+    repo.create_branch("outra")
+
+    write(repo, "deles.sh", "um\n2\n3\n")
+    write(repo, "nosso.sh", "um\n2\n3\n", mode=0o755)
+    write(repo, "igual.sh", "echo tchau\n", mode=0o755)
+    ours = commit_all(repo, "nosso")
+
+    repo.checkout("outra")
+    write(repo, "deles.sh", "1\n2\ntres\n", mode=0o755)
+    write(repo, "nosso.sh", "1\n2\ntres\n")
+    write(repo, "igual.sh", "echo tchau\n", mode=0o644)
+    theirs = commit_all(repo, "deles")
+
+    result = merge_trees(repo, base, ours, theirs, jobs=1)
+    assert not result.conflicts
+    # Merge de conteúdo: o chmod de um lado só sobrevive ao merge
+    assert result.merged["deles.sh"] == (b"um\n2\ntres\n", result.merged["deles.sh"][1], 0o755)
+    assert result.merged["nosso.sh"][2] == 0o755
+    # Mesmo conteúdo; só o nosso lado mudou o modo: fica como está
+    assert "igual.sh" not in result.merged
+    assert "igual.sh" not in {path for path, *_ in result.changes}
@@ -0,0 +1,150 @@
+import os
+import pickle
+import hashlib
+import threading
+import pytest
+from core import object_store
+from core.object_store import (
+    LISTDIR_THRESHOLD, LooseObjectStore, SQLiteObjectStore, open_object_stores
+)
+from core.storage import Repo
+
+
+def _hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+@pytest.fixture(params=["loose", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "loose":
+        store = LooseObjectStore(str(tmp_path / "objects"))
+    else:
+        store = SQLiteObjectStore(str(tmp_path / "objects.sqlite3"), "blobs")
+    yield store
+    store.close()
+
+
+def _temp_with(store, data):
+    fd, tmp_path = store.temp_file()
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return tmp_path
+
+
+def test_put_get_has_remove(store):
+    data = b"conteudo"
+    obj_hash = _hash(data)
+    assert not store.has(obj_hash)
+    with pytest.raises(FileNotFoundError):
+        store.get(obj_hash)
+    store.put(obj_hash, data)
+    store.put(obj_hash, data)
+    assert store.has(obj_hash)
+    assert store.get(obj_hash) == data
+    assert list(store.iter()) == [obj_hash]
+    store.remove(obj_hash)
+    assert not store.has(obj_hash)
+    assert list(store.iter()) == []
+
+
+def test_put_many_and_has_many(store):
+    items = [(_hash(str(i).encode()), str(i).encode()) for i in range(LISTDIR_THRESHOLD * 2)]
+    store.put_many(items)
+    hashes = [h for h, _ in items]
+    missing = [_hash(b"x%d" % i) for i in range(10)]
+    # Acima do limite o store solto lista os subdiretórios em vez de um stat por objeto
+    assert store.has_many(hashes + missing) == set(hashes)
+    assert store.has_many(hashes[:3] + missing[:2]) == set(hashes[:3])
+    assert sorted(store.iter()) == sorted(hashes)
+
+
+def test_put_file_streams_and_removes_the_temp_file(store, monkeypatch):
+    monkeypatch.setattr(object_store, "SQLITE_BLOB_CHUNK", 7)
+    data = bytes(range(256)) * 10
+    obj_hash = _hash(data)
+    tmp_path = _temp_with(store, data)
+    store.put_file(obj_hash, tmp_path)
+    assert store.get(obj_hash) == data
+    assert not os.path.exists(tmp_path)
+
+    # Objeto repetido: o temporário é descartado e o original fica
+    tmp_path = _temp_with(store, data)
+    store.put_file(obj_hash, tmp_path)
+    assert not os.path.exists(tmp_path)
+    assert store.get(obj_hash) == data
+
+    empty = _temp_with(store, b"")
+    store.put_file(_hash(b""), empty)
+    assert store.get(_hash(b"")) == b""
+
+
+def test_loose_store_is_sharded_and_reads_the_flat_layout(tmp_path):
+    root = tmp_path / "objects"
+    store = LooseObjectStore(str(root))
+    store.put("ab" + "1" * 38, b"novo")
+    assert (root / "ab" / ("1" * 38)).read_bytes() == b"novo"
+
+    legacy = "cd" + "2" * 38
+    (root / legacy).write_bytes(b"antigo")
+    assert store.get(legacy) == b"antigo"
+    assert store.path(legacy) == str(root / legacy)
+    assert sorted(store.iter()) == sorted(["ab" + "1" * 38, legacy])
+    many = [f"{i:040x}" for i in range(LISTDIR_THRESHOLD)]
+    assert store.has_many(many + [legacy]) == {legacy}
+
+
+def test_sqlite_store_survives_pickling_and_threads(tmp_path):
+    store = SQLiteObjectStore(str(tmp_path / "objects.sqlite3"), "blobs")
+    store.put(_hash(b"a"), b"a")
+    copy = pickle.loads(pickle.dumps(store))
+    errors = []
+
+    def worker(i):
+        try:
+            data = b"thread %d" % i
+            copy.put(_hash(data), data)
+            assert copy.get(_hash(b"a")) == b"a"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(list(store.iter())) == 9
+    copy.close()
+    store.close()
+
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_object_stores("s3", str(tmp_path))
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_sqlite_repo_round_trip(tmp_path, monkeypatch, write, commit_all, use_processes):
+    monkeypatch.setenv("DEE_NO_DAEMON", "1")
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    repo = Repo(str(work))
+    repo.init(objects="sqlite")
+    for i in range(20):
+        write(repo, f"d/f{i}.txt", f"arquivo {i}\n")
+    repo.add(["."], jobs=2, use_processes=use_processes)
+    first = repo.commit("um")
+    repo.create_branch("outra")
+    write(repo, "d/f0.txt", "mudou\n")
+    commit_all(repo, "dois")
+
+    assert os.path.exists(os.path.join(repo.repo_dir, "objects.sqlite3"))
+    # Nenhum objeto como arquivo solto
+    assert not [name for _, _, names in os.walk(repo.staging_dir) for name in names]
+    assert not [name for _, _, names in os.walk(repo.objects_dir) for name in names]
+
+    repo.checkout("outra")
+    assert (work / "d" / "f0.txt").read_text() == "arquivo 0\n"
+    assert repo.get_head_commit() == first
+    assert Repo(str(work)).blob_store.has(_hash(b"mudou\n"))
@@ -0,0 +1,49 @@
+import os
+import hashlib
+from core.pack import OBJ_BLOB, OBJ_COMMIT, OBJ_REF_DELTA, Pack, PackIndex, PackSet, write_pack
+from core.delta import create_delta
+
+
+def _sha(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def test_pack_index_round_trip(tmp_path):
+    objects = [(_sha(data), OBJ_BLOB, data) for data in (b"a" * 100, b"b", os.urandom(5000))]
+    objects.append((_sha(b"commit"), OBJ_COMMIT, b"commit"))
+    index_path = write_pack(objects, str(tmp_path))
+
+    index = PackIndex(index_path)
+    assert index.count == len(objects)
+    assert index.find(bytes.fromhex("00" * 20)) is None
+    index.close()
+
+    pack = Pack(index_path)
+    for hexsha, obj_type, data in objects:
+        assert hexsha in pack
+        assert pack.get(hexsha) == (obj_type, data)
+    assert sorted(h for h, _, _ in pack) == sorted(h for h, _, _ in objects)
+    pack.close()
+
+
+def test_write_pack_skips_duplicates_and_empty_input(tmp_path):
+    data = b"mesmo conteudo"
+    index_path = write_pack([(_sha(data), OBJ_BLOB, data)] * 3, str(tmp_path))
+    index = PackIndex(index_path)
+    assert index.count == 1
+    index.close()
+    assert write_pack([], str(tmp_path / "vazio")) is None
+
+
+def test_delta_resolved_across_packs(tmp_path):
+    base = os.urandom(4096)
+    target = base[:1000] + b"editado" + base[1000:]
+    base_hash, target_hash = _sha(base), _sha(target)
+    write_pack([(base_hash, OBJ_BLOB, base)], str(tmp_path))
+    delta = create_delta(base, target)
+    write_pack([(target_hash, OBJ_REF_DELTA, bytes.fromhex(base_hash) + delta)], str(tmp_path))
+
+    packs = PackSet(str(tmp_path))
+    assert packs.get(target_hash) == (OBJ_BLOB, target)
+    assert dict(packs.object_types())[target_hash] == OBJ_BLOB
+    packs.close()
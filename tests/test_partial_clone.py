@@ -0,0 +1,76 @@
+import os
+import pytest
+from core.objects import flatten_tree
+from core.promisor import Promisor
+from core.storage import Repo
+from remote.negotiate import push
+from remote.store import RemoteStore
+from remote.transport import LocalTransport
+
+
+@pytest.fixture
+def remote(repo, write, commit_all, tmp_path):
+    """Remoto local com três commits de ``main`` (docs/ e src/ mudam em todos)."""
+    remote_dir = str(tmp_path / "remoto")
+    commits = []
+    for i in range(3):
+        write(repo, "docs/leia.txt", f"versão {i}\n")
+        write(repo, "src/main.py", f"print({i})\n")
+        commits.append(commit_all(repo, f"commit {i}"))
+    push(repo, RemoteStore(LocalTransport(remote_dir)), "main", commits[-1])
+    return remote_dir, commits
+
+
+def _files(repo, commit_hash):
+    return flatten_tree(repo._read_tree, repo._read_commit(commit_hash)["tree"])
+
+
+def test_shallow_partial_clone(repo, remote, tmp_path):
+    remote_dir, commits = remote
+    clone_path = repo.clone_local(remote_dir, "main", str(tmp_path / "clones"), depth=1, prefixes=("docs",))
+    cloned = Repo(clone_path)
+    promisor = Promisor.load(cloned.repo_dir)
+
+    assert cloned.get_head_commit() == commits[-1]
+    assert promisor.is_shallow(commits[-1])
+    assert not cloned._has_object(commits[-2], cloned.object_store)
+    assert cloned._commit_parents(commits[-1], cloned._read_commit(commits[-1])) == []
+
+    with open(os.path.join(clone_path, "docs", "leia.txt")) as f:
+        assert f.read() == "versão 2\n"
+    assert not os.path.exists(os.path.join(clone_path, "src"))
+
+    src_blob = _files(cloned, commits[-1])["src/main.py"]["hash"]
+    assert promisor.is_promised(src_blob)
+    assert not cloned._has_object(src_blob, cloned.blob_store)
+    # Blob prometido: buscado no remoto no primeiro acesso
+    assert cloned._read_blob(src_blob) == b"print(2)\n"
+    assert cloned._has_object(src_blob, cloned.blob_store)
+
+
+def test_deeper_clone_keeps_history_up_to_depth(repo, remote, tmp_path):
+    remote_dir, commits = remote
+    clone_path = repo.clone_local(remote_dir, "main", str(tmp_path / "clones"), depth=2)
+    cloned = Repo(clone_path)
+    promisor = Promisor.load(cloned.repo_dir)
+
+    assert cloned._has_object(commits[-2], cloned.object_store)
+    assert promisor.is_shallow(commits[-2])
+    assert not promisor.is_shallow(commits[-1])
+    assert cloned.is_ancestor(commits[-2], commits[-1])
+    assert not cloned._has_object(commits[0], cloned.object_store)
+
+
+def test_filter_only_clone_has_full_history(repo, remote, tmp_path):
+    remote_dir, commits = remote
+    clone_path = repo.clone_local(remote_dir, "main", str(tmp_path / "clones"), prefixes=("src",))
+    cloned = Repo(clone_path)
+    promisor = Promisor.load(cloned.repo_dir)
+
+    for commit_hash in commits:
+        assert cloned._has_object(commit_hash, cloned.object_store)
+        assert not promisor.is_shallow(commit_hash)
+    assert os.path.exists(os.path.join(clone_path, "src", "main.py"))
+    assert not os.path.exists(os.path.join(clone_path, "docs"))
+    old_docs = _files(cloned, commits[0])["docs/leia.txt"]["hash"]
+    assert cloned._read_blob(old_docs) == "versão 0\n".encode()
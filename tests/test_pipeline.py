@@ -0,0 +1,89 @@
+import os
+import zlib
+import hashlib
+import pytest
+from core import pipeline
+from core.object_store import LooseObjectStore
+from core.pipeline import batch_candidates, ingest_file, run_pipeline
+
+
+def test_run_pipeline_returns_results_in_key_order():
+    def worker(n):
+        if n == 3:
+            raise ValueError("três")
+        return n * n
+
+    results = run_pipeline(((f"{n:03}", n) for n in reversed(range(50))), worker, jobs=4)
+    assert [key for key, _ in results] == [f"{n:03}" for n in range(50)]
+    assert isinstance(results[3][1], ValueError)
+    assert [r for _, r in results[4:]] == [n * n for n in range(4, 50)]
+
+
+def test_run_pipeline_propagates_producer_errors():
+    def producer():
+        yield "a", 1
+        raise OSError("walker")
+
+    with pytest.raises(OSError):
+        run_pipeline(producer(), lambda n: n, jobs=2)
+
+
+def test_batch_candidates_groups_small_files(monkeypatch):
+    monkeypatch.setattr(pipeline, "BATCH_MAX_FILES", 3)
+    candidates = [("a", "pa", 10), ("grande", "pg", 100), ("b", "pb", 10),
+                  ("c", "pc", 10), ("d", "pd", 10)]
+    assert list(batch_candidates(candidates, small_limit=50)) == [
+        (("grande",), ("pg",)),
+        (("a", "b", "c"), ("pa", "pb", "pc")),
+        (("d",), ("pd",)),
+    ]
+
+
+@pytest.mark.parametrize("jobs, use_processes", [(4, False), (2, True)])
+def test_parallel_add_matches_serial_add(repo, write, jobs, use_processes):
+    for i in range(40):
+        write(repo, f"d{i % 4}/f{i:02}.txt", f"arquivo {i}\n" * (i + 1))
+    write(repo, "grande.bin", bytes(range(256)) * 1024)
+
+    repo.add(["."], jobs=1)
+    index, _ = repo._load_index()
+    serial = {path: (entry.hash, entry.checksum) for path, entry in index.items()}
+
+    for path in list(index):
+        del index[path]
+    repo._write_index(index)
+    repo.add(["."], jobs=jobs, use_processes=use_processes)
+    index, _ = repo._load_index()
+    assert {path: (entry.hash, entry.checksum) for path, entry in index.items()} == serial
+    assert len(serial) == 41
+
+
+def test_ingest_file_streams_in_chunks(tmp_path):
+    data = bytes(range(256)) * 300 + b"fim"
+    path = tmp_path / "grande.bin"
+    path.write_bytes(data)
+    store = LooseObjectStore(str(tmp_path / "objects"))
+
+    file_hash, checksum, st = ingest_file(str(path), store, chunk_size=1000)
+    assert file_hash == hashlib.sha1(data).hexdigest()
+    assert checksum == zlib.adler32(data)
+    assert st.st_size == len(data)
+    assert store.get(file_hash) == data
+    # O temporário foi renomeado para o hash: nenhum sobra
+    assert not [name for name in os.listdir(store.tmp_dir) if name.startswith(".tmp-")]
+
+
+def test_ingest_file_removes_temp_file_on_error(tmp_path):
+    store = LooseObjectStore(str(tmp_path / "objects"))
+    with pytest.raises(OSError):
+        ingest_file(str(tmp_path / "inexistente"), store)
+    assert not [name for name in os.listdir(store.tmp_dir) if name.startswith(".tmp-")]
+
+
+def test_add_with_small_chunk_size(repo, write):
+    data = bytes(range(256)) * 1000
+    write(repo, "grande.bin", data)
+    repo.add(["."], jobs=1, chunk_size=4096)
+    index, _ = repo._load_index()
+    assert index["grande.bin"].hash == hashlib.sha1(data).hexdigest()
+    assert repo._read_blob(index["grande.bin"].hash) == data
@@ -0,0 +1,141 @@
+import os
+import pytest
+from core.objects import flatten_tree
+
+
+def _files(repo, commit_hash):
+    return flatten_tree(repo._read_tree, repo._read_commit(commit_hash)["tree"])
+
+
+def test_rebase_keeps_mode_changed_on_the_new_base(repo, write, commit_all):
+    write(repo, "run.sh", "1\n2\n3\n", mode=0o644)
+    commit_all(repo, "base")
+    repo.create_branch("feature")
+
+    write(repo, "run.sh", "um\n2\n3\n", mode=0o755)
+    commit_all(repo, "chmod na main")
+
+    repo.checkout("feature")
+    write(repo, "run.sh", "1\n2\ntres\n")
+    commit_all(repo, "edita")
+
+    tip = repo.rebase("feature", "main")
+    assert _files(repo, tip)["run.sh"]["mode"] == oct(0o755)
+    assert os.stat(os.path.join(repo.path, "run.sh")).st_mode & 0o777 == 0o755
+    with open(os.path.join(repo.path, "run.sh")) as f:
+        assert f.read() == "um\n2\ntres\n"
+
+
+def _history(repo, commit_hash, count):
+    messages = []
+    for _ in range(count):
+        commit_data = repo._read_commit(commit_hash)
+        messages.append(commit_data["message"])
+        commit_hash = repo._commit_parents(commit_hash, commit_data)[0]
+    return messages, commit_hash
+
+
+def _read(repo, rel_path):
+    with open(os.path.join(repo.path, rel_path)) as f:
+        return f.read()
+
+
+@pytest.fixture
+def diverged(repo, write, commit_all):
+    """``main`` e ``feature`` divergentes; ``feature`` em uso."""
+    write(repo, "a.txt", "1\n2\n3\n")
+    write(repo, "b.txt", "b\n")
+    commit_all(repo, "base")
+    repo.create_branch("feature")
+    write(repo, "a.txt", "um\n2\n3\n")
+    write(repo, "main.txt", "main\n")
+    main_head = commit_all(repo, "main edita a")
+    repo.checkout("feature")
+    return repo, main_head
+
+
+def test_rebase_drops_commits_already_on_the_new_base(diverged, write, commit_all):
+    repo, main_head = diverged
+    # Mesma mudança que a main já tem
+    write(repo, "a.txt", "um\n2\n3\n")
+    commit_all(repo, "mesma mudança")
+    write(repo, "b.txt", "b2\n")
+    commit_all(repo, "edita b")
+
+    tip = repo.rebase("feature", "main")
+    messages, parent = _history(repo, tip, 1)
+    assert messages == ["edita b"]
+    assert parent == main_head
+    assert repo.get_current_branch() == "feature"
+    assert (_read(repo, "a.txt"), _read(repo, "b.txt"), _read(repo, "main.txt")) == ("um\n2\n3\n", "b2\n", "main\n")
+
+
+def test_rebase_of_another_branch_leaves_the_worktree_alone(diverged, write, commit_all):
+    repo, main_head = diverged
+    write(repo, "b.txt", "b2\n")
+    feature_head = commit_all(repo, "edita b")
+    repo.checkout("main")
+    mtime = os.stat(os.path.join(repo.path, "b.txt")).st_mtime_ns
+
+    tip = repo.rebase("feature", "main")
+    assert _history(repo, tip, 1) == (["edita b"], main_head)
+    assert tip != feature_head
+    with open(os.path.join(repo.heads_dir, "feature")) as f:
+        assert f.read() == tip
+    assert repo.get_current_branch() == "main"
+    assert _read(repo, "b.txt") == "b\n"
+    assert os.stat(os.path.join(repo.path, "b.txt")).st_mtime_ns == mtime
+
+
+def _conflicting_feature(repo, write, commit_all):
+    write(repo, "a.txt", "UM\n2\n3\n")
+    first = commit_all(repo, "conflita")
+    write(repo, "b.txt", "b2\n")
+    second = commit_all(repo, "edita b")
+    return first, second
+
+
+def test_rebase_stops_on_conflict_and_continues(diverged, write, commit_all, capsys):
+    repo, main_head = diverged
+    first, _ = _conflicting_feature(repo, write, commit_all)
+
+    assert repo.rebase("feature", "main") is None
+    assert "a.txt" in capsys.readouterr().out
+    assert os.path.exists(repo.rebase_state_file)
+    # HEAD destacado na nova base, com o commit em conflito aplicado por cima
+    assert repo.get_current_branch() is None
+    assert repo.get_head_commit() == main_head
+    assert "<<<<<<<" in _read(repo, "a.txt")
+    assert _read(repo, "main.txt") == "main\n"
+    state = repo._load_rebase_state()
+    assert state["current"] == first and len(state["pending"]) == 1
+    assert repo.rebase("feature", "main") is None
+    assert "em andamento" in capsys.readouterr().out
+
+    assert repo.rebase_continue() is None
+    assert "não resolvidos" in capsys.readouterr().out
+
+    write(repo, "a.txt", "UM resolvido\n2\n3\n")
+    repo.add(["a.txt"], jobs=1)
+    tip = repo.rebase_continue()
+    assert _history(repo, tip, 2) == (["edita b", "conflita"], main_head)
+    assert repo.get_current_branch() == "feature"
+    assert not os.path.exists(repo.rebase_state_file)
+    assert (_read(repo, "a.txt"), _read(repo, "b.txt")) == ("UM resolvido\n2\n3\n", "b2\n")
+    assert repo._read_blob(_files(repo, tip)["a.txt"]["hash"]) == b"UM resolvido\n2\n3\n"
+
+
+def test_rebase_abort_restores_the_branch(diverged, write, commit_all):
+    repo, _ = diverged
+    _, feature_head = _conflicting_feature(repo, write, commit_all)
+    repo.rebase("feature", "main")
+
+    repo.rebase_abort()
+    assert repo.get_current_branch() == "feature"
+    assert repo.get_head_commit() == feature_head
+    assert not os.path.exists(repo.rebase_state_file)
+    assert (_read(repo, "a.txt"), _read(repo, "b.txt")) == ("UM\n2\n3\n", "b2\n")
+    assert not os.path.exists(os.path.join(repo.path, "main.txt"))
+    index, _ = repo._load_index()
+    assert not any(entry.conflict for entry in index.values())
+    assert sorted(index) == ["a.txt", "b.txt"]
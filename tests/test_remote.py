@@ -0,0 +1,60 @@
+import pytest
+from remote.negotiate import push
+from remote.store import RemoteStore
+from remote.transport import LocalTransport, Transport
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RemoteStore(LocalTransport(str(tmp_path / "remoto")))
+    store.init()
+    return store
+
+
+def test_push_sends_only_missing_commits(repo, write, commit_all, store):
+    write(repo, "a.txt", "1\n")
+    first = commit_all(repo, "um")
+    assert push(repo, store, "main", first) == ("ok", 2)
+    assert push(repo, store, "main", first) == ("up-to-date", 0)
+
+    write(repo, "a.txt", "2\n")
+    second = commit_all(repo, "dois")
+    assert push(repo, store, "main", second) == ("ok", 1)
+    assert store.read_ref("main") == second
+    assert len(store.list_packs()) == 2
+
+
+def test_push_rejects_non_fast_forward(repo, write, commit_all, store):
+    write(repo, "a.txt", "1\n")
+    commit_all(repo, "um")
+    repo.create_branch("outra")
+    write(repo, "a.txt", "2\n")
+    ours = commit_all(repo, "nosso")
+    assert push(repo, store, "main", ours)[0] == "ok"
+
+    repo.checkout("outra")
+    write(repo, "b.txt", "outro\n")
+    other = commit_all(repo, "outro")
+    assert push(repo, store, "main", other) == ("rejected", 0)
+    assert store.read_ref("main") == ours
+
+
+def test_update_ref_is_compare_and_swap(store):
+    a, b, c = "a" * 40, "b" * 40, "c" * 40
+    assert store.update_ref("main", None, a)
+    assert not store.update_ref("main", None, b)
+    assert store.update_ref("main", a, c)
+    assert store.read_ref("main") == c
+
+
+def test_update_ref_fails_while_locked(store):
+    store.update_ref("main", None, "a" * 40)
+    assert store.transport.create_exclusive("refs/heads/main.lock")
+    assert not store.update_ref("main", "a" * 40, "b" * 40)
+    assert store.read_ref("main") == "a" * 40
+    assert store.list_refs() == {"main": "a" * 40}
+
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport()
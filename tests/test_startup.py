@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import types
+import subprocess
+import pytest
+from cli import update_check
+
+
+HEAVY_MODULES = ("numpy", "numba", "requests", "paramiko", "psycopg2", "multiprocessing")
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def _loaded_after(code, cwd, tmp_path):
+    # Roda ``code`` num processo novo e lista os módulos pesados já importados
+    env = dict(
+        os.environ, PYTHONPATH=SRC_DIR, DEE_NO_DAEMON="1", DEE_DISABLE_UPDATE_CHECK="1",
+        XDG_CACHE_HOME=str(tmp_path / "cache"),
+    )
+    report = (
+        "import atexit, sys\n"
+        f"atexit.register(lambda: print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", report + code], cwd=cwd, env=env,
+        capture_output=True, text=True, timeout=60,
+    )
+    return result.stdout.strip().splitlines()
+
+
+def test_cli_import_is_light(tmp_path):
+    lines = _loaded_after("import cli.commands\nassert 'core.storage' not in sys.modules", tmp_path, tmp_path)
+    assert lines == ["[]"]
+
+
+def test_current_does_not_load_kernels_or_network_modules(repo, tmp_path):
+    lines = _loaded_after(
+        "from cli.commands import cli\ncli(['current'], prog_name='dee')", repo.path, tmp_path
+    )
+    assert lines == ["Branch atual: main", "[]"]
+
+
+@pytest.fixture
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("DEE_DISABLE_UPDATE_CHECK", raising=False)
+    spawned = []
+    monkeypatch.setattr(update_check.subprocess, "Popen", lambda args, **kwargs: spawned.append(args))
+    return spawned
+
+
+def test_stale_cache_schedules_one_background_check(cache_home, capsys):
+    update_check.check_for_updates()
+    assert cache_home == [[sys.executable, "-m", "cli.update_check"]]
+    # A tentativa fica marcada: a execução seguinte não dispara outra
+    update_check.check_for_updates()
+    assert len(cache_home) == 1
+    assert capsys.readouterr().out == ""
+
+
+def test_notice_comes_from_the_cache(cache_home, capsys):
+    update_check._save_cache({"checked_at": time.time(), "latest": "9.0.0"})
+    update_check.check_for_updates()
+    assert "9.0.0" in capsys.readouterr().out
+    assert cache_home == []
+
+    update_check._save_cache({"checked_at": time.time(), "latest": update_check.VERSION})
+    update_check.check_for_updates()
+    assert capsys.readouterr().out == ""
+
+
+def test_update_check_can_be_disabled(cache_home, monkeypatch):
+    monkeypatch.setenv("DEE_DISABLE_UPDATE_CHECK", "1")
+    update_check.check_for_updates()
+    assert cache_home == []
+    assert not os.path.exists(update_check.cache_file())
+
+
+def test_refresh_writes_the_latest_release(cache_home, monkeypatch):
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"tag_name": "v1.2.3"}
+
+    requests = types.SimpleNamespace(get=lambda url, timeout: Response())
+    monkeypatch.setitem(sys.modules, "requests", requests)
+    update_check.refresh()
+    with open(update_check.cache_file(), encoding="utf-8") as f:
+        cache = json.load(f)
+    assert cache["latest"] == "1.2.3"
+    assert time.time() - cache["checked_at"] < 60
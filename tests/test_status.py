@@ -0,0 +1,113 @@
+import os
+import select
+import pytest
+from operations import watcher as watcher_module
+from operations.snapshot import monitor_candidates, status
+from operations.watcher import FileMonitor, Watcher
+
+
+@pytest.fixture
+def committed(repo, write, commit_all):
+    """Repositório com ``a.txt``, ``b.txt`` e ``dir/c.txt`` num commit."""
+    write(repo, "a.txt", "a\n")
+    write(repo, "b.txt", "b\n")
+    write(repo, "dir/c.txt", "c\n")
+    commit_all(repo, "um")
+    return repo
+
+
+def _fake_monitor(repo, lines, generation="g1"):
+    # Diário no formato do ``dee watch``, com este processo como "monitor"
+    with open(os.path.join(repo.repo_dir, watcher_module.PID_NAME), "w") as f:
+        f.write(str(os.getpid()))
+    with open(os.path.join(repo.repo_dir, watcher_module.JOURNAL_NAME), "wb") as f:
+        f.write(generation.encode() + b"\n" + b"".join(line.encode() + b"\n" for line in lines))
+
+
+def test_status_compares_worktree_index_and_head(committed, write):
+    repo = committed
+    assert status(repo).is_clean()
+
+    write(repo, "a.txt", "a2\n")
+    repo.add(["a.txt"], jobs=1)
+    write(repo, "novo.txt", "novo\n")
+    repo.add(["novo.txt"], jobs=1)
+    write(repo, "b.txt", "b2\n")
+    os.remove(os.path.join(repo.path, "dir", "c.txt"))
+    write(repo, "solto.txt", "?\n")
+
+    result = status(repo)
+    assert result.branch == "main"
+    assert result.staged == [("modificado", "a.txt"), ("novo", "novo.txt")]
+    assert result.unstaged == [("modificado", "b.txt"), ("removido", "dir/c.txt")]
+    assert result.untracked == ["solto.txt"]
+    assert not result.conflicts
+
+
+def test_without_monitor_status_scans_everything(committed, write):
+    repo = committed
+    assert monitor_candidates(repo) == (None, None)
+    write(repo, "b.txt", "mudou\n")
+    assert status(repo).unstaged == [("modificado", "b.txt")]
+
+
+def test_monitor_limits_the_scan_to_journaled_paths(committed, write):
+    repo = committed
+    _fake_monitor(repo, [])
+    # Primeira consulta: varredura completa e token salvo
+    assert status(repo).is_clean()
+
+    with open(os.path.join(repo.repo_dir, watcher_module.JOURNAL_NAME), "ab") as f:
+        f.write(b"a.txt\n")
+    write(repo, "a.txt", "a2\n")
+    # Alterado sem passar pelo diário: invisível enquanto o token vale
+    write(repo, "b.txt", "b2\n")
+    candidates, _ = monitor_candidates(repo)
+    assert candidates == {"a.txt"}
+    assert status(repo).unstaged == [("modificado", "a.txt")]
+    # Ainda diferente do índice: continua candidato na consulta seguinte
+    assert monitor_candidates(repo)[0] == {"a.txt"}
+
+
+def test_new_monitor_generation_falls_back_to_a_full_scan(committed, write):
+    repo = committed
+    _fake_monitor(repo, [])
+    status(repo)
+    write(repo, "b.txt", "b2\n")
+    # Monitor reiniciado (ou fila estourada): o token antigo não vale mais
+    _fake_monitor(repo, [], generation="g2")
+    assert monitor_candidates(repo)[0] is None
+    assert status(repo).unstaged == [("modificado", "b.txt")]
+
+    os.remove(os.path.join(repo.repo_dir, watcher_module.PID_NAME))
+    assert FileMonitor(repo).changed_since("g2:3") is None
+
+
+def test_watcher_journals_inotify_events(committed, write):
+    repo = committed
+    try:
+        watcher = Watcher(repo)
+    except OSError as e:
+        pytest.skip(f"inotify indisponível: {e}")
+    try:
+        watcher._watch_tree(repo.path)
+        watcher._new_generation()
+        with open(watcher.pid_path, "w") as f:
+            f.write(str(os.getpid()))
+        monitor = FileMonitor(repo)
+        token = monitor.current_token()
+
+        write(repo, "dir/c.txt", "c2\n")
+        os.makedirs(os.path.join(repo.path, "novo", "sub"))
+        write(repo, "novo/sub/x.txt", "x\n")
+        while select.select([watcher._fd], [], [], 0.5)[0]:
+            watcher._handle(os.read(watcher._fd, 1 << 16))
+        watcher._flush()
+
+        _, paths = monitor.changed_since(token)
+        assert "dir/c.txt" in paths
+        assert "novo/sub/x.txt" in paths
+        assert not any(path.startswith(".dee") for path in paths)
+    finally:
+        watcher.close()
+    assert not os.path.exists(watcher.pid_path)
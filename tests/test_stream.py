@@ -0,0 +1,233 @@
+import io
+import os
+import hashlib
+import tempfile
+import pytest
+from core.config import config_set
+from core.objects import flatten_tree
+from core.pack import OBJ_BLOB, OBJ_COMMIT
+from core.storage import Repo
+from remote import negotiate as negotiate_module
+from remote import stream as stream_module
+from remote.negotiate import push, fetch
+from remote.store import RemoteStore
+from remote.stream import (
+    CHUNK_SIZE, CODEC_STORE, CODEC_ZLIB, DEFAULT_LEVEL, _RECORD, compression_level, read_stream,
+    write_stream,
+)
+from remote.transport import LocalTransport
+
+
+def _objects():
+    blobs = [b"pequeno", b"a" * (CHUNK_SIZE + 123), os.urandom(70000)]
+    objects = [(OBJ_BLOB, hashlib.sha1(data).hexdigest(), data) for data in blobs]
+    objects.append((OBJ_COMMIT, hashlib.sha1(b"commit").hexdigest(), b"commit"))
+    return objects
+
+
+def _stream(objects, level):
+    out = io.BytesIO()
+    manifest = write_stream(out, [(t, h, len(d), d) for t, h, d in objects], level)
+    assert [m[0] for m in manifest] == [h for _, h, _ in objects]
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("level", [None, 1, 6])
+def test_stream_round_trip(level):
+    objects = _objects()
+    assert list(read_stream(io.BytesIO(_stream(objects, level)))) == objects
+
+
+def test_stream_skips_unwanted_objects():
+    objects = _objects()
+    wanted = {objects[1][1], objects[3][1]}
+    received = list(read_stream(io.BytesIO(_stream(objects, 6)), wanted))
+    assert [h for _, h, _ in received] == [objects[1][1], objects[3][1]]
+
+
+def test_stream_spills_objects_to_temp_files(tmp_path):
+    objects = _objects()
+
+    def temp_file(obj_type):
+        return tempfile.mkstemp(dir=tmp_path)
+
+    received = list(read_stream(io.BytesIO(_stream(objects, 6)), temp_file=temp_file))
+    for (obj_type, obj_hash, data), (got_type, got_hash, path) in zip(objects, received):
+        assert (got_type, got_hash) == (obj_type, obj_hash)
+        with open(path, "rb") as f:
+            assert f.read() == data
+
+
+def test_corrupted_object_is_rejected_and_its_temp_file_removed(tmp_path):
+    objects = _objects()[:1]
+    data = bytearray(_stream(objects, None))
+    data[data.index(b"pequeno")] ^= 0xFF
+    with pytest.raises(ValueError):
+        list(read_stream(io.BytesIO(bytes(data))))
+
+    def temp_file(obj_type):
+        return tempfile.mkstemp(dir=tmp_path)
+
+    with pytest.raises(ValueError):
+        list(read_stream(io.BytesIO(bytes(data)), temp_file=temp_file))
+    assert os.listdir(tmp_path) == []
+
+
+def test_fetch_round_trip(repo, write, commit_all, tmp_path):
+    store = RemoteStore(LocalTransport(str(tmp_path / "remoto")))
+    write(repo, "a.txt", "conteúdo\n")
+    write(repo, "dir/b.bin", bytes(range(256)) * 100)
+    head = commit_all(repo, "um")
+    push(repo, store, "main", head)
+
+    other = Repo(str(tmp_path / "outro"))
+    other.init()
+    assert fetch(other, store, head) > 0
+    files = flatten_tree(other._read_tree, other._read_commit(head)["tree"])
+    assert sorted(files) == ["a.txt", "dir/b.bin"]
+    for meta in files.values():
+        assert other._read_blob(meta["hash"]) == repo._read_blob(meta["hash"])
+    assert fetch(other, store, head) == 0
+
+
+def test_interrupted_fetch_is_resumed(repo, write, commit_all, tmp_path, monkeypatch):
+    store = RemoteStore(LocalTransport(str(tmp_path / "remoto")))
+    write(repo, "a.txt", "um\n")
+    write(repo, "dir/b.txt", "dois\n")
+    head = commit_all(repo, "um")
+    push(repo, store, "main", head)
+
+    other = Repo(str(tmp_path / "outro"))
+    other.init()
+    blob_hash = flatten_tree(repo._read_tree, repo._read_commit(head)["tree"])["dir/b.txt"]["hash"]
+    put_file = other.blob_store.put_file
+
+    def failing_put_file(obj_hash, tmp_path):
+        if obj_hash == blob_hash:
+            raise OSError("disco cheio")
+        return put_file(obj_hash, tmp_path)
+
+    monkeypatch.setattr(other.blob_store, "put_file", failing_put_file)
+    with pytest.raises(OSError):
+        fetch(other, store, head)
+    # Nada que cite o blob perdido foi gravado
+    assert not other._has_object(head, other.object_store)
+    assert not other._has_object(repo._read_commit(head)["tree"], other.object_store)
+    assert os.path.exists(os.path.join(other.repo_dir, "FETCH_INCOMPLETE"))
+
+    monkeypatch.setattr(other.blob_store, "put_file", put_file)
+    assert fetch(other, store, head) > 0
+    assert not os.path.exists(os.path.join(other.repo_dir, "FETCH_INCOMPLETE"))
+    assert other._read_blob(blob_hash) == b"dois\n"
+    assert fetch(other, store, head) == 0
+
+
+def test_compression_level():
+    assert compression_level(None) == DEFAULT_LEVEL
+    assert compression_level("store") is None
+    assert compression_level("0") is None
+    assert compression_level(" 9 ") == 9
+    for value in ("10", "rápido"):
+        with pytest.raises(ValueError):
+            compression_level(value)
+
+
+class _RecordingTransport(LocalTransport):
+    """``LocalTransport`` que registra o tamanho de cada escrita nos uploads."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.writes = {}
+
+    def open_write(self, path):
+        upload = super().open_write(path)
+        writes = self.writes.setdefault(os.path.basename(path), [])
+        write = upload.write
+
+        def recording_write(data):
+            writes.append(len(data))
+            return write(data)
+
+        upload.write = recording_write
+        return upload
+
+
+def _records(store, pack_id):
+    # ``(hash, codec)`` de cada registro do stream, lidos pelos offsets do manifesto
+    with store.open_pack(pack_id) as f:
+        data = f.read()
+    return data, {
+        obj_hash: _RECORD.unpack_from(data, offset)[3]
+        for obj_hash, _, offset, _ in store.read_manifest(pack_id)["objects"]
+    }
+
+
+def test_push_streams_straight_to_the_remote(repo, write, commit_all, tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_module, "CHUNK_SIZE", 4096)
+    remote_dir = str(tmp_path / "remoto")
+    transport = _RecordingTransport(remote_dir)
+    store = RemoteStore(transport)
+    write(repo, "texto.txt", "linha repetida\n" * 20000)
+    write(repo, "ruido.bin", os.urandom(50000))
+    head = commit_all(repo, "um")
+
+    temp_dirs = []
+    mkstemp = tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        temp_dirs.append(os.path.abspath(kwargs.get("dir") or tempfile.gettempdir()))
+        return mkstemp(*args, **kwargs)
+
+    monkeypatch.setattr(tempfile, "mkstemp", recording_mkstemp)
+    assert push(repo, store, "main", head, level=6)[0] == "ok"
+    # Nenhum arquivo temporário local: só os uploads atômicos no próprio remoto
+    assert temp_dirs and all(d.startswith(remote_dir) for d in temp_dirs)
+
+    (pack_id,) = store.list_packs()
+    writes = transport.writes[f"{pack_id}.dstm"]
+    assert len(writes) > 20
+    assert max(writes) <= 4096 + 64
+
+    data, codecs = _records(store, pack_id)
+    assert data[5] == CODEC_ZLIB
+    files = flatten_tree(repo._read_tree, repo._read_commit(head)["tree"])
+    # Dados aleatórios não encolhem: vão como estão mesmo com compressão
+    assert codecs[files["texto.txt"]["hash"]] == CODEC_ZLIB
+    assert codecs[files["ruido.bin"]["hash"]] == CODEC_STORE
+    assert len(data) < 50000 + 20000
+
+
+def test_push_to_honours_store_only_compression(repo, write, commit_all, tmp_path):
+    store = RemoteStore(LocalTransport(str(tmp_path / "remoto")))
+    write(repo, "texto.txt", "linha repetida\n" * 1000)
+    commit_all(repo, "um")
+    config_set(repo.config_file, "remote.compression", "store")
+    assert repo.push_to(store.transport) == "ok"
+    (pack_id,) = store.list_packs()
+    data, codecs = _records(store, pack_id)
+    assert data[5] == CODEC_STORE
+    assert set(codecs.values()) == {CODEC_STORE}
+
+    config_set(repo.config_file, "remote.compression", "11")
+    with pytest.raises(ValueError):
+        repo.push_to(store.transport)
+
+
+def test_failed_push_leaves_nothing_on_the_remote(repo, write, commit_all, tmp_path, monkeypatch):
+    remote_dir = tmp_path / "remoto"
+    store = RemoteStore(LocalTransport(str(remote_dir)))
+    write(repo, "a.txt", "um\n")
+    head = commit_all(repo, "um")
+    object_source = negotiate_module._object_source
+
+    def failing_object_source(repo, obj_type, obj_hash):
+        if obj_type == OBJ_COMMIT:
+            raise OSError("leitura falhou")
+        return object_source(repo, obj_type, obj_hash)
+
+    monkeypatch.setattr(negotiate_module, "_object_source", failing_object_source)
+    with pytest.raises(OSError):
+        push(repo, store, "main", head)
+    assert os.listdir(remote_dir / "packs") == []
+    assert store.read_ref("main") is None
+    assert not store.transport.exists(store.COMMITS)
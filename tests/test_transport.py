@@ -0,0 +1,273 @@
+import os
+import sys
+import types
+import uuid
+import sqlite3
+import pytest
+from core.config import config_set
+from core.storage import Repo
+from remote import transport as transport_module
+from remote.metadata import NullMetadata, SQLiteMetadata, open_metadata
+from remote.negotiate import fetch, push
+from remote.pool import SSHPool
+from remote.remote import RemoteTransport
+from remote.store import RemoteStore
+from remote.transport import LocalTransport, SFTPTransport
+
+
+class _FakeFile:
+    # Arquivo remoto com a API do paramiko.SFTPFile usada pelo transporte
+    def __init__(self, sftp, path, mode):
+        self._sftp = sftp
+        py_mode = mode.replace("b", "")
+        py_mode = "xb" if "x" in py_mode else py_mode + "b"
+        self._file = open(path, py_mode)
+
+    def set_pipelined(self, pipelined):
+        self._sftp.calls.append("set_pipelined")
+
+    def prefetch(self):
+        self._sftp.calls.append("prefetch")
+
+    def readv(self, chunks):
+        self._sftp.calls.append("readv")
+        for offset, length in chunks:
+            self._file.seek(offset)
+            yield self._file.read(length)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+class _FakeSFTP:
+    """Cliente SFTP sobre um diretório local, registrando as chamadas."""
+
+    def __init__(self):
+        self.calls = []
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def listdir(self, path):
+        return os.listdir(path)
+
+    def open(self, path, mode="r"):
+        return _FakeFile(self, path, mode)
+
+    def chmod(self, path, mode):
+        os.chmod(path, mode)
+
+    def posix_rename(self, old, new):
+        self.calls.append("posix_rename")
+        os.replace(old, new)
+
+    def remove(self, path):
+        os.remove(path)
+
+
+@pytest.fixture
+def sftp(monkeypatch):
+    fake = _FakeSFTP()
+    commands = []
+
+    def exec_command(host, command, **auth):
+        commands.append(command)
+        os.makedirs(command.split(" ", 2)[2].strip("'"), exist_ok=True)
+        return 0, "", ""
+
+    monkeypatch.setattr(transport_module.pool, "sftp", lambda host, **auth: fake)
+    monkeypatch.setattr(transport_module.pool, "exec", exec_command)
+    fake.commands = commands
+    return fake
+
+
+def test_push_and_fetch_over_sftp(repo, write, commit_all, sftp, tmp_path):
+    write(repo, "a.txt", "1\n")
+    write(repo, "dir/b.txt", "2\n")
+    head = commit_all(repo, "um")
+    root = str(tmp_path / "remoto")
+    store = RemoteStore(SFTPTransport("servidor", root, username="dee"))
+    assert push(repo, store, "main", head) == ("ok", 2)
+    # Um único mkdir -p por diretório, num canal do transporte compartilhado
+    assert sftp.commands == [f"mkdir -p {root}/packs", f"mkdir -p {root}/refs/heads"]
+    assert "set_pipelined" in sftp.calls and "posix_rename" in sftp.calls
+    assert not [
+        name for _, _, files in os.walk(root) for name in files if name.startswith(".tmp-")
+    ]
+    assert RemoteStore(LocalTransport(root)).read_ref("main") == head
+
+    other = Repo(str(tmp_path / "outro"))
+    os.makedirs(other.path)
+    other.init()
+    fetch(other, store, head)
+    assert other._read_commit(head)["tree"] == repo._read_commit(head)["tree"]
+
+
+def test_sftp_read_ranges_uses_readv(sftp, tmp_path):
+    (tmp_path / "dados").write_bytes(b"0123456789")
+    transport = SFTPTransport("servidor", str(tmp_path))
+    assert list(transport.read_ranges("dados", [(0, 2), (5, 3)])) == [b"01", b"567"]
+    assert sftp.calls == ["readv"]
+    assert transport.read_bytes("dados") == b"0123456789"
+    assert transport.size("dados") == 10
+
+
+def test_sftp_create_exclusive_and_abort(sftp, tmp_path):
+    transport = SFTPTransport("servidor", str(tmp_path))
+    assert transport.create_exclusive("trava")
+    assert not transport.create_exclusive("trava")
+
+    upload = transport.open_write("arquivo")
+    upload.write(b"parcial")
+    upload.abort()
+    assert os.listdir(tmp_path) == ["trava"]
+    assert not transport.exists("arquivo")
+    assert transport.listdir("inexistente") == []
+
+
+def test_remote_from_config(tmp_path):
+    config_path = str(tmp_path / "config")
+    repo_id = str(uuid.uuid4())
+
+    def remote():
+        from core.config import load_config
+
+        return RemoteTransport.from_config(load_config(config_path, include_user=False), repo_id)
+
+    with pytest.raises(ValueError):
+        remote()
+
+    config_set(config_path, "remote.url", f"file://{tmp_path}/remotos")
+    with remote() as r:
+        assert isinstance(r.transport, LocalTransport)
+        assert r.transport.root == f"{tmp_path}/remotos/{repo_id}"
+        assert isinstance(r.metadata, NullMetadata)
+
+    config_set(config_path, "remote.url", "ssh://dee@servidor:2222/srv/dee")
+    config_set(config_path, "remote.password", "segredo")
+    config_set(config_path, "remote.metadata", f"sqlite://{tmp_path}/db.sqlite3")
+    with remote() as r:
+        assert isinstance(r.transport, SFTPTransport)
+        assert r.transport.host == "servidor"
+        assert r.transport.root == f"/srv/dee/{repo_id}"
+        assert r.transport._auth["port"] == 2222
+        assert r.transport._auth["username"] == "dee"
+        assert r.transport._auth["password"] == "segredo"
+        assert isinstance(r.metadata, SQLiteMetadata)
+
+    config_set(config_path, "remote.url", "ftp://servidor/dee")
+    with pytest.raises(ValueError):
+        remote()
+    with pytest.raises(ValueError):
+        open_metadata("mysql://servidor/dee")
+
+
+def test_pool_reuses_one_connection_per_host(monkeypatch):
+    connects = []
+
+    class Transport:
+        active = True
+
+        def is_active(self):
+            return self.active
+
+    class SSHClient:
+        def __init__(self):
+            self.transport = Transport()
+
+        def load_system_host_keys(self):
+            pass
+
+        def set_missing_host_key_policy(self, policy):
+            pass
+
+        def connect(self, **kwargs):
+            connects.append(kwargs["hostname"])
+
+        def get_transport(self):
+            return self.transport
+
+        def open_sftp(self):
+            return types.SimpleNamespace(close=lambda: None)
+
+        def close(self):
+            pass
+
+    paramiko = types.SimpleNamespace(SSHClient=SSHClient, AutoAddPolicy=lambda: None)
+    monkeypatch.setitem(sys.modules, "paramiko", paramiko)
+
+    pool = SSHPool()
+    client = pool.client("a", username="dee")
+    sftp = pool.sftp("a", username="dee")
+    assert pool.client("a", username="dee") is client
+    assert pool.sftp("a", username="dee") is sftp
+    pool.client("b")
+    assert connects == ["a", "b"]
+
+    # Transporte caído: reconecta e abre um cliente SFTP novo
+    client.transport.active = False
+    assert pool.client("a", username="dee") is not client
+    assert pool.sftp("a", username="dee") is not sftp
+    assert connects == ["a", "b", "a"]
+    pool.close()
+
+
+def _metadata_db(path):
+    # Mesmo esquema de tb_repo / tb_repo_object do db.sqlite3
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE "tb_repo" ("repo_id" char(32) NOT NULL PRIMARY KEY, '
+        '"repo_name" varchar(250) NULL, "repo_description" varchar(250) NULL, '
+        '"repo_owner_id" char(32) NULL)'
+    )
+    conn.execute(
+        'CREATE TABLE "tb_repo_object" ("repo_id" char(32) NOT NULL PRIMARY KEY, '
+        '"upload" varchar(100) NOT NULL, "repo_link_id" char(32) NULL)'
+    )
+    repo_id = uuid.uuid4()
+    conn.execute("INSERT INTO tb_repo (repo_id, repo_name) VALUES (?, ?)", (repo_id.hex, "projeto "))
+    conn.commit()
+    conn.close()
+    return str(repo_id)
+
+
+def test_sqlite_metadata_session(tmp_path):
+    path = str(tmp_path / "db.sqlite3")
+    repo_id = _metadata_db(path)
+    with SQLiteMetadata(path).session() as db:
+        assert db.repo_exists(repo_id)
+        assert not db.repo_exists(str(uuid.uuid4()))
+        assert db.repo_name(repo_id) == "projeto"
+        assert db.latest_push(repo_id) is None
+        db.record_push(repo_id, "main", "a" * 40)
+        db.record_push(repo_id, "dev", "b" * 40)
+    with SQLiteMetadata(path).session() as db:
+        assert db.latest_push(repo_id) == ("b" * 40, "dev")
+        assert db.find_push("a" * 40) == (repo_id, "main")
+        assert db.find_push("c" * 40) is None
+
+
+def test_push_and_clone_through_configured_remote(repo, write, commit_all, tmp_path):
+    db_path = str(tmp_path / "db.sqlite3")
+    repo_id = _metadata_db(db_path)
+    config_set(repo.config_file, "remote.url", f"file://{tmp_path}/remotos")
+    config_set(repo.config_file, "remote.metadata", f"sqlite://{db_path}")
+    write(repo, "a.txt", "1\n")
+    head = commit_all(repo, "um")
+
+    repo.push(repo_id)
+    assert RemoteStore(LocalTransport(str(tmp_path / "remotos" / repo_id))).read_ref("main") == head
+    with SQLiteMetadata(db_path).session() as db:
+        assert db.latest_push(repo_id) == (head, "main")
+
+    clone_path = repo.clone(head, str(tmp_path / "clones"))
+    assert clone_path == str(tmp_path / "clones" / "projeto")
+    with open(os.path.join(clone_path, "a.txt")) as f:
+        assert f.read() == "1\n"
+    assert Repo(clone_path).get_head_commit() == head
@@ -0,0 +1,110 @@
+import hashlib
+from core.index import IndexEntry
+from core.objects import (
+    BLOB, TREE, build_trees, diff_trees, edit_tree, flatten_tree, parent_dirs, parse_tree
+)
+
+
+class _Objects:
+    """Store de árvores em memória que conta leituras e gravações."""
+
+    def __init__(self):
+        self.data = {}
+        self.writes = 0
+        self.reads = 0
+
+    def write(self, data):
+        self.writes += 1
+        obj_hash = hashlib.sha1(data).hexdigest()
+        self.data[obj_hash] = data
+        return obj_hash
+
+    def read(self, obj_hash):
+        self.reads += 1
+        return parse_tree(self.data[obj_hash])
+
+
+def _index(files):
+    return {path: IndexEntry(hashlib.sha1(content).hexdigest()) for path, content in files.items()}
+
+
+FILES = {
+    "leia.txt": b"leia",
+    "src/main.py": b"main",
+    "src/core/a.py": b"a",
+    "src/core/b.py": b"b",
+    "docs/guia/intro.md": b"intro",
+}
+
+
+def test_build_trees_round_trip():
+    objects = _Objects()
+    index = _index(FILES)
+    root = build_trees(index, {}, objects.write)
+    files = flatten_tree(objects.read, root)
+    assert {path: meta["hash"] for path, meta in files.items()} == {p: e.hash for p, e in index.items()}
+    top = {name: kind for name, kind, _, _ in objects.read(root)}
+    assert top == {"leia.txt": BLOB, "src": TREE, "docs": TREE}
+
+
+def test_tree_cache_rewrites_only_the_changed_path():
+    objects = _Objects()
+    index = _index(FILES)
+    tree_cache = {}
+    first = build_trees(index, tree_cache, objects.write)
+    assert build_trees(index, tree_cache, objects.write) == first
+
+    index["src/core/a.py"] = IndexEntry(hashlib.sha1(b"a2").hexdigest())
+    for dirname in parent_dirs("src/core/a.py"):
+        tree_cache.pop(dirname, None)
+    writes = objects.writes
+    second = build_trees(index, tree_cache, objects.write)
+    # Raiz, src e src/core; docs e docs/guia vêm do cache
+    assert objects.writes - writes == 3
+    assert second == build_trees(index, {}, objects.write)
+
+    old = {e[0]: e[2] for e in objects.read(first)}
+    new = {e[0]: e[2] for e in objects.read(second)}
+    assert old["docs"] == new["docs"]
+    assert old["src"] != new["src"]
+
+
+def test_edit_tree_prunes_empty_directories():
+    objects = _Objects()
+    root = build_trees(_index(FILES), {}, objects.write)
+    new_root = edit_tree(objects.read, objects.write, root, {
+        "docs/guia/intro.md": None,
+        "src/core/c.py": ("c" * 40, 0o755),
+    })
+    files = flatten_tree(objects.read, new_root)
+    assert not any(path.startswith("docs/") for path in files)
+    assert files["src/core/c.py"] == {"hash": "c" * 40, "mode": oct(0o755)}
+    assert edit_tree(objects.read, objects.write, None, {"x": None}) is None
+
+
+def test_diff_trees_skips_identical_subtrees():
+    objects = _Objects()
+    old_root = build_trees(_index(FILES), {}, objects.write)
+    changed = dict(FILES, **{"src/core/b.py": b"b2"})
+    new_root = build_trees(_index(changed), {}, objects.write)
+
+    objects.reads = 0
+    changes = list(diff_trees(objects.read, old_root, new_root))
+    assert [c[0] for c in changes] == ["src/core/b.py"]
+    # Raiz, src e src/core dos dois lados; docs é igual e não é lida
+    assert objects.reads == 6
+
+
+def test_commits_share_unchanged_subtrees(repo, write, commit_all):
+    write(repo, "src/a.py", "a\n")
+    write(repo, "docs/leia.txt", "leia\n")
+    first = commit_all(repo, "um")
+    write(repo, "src/a.py", "a2\n")
+    second = commit_all(repo, "dois")
+
+    def subtrees(commit_hash):
+        return {e[0]: e[2] for e in repo._read_tree(repo._read_commit(commit_hash)["tree"])}
+
+    assert subtrees(first)["docs"] == subtrees(second)["docs"]
+    assert subtrees(first)["src"] != subtrees(second)["src"]
+    assert "files" not in repo._read_commit(second)